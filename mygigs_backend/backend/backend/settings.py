@@ -12,7 +12,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 import os
 from pathlib import Path
-from decouple import config
+from decouple import Csv, config
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -45,6 +45,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.RequestMetricsMiddleware',
+    'core.middleware.ReplicaStickinessMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -82,6 +84,64 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Seconds to reuse a connection across requests. Worth raising (e.g. 60)
+        # under WSGI; keep 0 under ASGI, where async views' queries run on
+        # per-thread connections that would otherwise be held open between requests.
+        'CONN_MAX_AGE': config('DB_CONN_MAX_AGE', default=0, cast=int),
+        'CONN_HEALTH_CHECKS': True,
+    }
+}
+
+# SQLite settings for concurrent writers (callbacks, admin, background workers).
+# WAL lets reads proceed during a write. It is stored in the database file, so
+# migration 0029 switches it on once rather than init_command on every
+# connection, which would rewrite the file even for read-only commands. The
+# other pragmas are per connection and applied to every new one. IMMEDIATE
+# transactions take the write lock when they begin, so a writer waits up to
+# the busy timeout for it instead of failing with "database is locked" when a
+# read inside the transaction is upgraded to a write. Ignored unless the
+# engine is sqlite3; SQLITE_TUNING=False keeps SQLite's defaults.
+SQLITE_TUNING = config('SQLITE_TUNING', default=True, cast=bool)
+SQLITE_JOURNAL_MODE = 'WAL'
+SQLITE_PRAGMAS = {
+    # Durable at every checkpoint rather than every commit; safe with WAL.
+    'synchronous': 'NORMAL',
+    'temp_store': 'MEMORY',
+    'mmap_size': config('SQLITE_MMAP_SIZE', default=128 * 1024 * 1024, cast=int),
+    # Negative values are KiB: 20 MiB of page cache per connection.
+    'cache_size': config('SQLITE_CACHE_SIZE', default=-20000, cast=int),
+}
+SQLITE_OPTIONS = {
+    # Seconds to wait for the write lock (SQLite's busy timeout).
+    'timeout': config('SQLITE_BUSY_TIMEOUT', default=20, cast=int),
+    'transaction_mode': 'IMMEDIATE',
+    'init_command': ';'.join(f'PRAGMA {name}={value}' for name, value in SQLITE_PRAGMAS.items()),
+}
+if SQLITE_TUNING and DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+    DATABASES['default']['OPTIONS'] = SQLITE_OPTIONS
+
+# Optional read replica (e.g. a Litestream/LiteFS copy of the database). With
+# DB_REPLICA_NAME set, listing and dashboard views read from it; see
+# core/routers.py. Without it the alias just points at the primary and nothing
+# is routed there.
+DB_REPLICA_NAME = config('DB_REPLICA_NAME', default='')
+DB_REPLICA_ROUTING = bool(DB_REPLICA_NAME)
+DATABASES['replica'] = {**DATABASES['default'], 'NAME': DB_REPLICA_NAME or DATABASES['default']['NAME']}
+DATABASE_ROUTERS = ['core.routers.PrimaryReplicaRouter']
+# How long a client reads from the primary after its own write; should exceed the replica's lag.
+DB_REPLICA_STICKY_SECONDS = config('DB_REPLICA_STICKY_SECONDS', default=10, cast=int)
+DB_REPLICA_STICKY_COOKIE = 'read_primary'
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# LocMemCache is per-process; point CACHE_BACKEND/CACHE_LOCATION at Redis or
+# Memcached in production so worker processes share cached tokens and data.
+
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='mygigs'),
     }
 }
 
@@ -128,6 +188,50 @@ STATIC_URL = 'static/'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 
+# Per-request query/timing instrumentation: Server-Timing headers and the
+# /core/metrics/ endpoint. Leave off where the overhead isn't wanted.
+REQUEST_METRICS_ENABLED = config('REQUEST_METRICS_ENABLED', default=False, cast=bool)
+# /core/metrics/ is served to staff users, and to callers sending this in an
+# X-Metrics-Token header (e.g. a scraper); empty disables token access.
+REQUEST_METRICS_TOKEN = config('REQUEST_METRICS_TOKEN', default='')
+
+
+# Keyset pagination for list endpoints (core/pagination.py). Pagination is
+# opt-in per request via ?page_size= / ?cursor=.
+API_PAGE_SIZE = config('API_PAGE_SIZE', default=20, cast=int)
+API_MAX_PAGE_SIZE = config('API_MAX_PAGE_SIZE', default=100, cast=int)
+
+
+# Dotted path to the gig search backend (core/search.py). Empty means SQLite
+# FTS5 when running on SQLite, and the portable icontains backend otherwise.
+GIG_SEARCH_BACKEND = config('GIG_SEARCH_BACKEND', default='')
+
+
+# Days of sign-up history returned by /core/dashboard-data/.
+DASHBOARD_SIGNUP_DAYS = config('DASHBOARD_SIGNUP_DAYS', default=30, cast=int)
+
+# rollup_transactions only reads transactions last updated at least this many seconds
+# ago, so a write still committing when it runs isn't left behind its watermark.
+TRANSACTION_ROLLUP_LAG_SECONDS = config('TRANSACTION_ROLLUP_LAG_SECONDS', default=30, cast=int)
+
+# Cached JSON responses for the public gig/freelancer/testimonial lists
+# (core/cache.py). Entries are invalidated on writes; the timeout only bounds
+# staleness from writes that bypass model signals. 0 disables the cache.
+# Invalidation only reaches processes sharing the cache: with the default
+# per-process LocMemCache, other workers keep serving their copies for up to
+# the full timeout, so use a shared CACHE_BACKEND (Redis/Memcached) whenever
+# this is on and more than one worker runs.
+API_CACHE_TIMEOUT = config('API_CACHE_TIMEOUT', default=300, cast=int)
+
+# Render list endpoints from .values() rows (core/fast_serializers.py) instead of the
+# DRF serializers; the JSON is the same either way.
+FAST_LIST_SERIALIZERS = config('FAST_LIST_SERIALIZERS', default=True, cast=bool)
+
+# Rows fetched per database round trip, and per response chunk, by the streaming
+# transaction export (/core/transactions/export/).
+TRANSACTION_EXPORT_CHUNK_SIZE = config('TRANSACTION_EXPORT_CHUNK_SIZE', default=2000, cast=int)
+
+
 # CORS settings for the Next.js frontend
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
@@ -149,18 +253,79 @@ CSRF_TRUSTED_ORIGINS = ['http://localhost:3000', 'http://127.0.0.1:3000']
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Resized JPEG/WebP copies of uploaded gig and profile images (core/images.py),
+# rendered on IMAGE_VARIANT_WORKERS background threads after each upload.
+# With IMAGE_VARIANTS_ENABLED off, run generate_image_variants instead.
+IMAGE_VARIANTS_ENABLED = config('IMAGE_VARIANTS_ENABLED', default=True, cast=bool)
+IMAGE_VARIANT_WIDTHS = config('IMAGE_VARIANT_WIDTHS', default='160,480,960', cast=Csv(int))
+IMAGE_VARIANT_WORKERS = config('IMAGE_VARIANT_WORKERS', default=2, cast=int)
+
 # M-Pesa Credentials from .env
 CONSUMER_KEY = config('CONSUMER_KEY')
 CONSUMER_SECRET = config('CONSUMER_SECRET')
 BUSINESS_SHORTCODE = config('BUSINESS_SHORTCODE')
 PASSKEY = config('PASSKEY')
+MPESA_BASE_URL = config('MPESA_BASE_URL', default='https://sandbox.safaricom.co.ke')
+# The Daraja token is treated as expired this many seconds early, and refreshed
+# in the background once it is within MPESA_TOKEN_REFRESH_AHEAD seconds of expiry.
+MPESA_TOKEN_EXPIRY_MARGIN = config('MPESA_TOKEN_EXPIRY_MARGIN', default=60, cast=int)
+MPESA_TOKEN_REFRESH_AHEAD = config('MPESA_TOKEN_REFRESH_AHEAD', default=300, cast=int)
+
+# Pushed payment status (core/payment_events.py). The stream and long-poll
+# views need an ASGI server (backend/asgi.py) to hold connections cheaply.
+# With more than one worker process use 'core.payment_events.RedisChannel'.
+PAYMENT_EVENTS_CHANNEL = config('PAYMENT_EVENTS_CHANNEL', default='core.payment_events.LocalChannel')
+PAYMENT_EVENTS_REDIS_URL = config('PAYMENT_EVENTS_REDIS_URL', default='redis://localhost:6379/0')
+# Longest a status stream / long-poll is held open, and the SSE keep-alive interval (seconds).
+PAYMENT_STATUS_MAX_WAIT = config('PAYMENT_STATUS_MAX_WAIT', default=120, cast=int)
+PAYMENT_STATUS_LONG_POLL_WAIT = config('PAYMENT_STATUS_LONG_POLL_WAIT', default=25, cast=int)
+PAYMENT_STATUS_KEEPALIVE = config('PAYMENT_STATUS_KEEPALIVE', default=15, cast=int)
+
+# Outbound HTTP clients (see core/integrations.py). Timeouts are in seconds;
+# only idempotent requests are retried.
+HTTP_CONNECT_TIMEOUT = config('HTTP_CONNECT_TIMEOUT', default=3.05, cast=float)
+HTTP_READ_TIMEOUT = config('HTTP_READ_TIMEOUT', default=15, cast=float)
+HTTP_MAX_RETRIES = config('HTTP_MAX_RETRIES', default=2, cast=int)
+HTTP_RETRY_BACKOFF = config('HTTP_RETRY_BACKOFF', default=0.3, cast=float)
+HTTP_POOL_MAXSIZE = config('HTTP_POOL_MAXSIZE', default=10, cast=int)
+# Connections per event loop for the async (httpx) clients used by the async
+# payment views, split into pools of HTTP_ASYNC_POOL_SIZE.
+HTTP_ASYNC_MAX_CONNECTIONS = config('HTTP_ASYNC_MAX_CONNECTIONS', default=100, cast=int)
+HTTP_ASYNC_POOL_SIZE = config('HTTP_ASYNC_POOL_SIZE', default=10, cast=int)
 
 # URL for the callback from M-Pesa
 # For local development, use a tool like Ngrok to expose your local server
 MPESA_CALLBACK_URL = config('MPESA_CALLBACK_URL')
+# "inline" applies each STK callback in the request; "staged" only stores it for
+# process_mpesa_callbacks to apply in batches of MPESA_CALLBACK_BATCH_SIZE.
+MPESA_CALLBACK_MODE = config('MPESA_CALLBACK_MODE', default='inline')
+MPESA_CALLBACK_BATCH_SIZE = config('MPESA_CALLBACK_BATCH_SIZE', default=500, cast=int)
+
 CLERK_WEBHOOK_SECRET = config('CLERK_WEBHOOK_SECRET')
+# "inline" applies each Clerk webhook in the request; "queued" only stores it for
+# process_clerk_webhooks to apply in batches of CLERK_WEBHOOK_BATCH_SIZE.
+CLERK_WEBHOOK_MODE = config('CLERK_WEBHOOK_MODE', default='inline')
+CLERK_WEBHOOK_BATCH_SIZE = config('CLERK_WEBHOOK_BATCH_SIZE', default=1000, cast=int)
 
 #JWT and JWK settings for Clerk integration
 
 CLERK_SECRET_KEY = config('CLERK_SECRET_KEY')
+# Base URL of the Clerk Backend API (point it at a local fake to test reconcile_clerk_users).
+CLERK_API_URL = config('CLERK_API_URL', default='https://api.clerk.com/v1')
+# Users per page, and pages fetched in parallel, when reconciling ClerkUser with Clerk.
+CLERK_SYNC_PAGE_SIZE = config('CLERK_SYNC_PAGE_SIZE', default=500, cast=int)
+CLERK_SYNC_CONCURRENCY = config('CLERK_SYNC_CONCURRENCY', default=4, cast=int)
 CLERK_JWKS_URL = config('CLERK_JWKS_URL')
+# Seconds before cached JWKS keys are refreshed in the background, and the
+# minimum gap between refetches triggered by an unknown key id.
+CLERK_JWKS_CACHE_TTL = config('CLERK_JWKS_CACHE_TTL', default=3600, cast=int)
+CLERK_JWKS_MIN_REFRESH_INTERVAL = config('CLERK_JWKS_MIN_REFRESH_INTERVAL', default=30, cast=int)
+# Maximum number of verified session tokens kept per process (0 disables the cache).
+CLERK_TOKEN_CACHE_SIZE = config('CLERK_TOKEN_CACHE_SIZE', default=1024, cast=int)
+
+# Outbox worker for Clerk role updates (python manage.py process_role_sync).
+ROLE_SYNC_BATCH_SIZE = config('ROLE_SYNC_BATCH_SIZE', default=50, cast=int)
+ROLE_SYNC_MAX_ATTEMPTS = config('ROLE_SYNC_MAX_ATTEMPTS', default=8, cast=int)
+ROLE_SYNC_RETRY_BASE_SECONDS = config('ROLE_SYNC_RETRY_BASE_SECONDS', default=30, cast=int)
+# How long a claimed batch is hidden from other workers before it is considered abandoned.
+ROLE_SYNC_LEASE_SECONDS = config('ROLE_SYNC_LEASE_SECONDS', default=300, cast=int)
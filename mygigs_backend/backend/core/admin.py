@@ -1,6 +1,7 @@
 from django.contrib import admin
 from django.utils.safestring import mark_safe
 from .models import *
+from .skills import normalize_skill
 
 # Register the model with the Django admin
 admin.site.register(MpesaTransaction)
@@ -34,10 +35,20 @@ class FreelancerAdmin(admin.ModelAdmin):
         return "No Image"
 
     list_display = ('name', 'profession', 'image_tag', 'years_of_experience', 'city', 'country', 'phone_number')
-    search_fields = ('name', 'profession', 'location', 'skills')
+    search_fields = ('name', 'profession', 'city')
     list_filter = ('profession', 'years_of_experience', 'availability')
     image_tag.short_description = 'Image' # Set the column header name
 
+    def get_search_results(self, request, queryset, search_term):
+        # Skills are matched exactly against the normalized Skill table (an
+        # indexed lookup) rather than with LIKE over the comma-separated text.
+        results, may_have_duplicates = super().get_search_results(request, queryset, search_term)
+        skill = Skill.objects.filter(name=normalize_skill(search_term)).first() if search_term else None
+        if skill:
+            results |= queryset.filter(skill_set=skill)
+            may_have_duplicates = True
+        return results, may_have_duplicates
+
 # Register the Freelancer model with its custom admin class
 admin.site.register(Freelancer, FreelancerAdmin)
 
@@ -95,3 +106,65 @@ class ApplicationAdmin(admin.ModelAdmin):
         return f"{obj.gig.creator.first_name} {obj.gig.creator.last_name} ({obj.gig.creator.clerk_id})"
     
     ordering = ('-applied_at',)
+
+
+@admin.register(ClerkRoleSyncJob)
+class ClerkRoleSyncJobAdmin(admin.ModelAdmin):
+    """
+    Outbox of pending Clerk role updates; failed jobs can be inspected here.
+    """
+    list_display = ('clerk_id', 'role', 'status', 'attempts', 'created_at', 'processed_at')
+    list_filter = ('status', 'role')
+    search_fields = ('clerk_id', 'idempotency_key')
+    readonly_fields = ('created_at', 'processed_at')
+    ordering = ('-created_at',)
+
+
+@admin.register(MpesaCallback)
+class MpesaCallbackAdmin(admin.ModelAdmin):
+    """
+    Raw STK callbacks staged for process_mpesa_callbacks; unprocessed rows have no processed_at.
+    """
+    list_display = ('checkout_request_id', 'received_at', 'processed_at')
+    search_fields = ('checkout_request_id',)
+    readonly_fields = ('received_at', 'processed_at')
+    ordering = ('-received_at',)
+
+
+@admin.register(Skill)
+class SkillAdmin(admin.ModelAdmin):
+    list_display = ('name',)
+    search_fields = ('name',)
+    ordering = ('name',)
+
+
+@admin.register(ClerkWebhookEvent)
+class ClerkWebhookEventAdmin(admin.ModelAdmin):
+    """
+    Clerk webhook deliveries, one per svix-id; pending ones are applied by process_clerk_webhooks.
+    """
+    list_display = ('event_type', 'clerk_id', 'status', 'occurred_at', 'received_at', 'processed_at')
+    list_filter = ('status', 'event_type')
+    search_fields = ('clerk_id', 'svix_id')
+    readonly_fields = ('received_at', 'processed_at')
+    ordering = ('-received_at',)
+
+
+@admin.register(ClerkSyncRun)
+class ClerkSyncRunAdmin(admin.ModelAdmin):
+    """
+    reconcile_clerk_users runs; an unfinished one can be continued with --resume.
+    """
+    list_display = ('started_at', 'finished_at', 'next_offset', 'seen', 'created', 'updated', 'deleted', 'failed')
+    readonly_fields = ('started_at', 'finished_at')
+    ordering = ('-started_at',)
+
+
+@admin.register(TransactionRollup)
+class TransactionRollupAdmin(admin.ModelAdmin):
+    """
+    Hourly/daily transaction totals written by rollup_transactions; edits would be overwritten on its next run.
+    """
+    list_display = ('bucket', 'granularity', 'transactions', 'successful', 'failed', 'revenue', 'payers', 'median_callback_seconds')
+    list_filter = ('granularity',)
+    ordering = ('-bucket', 'granularity')
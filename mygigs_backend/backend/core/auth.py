@@ -1,7 +1,16 @@
+import hashlib
 import os
+import threading
+import time
+from collections import OrderedDict
+
 import requests
+from jose import jwk
+from jose.exceptions import JWKError
 from rest_framework.exceptions import AuthenticationFailed
 
+from . import integrations
+
 CLERK_SECRET_KEY = os.getenv("CLERK_SECRET_KEY")
 
 def verify_clerk_token(token):
@@ -16,7 +25,7 @@ def verify_clerk_token(token):
         "Authorization": f"Bearer {CLERK_SECRET_KEY}",
     }
 
-    response = requests.get(
+    response = integrations.clerk_api.get(
         "https://api.clerk.dev/v1/me",
         headers={"Authorization": f"Bearer {token}"}
     )
@@ -25,3 +34,167 @@ def verify_clerk_token(token):
         raise AuthenticationFailed("Invalid or expired Clerk token")
 
     return response.json()  # includes user_id, email, etc.
+
+
+class JWKSKeyStore:
+    """
+    In-process cache of the signing keys published at a JWKS endpoint.
+
+    Keys are parsed once and kept by ``kid``. When the TTL runs out the cached
+    keys keep being served while a background thread refreshes them. Only an
+    unknown ``kid`` (i.e. Clerk rotated its keys) forces a synchronous refetch,
+    and concurrent callers share a single in-flight fetch, which is bounded
+    by ``timeout`` (seconds to connect and between bytes received).
+    """
+
+    def __init__(self, url, ttl=3600, min_refresh_interval=30, timeout=10, client=None):
+        self.url = url
+        self.client = client or integrations.clerk_jwks
+        self.ttl = ttl
+        # Unknown kids are attacker-controlled, so don't refetch for every one of them.
+        self.min_refresh_interval = min_refresh_interval
+        self.timeout = timeout
+        self.fetch_count = 0
+        self._keys = {}
+        self._fetched_at = None
+        self._last_forced = None
+        self._lock = threading.Lock()
+        self._inflight = None
+
+    def get_key(self, kid):
+        """Returns the parsed key for ``kid``, or None if the endpoint doesn't publish it."""
+        key = self._keys.get(kid)
+        if key is not None:
+            if self._is_stale():
+                self.refresh(wait=False)
+            return key
+
+        self.refresh(throttle=bool(self._keys))
+        return self._keys.get(kid)
+
+    def refresh(self, wait=True, throttle=False):
+        """
+        Refetches the key set. Callers arriving while a fetch is in flight
+        wait for it instead of starting their own; with ``wait=False`` the
+        fetch runs on a background thread. ``throttle`` skips the fetch if
+        another throttled one started less than ``min_refresh_interval`` ago.
+        """
+        with self._lock:
+            inflight = self._inflight
+            if inflight is None:
+                now = time.monotonic()
+                if throttle:
+                    if self._last_forced is not None and now - self._last_forced < self.min_refresh_interval:
+                        return
+                    self._last_forced = now
+                inflight = self._inflight = threading.Event()
+                leader = True
+            else:
+                leader = False
+
+        if not leader:
+            if wait:
+                inflight.wait(self.timeout)
+            return
+
+        if wait:
+            self._run_fetch(inflight)
+        else:
+            threading.Thread(target=self._run_fetch, args=(inflight,), daemon=True).start()
+
+    def _run_fetch(self, inflight):
+        try:
+            self._keys = self._fetch_keys()
+            self._fetched_at = time.monotonic()
+        except (requests.exceptions.RequestException, ValueError) as e:
+            # Keep serving the keys we already have and retry after min_refresh_interval.
+            print(f"Failed to refresh JWKS from {self.url}: {e}")
+            if self._fetched_at is not None:
+                self._fetched_at = time.monotonic() - self.ttl + self.min_refresh_interval
+        finally:
+            with self._lock:
+                self._inflight = None
+            inflight.set()
+
+    def _fetch_keys(self):
+        response = self.client.get(self.url, timeout=self.timeout)
+        response.raise_for_status()
+        self.fetch_count += 1
+
+        keys = {}
+        for key_data in response.json().get("keys", []):
+            kid = key_data.get("kid")
+            if not kid or key_data.get("use", "sig") != "sig":
+                continue
+            try:
+                keys[kid] = jwk.construct(key_data, key_data.get("alg", "RS256"))
+            except JWKError as e:
+                print(f"Skipping unusable JWKS key {kid}: {e}")
+        return keys
+
+    def _is_stale(self):
+        return self._fetched_at is None or time.monotonic() - self._fetched_at > self.ttl
+
+
+class VerifiedTokenCache:
+    """
+    Bounded LRU of JWTs whose signature has already been verified, mapping the
+    SHA-256 digest of the raw token to its decoded payload. Entries expire at
+    the token's ``exp`` claim, so a cached token is never accepted for longer
+    than ``jwt.decode`` would have accepted it.
+    """
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, token):
+        """Returns the cached payload for ``token``, or None if it has to be verified."""
+        digest = self._digest(token)
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is not None:
+                payload, expires_at = entry
+                if expires_at > time.time():
+                    self._entries.move_to_end(digest)
+                    self.hits += 1
+                    return payload
+                del self._entries[digest]
+            self.misses += 1
+            return None
+
+    def set(self, token, payload):
+        expires_at = payload.get("exp")
+        # Tokens without an expiry would live until evicted, so always verify those.
+        if self.maxsize <= 0 or not isinstance(expires_at, (int, float)):
+            return
+        digest = self._digest(token)
+        with self._lock:
+            self._entries[digest] = (payload, expires_at)
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+    @staticmethod
+    def _digest(token):
+        return hashlib.sha256(token.encode("utf-8")).digest()
@@ -0,0 +1,105 @@
+"""
+Response caching for public, read-heavy list endpoints.
+
+Each cached view belongs to a namespace (``gigs``, ``freelancers``,
+``testimonials``). Cache keys embed the namespace's current version, and the
+signal handlers in core/signals.py replace that version once a save or
+delete of a model the namespace depends on commits, so every cached page
+for it goes stale at once without having to enumerate keys. Writes through
+``QuerySet.update()``/``bulk_create()`` skip those signals and must call
+``invalidate()`` themselves.
+
+Cached bodies carry a content ETag; a matching ``If-None-Match`` gets a 304
+with no body.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+
+from . import metrics, routers
+
+# Which cached namespaces each model's rows show up in (gigs embed creator_name;
+# /core/freelancers/?gig= ranks freelancers by the gig's title and description).
+DEPENDENCIES = {
+    'Gig': ('gigs', 'freelancers'),
+    'Freelancer': ('gigs', 'freelancers'),
+    'Testimonial': ('testimonials',),
+}
+
+
+def version_key(namespace):
+    return f"api:{namespace}:version"
+
+
+def get_version(namespace):
+    version = cache.get(version_key(namespace))
+    if version is None:
+        # A fresh, never-reused value, so an evicted version key can't resurrect old entries.
+        cache.add(version_key(namespace), time.time_ns(), None)
+        version = cache.get(version_key(namespace))
+    return version
+
+
+def invalidate(*namespaces):
+    for namespace in namespaces:
+        cache.set(version_key(namespace), time.time_ns(), None)
+
+
+def response_key(namespace, request):
+    query = "&".join(sorted(request.GET.urlencode().split("&")))
+    # Bodies hold absolute URLs (cursor links, images), so the scheme and host are part of the key.
+    digest = hashlib.md5(f"{request.scheme}://{request.get_host()}{request.path}?{query}".encode()).hexdigest()
+    return f"api:{namespace}:{get_version(namespace)}:{digest}"
+
+
+def make_etag(content):
+    return f'"{hashlib.md5(content).hexdigest()}"'
+
+
+class CachedResponseMixin:
+    """
+    Serves ``GET`` from the cache for ``APIView`` subclasses that set
+    ``cache_namespace``. Only JSON responses with status 200 are stored.
+    """
+    cache_namespace = None
+
+    def dispatch(self, request, *args, **kwargs):
+        if not self.is_cacheable(request):
+            return super().dispatch(request, *args, **kwargs)
+
+        key = response_key(self.cache_namespace, request)
+        cached = cache.get(key)
+        if cached is not None:
+            content, content_type, etag = cached
+            response = get_conditional_response(request, etag=etag) or HttpResponse(content, content_type=content_type)
+            response['ETag'] = etag
+            return response
+
+        response = super().dispatch(request, *args, **kwargs)
+        if response.status_code != 200 or getattr(response, 'accepted_media_type', None) != 'application/json':
+            return response
+        with metrics.span('serialize'):
+            response.render()
+        etag = make_etag(response.content)
+        # A replica read soon after an invalidation may predate the write; serve it, but don't cache it.
+        if not (routers.reading_from_replica() and routers.may_lag(get_version(self.cache_namespace))):
+            cache.set(key, (response.content, response['Content-Type'], etag), settings.API_CACHE_TIMEOUT)
+        response['ETag'] = etag
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            not_modified['ETag'] = etag
+            return not_modified
+        return response
+
+    def is_cacheable(self, request):
+        return (
+            settings.API_CACHE_TIMEOUT > 0
+            and self.cache_namespace is not None
+            and request.method == 'GET'
+            # The browsable API renders per-user HTML; only plain JSON clients are cached.
+            and 'text/html' not in request.headers.get('Accept', '')
+        )
@@ -0,0 +1,191 @@
+"""
+Idempotent handling of Daraja STK callbacks.
+
+Safaricom redelivers callbacks it believes we missed. A callback only takes
+effect through a conditional ``UPDATE ... WHERE result_code IS NULL``, so
+the first delivery wins and redeliveries change nothing. These writes use
+``update()``/``bulk_update()``, which skip the model signals, so the
+dashboard counters are bumped and the payment status published here.
+
+With MPESA_CALLBACK_MODE = "staged" the view only inserts the raw callback
+into ``MpesaCallback``; ``drain_staged()`` (``manage.py
+process_mpesa_callbacks``) applies pending callbacks in bulk, so a burst of
+callbacks doesn't queue up behind per-row writes.
+"""
+from collections import Counter, defaultdict
+from datetime import datetime
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import dashboard, payment_events
+from .models import ClerkRoleSyncJob, ClerkUser, MpesaCallback, MpesaTransaction
+
+METADATA_FIELDS = ('amount', 'mpesa_receipt_number', 'transaction_date', 'phone_number')
+
+
+def parse_callback_metadata(items):
+    """
+    Pulls (amount, receipt number, transaction date, phone number) out of a
+    successful callback's CallbackMetadata items.
+    """
+    amount = None
+    mpesa_receipt_number = None
+    transaction_date = None
+    phone_number = None
+
+    for item in items:
+        if item['Name'] == 'Amount':
+            amount = item['Value']
+        elif item['Name'] == 'MpesaReceiptNumber':
+            mpesa_receipt_number = item['Value']
+        elif item['Name'] == 'TransactionDate':
+            transaction_date = datetime.strptime(str(item['Value']), '%Y%m%d%H%M%S')
+        elif item['Name'] == 'PhoneNumber':
+            phone_number = item['Value']
+    return amount, mpesa_receipt_number, transaction_date, phone_number
+
+
+def parse_stk_callback(data):
+    """
+    Returns (checkout_request_id, merchant_request_id, field changes) for a
+    callback body, or None if it isn't a usable STK callback.
+    """
+    callback = data.get('Body', {}).get('stkCallback', {}) if isinstance(data, dict) else {}
+    checkout_request_id = callback.get('CheckoutRequestID')
+    result_code = callback.get('ResultCode')
+    if not checkout_request_id or result_code is None:
+        return None
+
+    changes = {'result_code': str(result_code), 'result_desc': callback.get('ResultDesc')}
+    if changes['result_code'] == '0':
+        metadata = parse_callback_metadata(callback.get('CallbackMetadata', {}).get('Item', []))
+        changes.update(zip(METADATA_FIELDS, metadata))
+    return checkout_request_id, callback.get('MerchantRequestID'), changes
+
+
+def handle_callback(data):
+    """Entry point for the callback views: applies or stages per MPESA_CALLBACK_MODE."""
+    if settings.MPESA_CALLBACK_MODE == 'staged':
+        stage_callback(data)
+    else:
+        apply_callback(data)
+
+
+def stage_callback(data):
+    parsed = parse_stk_callback(data)
+    MpesaCallback.objects.create(checkout_request_id=parsed[0] if parsed else None, payload=data)
+
+
+def apply_callback(data):
+    """
+    Records one callback in a single transaction. Returns True if it changed
+    the transaction, False for redeliveries and unknown or malformed callbacks.
+    """
+    parsed = parse_stk_callback(data)
+    if parsed is None:
+        print("Ignoring malformed M-Pesa callback.")
+        return False
+    checkout_request_id, merchant_request_id, changes = parsed
+
+    with transaction.atomic():
+        now = timezone.now()
+        applied = MpesaTransaction.objects.filter(
+            checkout_request_id=checkout_request_id,
+            merchant_request_id=merchant_request_id,
+            result_code__isnull=True,
+        ).update(updated_at=now, callback_at=now, **changes)
+        if not applied:
+            print(f"Callback for {checkout_request_id} already processed or transaction not found.")
+            return False
+        clerk_id, amount = MpesaTransaction.objects.filter(
+            checkout_request_id=checkout_request_id
+        ).values_list('clerk_id', 'amount').get()
+        record_outcomes([(checkout_request_id, clerk_id, changes['result_code'], amount)])
+
+    if changes['result_code'] == '0':
+        print(f"Successfully updated transaction: {changes.get('mpesa_receipt_number')}")
+    else:
+        print(f"Transaction failed with ResultCode: {changes['result_code']}, Description: {changes['result_desc']}")
+    return True
+
+
+def drain_staged(batch_size=None):
+    """
+    Applies up to ``batch_size`` pending staged callbacks in one transaction,
+    so the batch shares a single commit and one set of dashboard, role and
+    outbox writes. Returns (callbacks drained, transactions updated).
+    """
+    batch_size = batch_size or settings.MPESA_CALLBACK_BATCH_SIZE
+    with transaction.atomic():
+        staged = list(
+            MpesaCallback.objects.select_for_update(skip_locked=True)
+            .filter(processed_at__isnull=True).order_by('id')[:batch_size]
+        )
+        if not staged:
+            return 0, 0
+
+        # Copies in delivery order, per CheckoutRequestID.
+        copies = defaultdict(list)
+        for callback in staged:
+            parsed = parse_stk_callback(callback.payload)
+            if parsed is not None:
+                copies[parsed[0]].append((parsed, callback.received_at))
+
+        now = timezone.now()
+        outcomes = []
+        pending = MpesaTransaction.objects.filter(
+            checkout_request_id__in=copies, result_code__isnull=True
+        ).values_list('checkout_request_id', 'merchant_request_id', 'clerk_id', 'amount')
+        for checkout_request_id, merchant_request_id, clerk_id, amount in pending:
+            # First valid delivery wins, as with the conditional update; a copy for
+            # another MerchantRequestID doesn't shadow a valid one behind it.
+            match = next(
+                ((changes, received_at) for (_, callback_merchant_request_id, changes), received_at
+                 in copies[checkout_request_id] if callback_merchant_request_id == merchant_request_id),
+                None,
+            )
+            if match is None:
+                continue
+            changes, received_at = match
+            # Still conditional, so a callback applied inline meanwhile isn't overwritten.
+            if MpesaTransaction.objects.filter(
+                checkout_request_id=checkout_request_id, result_code__isnull=True
+            ).update(updated_at=now, callback_at=received_at, **changes):
+                outcomes.append((checkout_request_id, clerk_id, changes['result_code'], changes.get('amount', amount)))
+
+        record_outcomes(outcomes)
+        MpesaCallback.objects.filter(pk__in=[callback.pk for callback in staged]).update(processed_at=now)
+    return len(staged), len(outcomes)
+
+
+def record_outcomes(outcomes):
+    """
+    Side effects of newly recorded payments, given (checkout_request_id,
+    clerk_id, result_code, amount) tuples: dashboard counters, promoting
+    payers to freelancer (plus their Clerk role sync), and pushed status.
+    """
+    totals = Counter()
+    for _, _, result_code, amount in outcomes:
+        totals.update(dashboard.transaction_contribution(result_code, amount))
+    dashboard.bump(**totals)
+
+    paid = [(key, clerk_id) for key, clerk_id, result_code, _ in outcomes if result_code == '0' and clerk_id]
+    if paid:
+        users = set(ClerkUser.objects.filter(clerk_id__in={clerk_id for _, clerk_id in paid}).values_list('clerk_id', flat=True))
+        ClerkUser.objects.filter(clerk_id__in=users).update(role='freelancer', updated_at=timezone.now())
+        # Clerk is updated by the process_role_sync worker so the ACK isn't held up.
+        ClerkRoleSyncJob.objects.bulk_create(
+            [
+                ClerkRoleSyncJob(clerk_id=clerk_id, role='freelancer', idempotency_key=f"mpesa:{key}")
+                for key, clerk_id in paid if clerk_id in users
+            ],
+            ignore_conflicts=True,
+        )
+        for key, clerk_id in paid:
+            if clerk_id not in users:
+                print("User not found for clerk_id:", clerk_id)
+
+    statuses = [(key, payment_events.transaction_status(result_code)) for key, _, result_code, _ in outcomes]
+    transaction.on_commit(lambda: [payment_events.publish(key, status) for key, status in statuses])
@@ -0,0 +1,175 @@
+"""
+Reconciliation of ``ClerkUser`` with the Clerk Users API.
+
+Users normally arrive through the Clerk webhook, so a missed delivery leaves
+a row stale or missing for good. ``reconcile()`` (``manage.py
+reconcile_clerk_users``) pages through ``GET /users`` in creation order,
+fetching up to CLERK_SYNC_CONCURRENCY pages ahead on a thread pool while the
+pages are applied in order: each page is diffed against the matching local
+rows only, new and changed users are written with one upsert, and every
+user seen gets ``synced_at``. The offset reached is saved on the
+``ClerkSyncRun`` with each page, so an interrupted run resumes there.
+
+After the last page, rows the run didn't see are candidates for deletion.
+Offset paging can skip a user when others are deleted in Clerk mid-run, so
+each candidate is looked up individually and only deleted on a 404.
+"""
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import integrations, webhooks
+from .models import ClerkSyncRun, ClerkUser
+
+# Local fields compared with Clerk's to decide whether a row needs writing.
+COMPARED_FIELDS = ('first_name', 'last_name', 'email', 'role')
+DELETE_CHUNK_SIZE = 500
+
+
+class ClerkSyncError(Exception):
+    pass
+
+
+def clerk_get(path, **params):
+    if not settings.CLERK_SECRET_KEY:
+        raise ClerkSyncError("CLERK_SECRET_KEY not set in environment.")
+    try:
+        return integrations.clerk_api.get(
+            f"{settings.CLERK_API_URL}{path}",
+            headers={"Authorization": f"Bearer {settings.CLERK_SECRET_KEY}"},
+            params=params,
+        )
+    except requests.exceptions.RequestException as e:
+        raise ClerkSyncError(str(e)) from e
+
+
+def fetch_page(offset, limit):
+    """One page of Clerk users, oldest first. Raises ClerkSyncError."""
+    resp = clerk_get("/users", limit=limit, offset=offset, order_by="+created_at")
+    if resp.status_code != 200:
+        raise ClerkSyncError(f"Clerk API responded {resp.status_code}: {resp.text[:500]}")
+    data = resp.json()
+    # The list endpoint returns a bare array; tolerate the {"data": [...]} envelope too.
+    return data.get('data', []) if isinstance(data, dict) else data
+
+
+def fetch_user(clerk_id):
+    """The Clerk user object, or None if Clerk no longer has the user."""
+    resp = clerk_get(f"/users/{clerk_id}")
+    if resp.status_code == 404:
+        return None
+    if resp.status_code != 200:
+        raise ClerkSyncError(f"Clerk API responded {resp.status_code}: {resp.text[:500]}")
+    return resp.json()
+
+
+def pages(start, page_size, concurrency):
+    """
+    Yields ``(offset, users)`` pages in order from ``start``, keeping up to
+    ``concurrency`` requests in flight, until a page comes back short.
+    """
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        ahead = deque()
+        next_offset, exhausted = start, False
+        while True:
+            while not exhausted and len(ahead) < max(1, concurrency):
+                ahead.append((next_offset, pool.submit(fetch_page, next_offset, page_size)))
+                next_offset += page_size
+            if not ahead:
+                return
+            offset, future = ahead.popleft()
+            users = future.result()
+            if len(users) < page_size:
+                exhausted = True
+            if users:
+                yield offset, users
+
+
+def reconcile(resume=False, page_size=None, concurrency=None, delete=True, progress=None):
+    """
+    Runs (or with ``resume``, continues the latest unfinished) reconciliation
+    and returns its ClerkSyncRun. ``progress`` is called with the run after
+    each page. Raises ClerkSyncError if Clerk can't be read; the run can then
+    be resumed.
+    """
+    page_size = page_size or settings.CLERK_SYNC_PAGE_SIZE
+    concurrency = concurrency or settings.CLERK_SYNC_CONCURRENCY
+    run = ClerkSyncRun.objects.filter(finished_at__isnull=True).order_by('-id').first() if resume else None
+    if run is None:
+        run = ClerkSyncRun.objects.create()
+
+    for offset, users in pages(run.next_offset, page_size, concurrency):
+        apply_page(run, offset, users)
+        if progress:
+            progress(run)
+
+    if delete:
+        delete_unseen(run, concurrency)
+    run.finished_at = timezone.now()
+    run.save(update_fields=['finished_at'])
+    return run
+
+
+def apply_page(run, offset, users):
+    """
+    Writes one page's new and changed users, marks the rest seen, and
+    checkpoints the run (at ``offset`` + the page, unless ``offset`` is None).
+    """
+    remote = {}
+    for data in users:
+        user = webhooks.clerk_user(data)
+        if user.clerk_id:
+            remote[user.clerk_id] = user
+    local = {
+        clerk_id: values
+        for clerk_id, *values in ClerkUser.objects.filter(clerk_id__in=remote).values_list('clerk_id', *COMPARED_FIELDS)
+    }
+    changed = [
+        user for clerk_id, user in remote.items()
+        if local.get(clerk_id) != [getattr(user, field) for field in COMPARED_FIELDS]
+    ]
+
+    now = timezone.now()
+    for user in changed:
+        user.synced_at = now
+    with transaction.atomic():
+        errors = webhooks.upsert_users(changed, update_fields=webhooks.USER_FIELDS + ['synced_at'])
+        changed_ids = {user.clerk_id for user in changed}
+        ClerkUser.objects.filter(clerk_id__in=[clerk_id for clerk_id in remote if clerk_id not in changed_ids]).update(synced_at=now)
+
+        run.seen += len(remote)
+        run.created += sum(1 for user in changed if user.clerk_id not in local and user.clerk_id not in errors)
+        run.updated += sum(1 for user in changed if user.clerk_id in local and user.clerk_id not in errors)
+        run.failed += len(errors)
+        if offset is not None:
+            run.next_offset = offset + len(users)
+        run.save(update_fields=['seen', 'created', 'updated', 'failed', 'next_offset'])
+
+
+def delete_unseen(run, concurrency):
+    """Deletes users that existed before the run, weren't seen by it, and Clerk confirms are gone."""
+    unseen = list(
+        ClerkUser.objects.filter(created_at__lt=run.started_at)
+        .filter(Q(synced_at__isnull=True) | Q(synced_at__lt=run.started_at))
+        .values_list('clerk_id', flat=True)
+    )
+    if not unseen:
+        return
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        found = dict(zip(unseen, pool.map(fetch_user, unseen)))
+
+    skipped = [data for data in found.values() if data is not None]
+    if skipped:
+        apply_page(run, None, skipped)
+    gone = [clerk_id for clerk_id, data in found.items() if data is None]
+    for start in range(0, len(gone), DELETE_CHUNK_SIZE):
+        with transaction.atomic():
+            # delete() rather than raw SQL: its signals keep the dashboard counters right.
+            ClerkUser.objects.filter(clerk_id__in=gone[start:start + DELETE_CHUNK_SIZE]).delete()
+    run.deleted += len(gone)
+    run.save(update_fields=['deleted'])
@@ -0,0 +1,63 @@
+"""
+Conditional GET (ETag / Last-Modified) from ``updated_at`` columns.
+
+Views describe the rows behind a response with ``validator_queryset()``; one
+``Max('updated_at')`` + ``Count`` aggregate over it yields the validators,
+and a request whose ``If-None-Match`` (or ``If-Modified-Since``) still
+matches gets a bodiless 304 before anything is loaded or serialized. The
+row count in the ETag catches deletes, which ``Max('updated_at')`` can't.
+Writes through ``QuerySet.update()`` don't touch ``auto_now`` fields and
+must set ``updated_at`` explicitly to be seen.
+"""
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from . import cache
+
+
+class ConditionalGetMixin:
+    """
+    For ``APIView`` subclasses. List it before ``CachedResponseMixin`` so its
+    validators replace the content ETag that mixin would set.
+    """
+
+    def validator_queryset(self, request, *args, **kwargs):
+        raise NotImplementedError
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return super().dispatch(request, *args, **kwargs)
+
+        etag, last_modified = self.get_validators(request, *args, **kwargs)
+        not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        response = not_modified or super().dispatch(request, *args, **kwargs)
+        if not_modified is not None or response.status_code == 200:
+            response['ETag'] = etag
+            if last_modified is not None:
+                response['Last-Modified'] = http_date(last_modified)
+        return response
+
+    def get_validators(self, request, *args, **kwargs):
+        state = self.validator_queryset(request, *args, **kwargs).aggregate(
+            last_modified=Max('updated_at'), count=Count('pk')
+        )
+        newest = state['last_modified']
+        # Query string and Accept are part of the tag: each page and format is a different representation.
+        parts = [request.get_full_path(), request.headers.get('Accept', ''), str(state['count']), newest and newest.isoformat()]
+        namespace = getattr(self, 'cache_namespace', None)
+        if namespace:
+            # Covers changes to related rows (e.g. a gig creator's name) that don't bump updated_at here.
+            parts.append(str(cache.get_version(namespace)))
+        etag = 'W/"%s"' % hashlib.md5("|".join(str(part) for part in parts).encode()).hexdigest()
+
+        # HTTP dates have one-second resolution, so a second that hasn't ended
+        # yet can't be used: a later write in it would look unmodified. Nor can
+        # a date vouch for related rows, so namespaced views rely on the ETag.
+        last_modified = None
+        if namespace is None and newest is not None and int(newest.timestamp()) < int(timezone.now().timestamp()):
+            last_modified = int(newest.timestamp())
+        return etag, last_modified
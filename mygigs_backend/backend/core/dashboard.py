@@ -0,0 +1,97 @@
+"""
+Precomputed aggregates for the admin dashboard.
+
+Counters live in ``DashboardStat``/``DailySignupStat`` and are adjusted
+incrementally by the signal handlers in core/signals.py. Code that writes
+through ``QuerySet.update()`` or ``bulk_create()`` bypasses those signals and
+must call ``bump()``/``bump_signups()`` itself; ``rebuild_stats()`` (also
+``manage.py rebuild_dashboard_stats``) recomputes everything from scratch.
+The handlers skip raw saves, so run it after ``loaddata`` too.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import ClerkUser, DailySignupStat, DashboardStat, Freelancer, Gig, MpesaTransaction, Testimonial
+
+COUNTERS = (
+    'gigs', 'freelancers', 'testimonials', 'users',
+    'transactions', 'successful_transactions', 'failed_transactions', 'revenue',
+)
+
+
+def transaction_contribution(result_code, amount):
+    """What one MpesaTransaction adds to the transaction counters."""
+    result_code = None if result_code in (None, '') else str(result_code)
+    successful = result_code == '0'
+    return {
+        'successful_transactions': 1 if successful else 0,
+        'failed_transactions': 1 if result_code is not None and not successful else 0,
+        'revenue': Decimal(amount or 0) if successful else Decimal(0),
+    }
+
+
+def bump(**deltas):
+    """Adds each delta to its counter with an atomic UPDATE ... SET value = value + delta."""
+    for name, delta in deltas.items():
+        if not delta:
+            continue
+        if not DashboardStat.objects.filter(name=name).update(value=F('value') + delta):
+            DashboardStat.objects.get_or_create(name=name)
+            DashboardStat.objects.filter(name=name).update(value=F('value') + delta)
+
+
+def bump_signups(day, delta):
+    if not DailySignupStat.objects.filter(day=day).update(count=F('count') + delta):
+        DailySignupStat.objects.get_or_create(day=day)
+        DailySignupStat.objects.filter(day=day).update(count=F('count') + delta)
+
+
+def rebuild_stats():
+    """Recomputes every counter from the source tables."""
+    transactions = MpesaTransaction.objects.aggregate(
+        total=Count('id'),
+        successful=Count('id', filter=Q(result_code='0')),
+        failed=Count('id', filter=Q(result_code__isnull=False) & ~Q(result_code__in=['', '0'])),
+        revenue=Sum('amount', filter=Q(result_code='0')),
+    )
+    values = {
+        'gigs': Gig.objects.count(),
+        'freelancers': Freelancer.objects.count(),
+        'testimonials': Testimonial.objects.count(),
+        'users': ClerkUser.objects.count(),
+        'transactions': transactions['total'],
+        'successful_transactions': transactions['successful'],
+        'failed_transactions': transactions['failed'],
+        'revenue': transactions['revenue'] or 0,
+    }
+    for name, value in values.items():
+        DashboardStat.objects.update_or_create(name=name, defaults={'value': value})
+
+    signups = (
+        ClerkUser.objects.annotate(day=TruncDate('created_at'))
+        .values('day').annotate(count=Count('clerk_id')).order_by()
+    )
+    DailySignupStat.objects.all().delete()
+    DailySignupStat.objects.bulk_create([DailySignupStat(day=row['day'], count=row['count']) for row in signups])
+
+
+def summary():
+    values = dict(DashboardStat.objects.values_list('name', 'value'))
+    stats = {name: int(values.get(name, 0)) for name in COUNTERS if name != 'revenue'}
+    stats['revenue'] = f"{Decimal(values.get('revenue', 0)):.2f}"
+    completed = stats['successful_transactions'] + stats['failed_transactions']
+    stats['pending_transactions'] = stats['transactions'] - completed
+    stats['success_rate'] = round(stats['successful_transactions'] / completed, 4) if completed else None
+    return stats
+
+
+def signups_per_day(days):
+    since = timezone.now().date() - timedelta(days=days - 1)
+    return [
+        {'date': day.isoformat(), 'count': count}
+        for day, count in DailySignupStat.objects.filter(day__gte=since).order_by('day').values_list('day', 'count')
+    ]
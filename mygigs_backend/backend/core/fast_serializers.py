@@ -0,0 +1,163 @@
+"""
+Read-only serialization of list endpoints straight from ``.values()`` rows.
+
+DRF's ModelSerializer builds a model instance per row and then runs every
+value through a field object, which dominates the CPU time of our list
+views. Each ``ValuesSerializer`` here reproduces one DRF serializer's output
+(same keys, order and value formats, so the rendered JSON is byte-for-byte
+the same) from a ``.values()`` queryset with an explicit column list.
+``KeysetListMixin.list_response()`` switches to the matching one for the
+serializer it is given while FAST_LIST_SERIALIZERS is on.
+
+Keep ``fields`` in step with the DRF serializer: a field added there and not
+here is silently missing from list responses. FastSerializerTests compares
+the two.
+"""
+from decimal import Context, Decimal
+
+from django.conf import settings
+from django.db import models
+from django.utils import timezone
+
+from . import images
+from .models import ClerkUser, Freelancer, Gig, MpesaTransaction, Testimonial
+from .serializers import (
+    ClerkUserSerializer, FreelancerSerializer, GigSerializer, MpesaTransactionSerializer, TestimonialSerializer,
+)
+
+
+def format_datetime(value, tz):
+    """As DRF's DateTimeField renders it."""
+    value = value.astimezone(tz).isoformat()
+    return value[:-6] + 'Z' if value.endswith('+00:00') else value
+
+
+class ValuesSerializer:
+    """
+    Output keys are ``fields``, in DRF's order. A key with a ``get_<name>``
+    method is computed from the row like a SerializerMethodField; any other
+    key is the model field of that name, formatted as DRF formats its type.
+    ``optional`` keys are annotations, output as they are and only when the
+    queryset has them, as DRF skips read-only fields the instance doesn't have.
+    """
+    model = None
+    fields = ()
+    optional = ()
+    # Further columns the get_<name> methods read.
+    extra_columns = ()
+
+    def values(self, queryset):
+        columns = [
+            name for name in self.fields
+            if not hasattr(self, f'get_{name}') and (name not in self.optional or name in queryset.query.annotations)
+        ]
+        return queryset.values(*columns, *self.extra_columns)
+
+    def formatter(self, field, tz, request):
+        if isinstance(field, models.DateTimeField):
+            return lambda value: format_datetime(value, tz)
+        if isinstance(field, models.DateField):
+            return lambda value: value.isoformat()
+        if isinstance(field, models.DecimalField):
+            exponent, context = Decimal('.1') ** field.decimal_places, Context(prec=field.max_digits)
+            return lambda value: '{:f}'.format(value.quantize(exponent, context=context))
+        if isinstance(field, models.FileField):
+            def url(name):
+                if not name:
+                    return None
+                url = field.storage.url(name)
+                return request.build_absolute_uri(url) if request is not None else url
+            return url
+        return None
+
+    def serialize(self, rows, request=None):
+        """The list of dicts DRF's ``serializer_class(instances, many=True).data`` would give for ``rows``."""
+        # Resolved once per call rather than per value, like the export streams.
+        tz = timezone.get_current_timezone()
+        plan = []
+        for name in self.fields:
+            method = getattr(self, f'get_{name}', None)
+            if method is not None:
+                plan.append((name, None, method))
+            elif name in self.optional:
+                plan.append((name, None, None))
+            else:
+                plan.append((name, self.formatter(self.model._meta.get_field(name), tz, request), None))
+
+        data = []
+        for row in rows:
+            item = {}
+            for name, formatter, method in plan:
+                if method is not None:
+                    item[name] = method(row, request)
+                    continue
+                if name not in row:
+                    continue
+                value = row[name]
+                item[name] = formatter(value) if formatter is not None and value is not None else value
+            data.append(item)
+        return data
+
+
+class ClerkUserValuesSerializer(ValuesSerializer):
+    model = ClerkUser
+    fields = ('clerk_id', 'first_name', 'last_name', 'email', 'created_at', 'updated_at', 'role')
+
+
+class MpesaTransactionValuesSerializer(ValuesSerializer):
+    model = MpesaTransaction
+    fields = (
+        'id', 'merchant_request_id', 'checkout_request_id', 'phone_number', 'amount', 'result_code', 'result_desc',
+        'mpesa_receipt_number', 'transaction_date', 'created_at', 'updated_at', 'callback_at', 'clerk_id',
+    )
+
+
+class FreelancerValuesSerializer(ValuesSerializer):
+    model = Freelancer
+    fields = (
+        'id', 'skill_overlap', 'profile_image_variants', 'name', 'profession', 'bio', 'clerk_id', 'profile_image',
+        'years_of_experience', 'skills', 'availability', 'phone_number', 'city', 'country',
+    )
+    optional = ('skill_overlap',)
+    extra_columns = ('profile_image_variants',)
+
+    def get_profile_image_variants(self, row, request):
+        return images.urls_for(row['profile_image'], row['profile_image_variants'], request)
+
+
+class TestimonialValuesSerializer(ValuesSerializer):
+    model = Testimonial
+    fields = ('id', 'author_name', 'text', 'created_at')
+
+
+class GigValuesSerializer(ValuesSerializer):
+    model = Gig
+    fields = (
+        'id', 'creator_name', 'image_variants', 'title', 'description', 'price', 'location', 'image',
+        'created_at', 'updated_at', 'creator',
+    )
+    extra_columns = ('image_variants', 'creator__profession', 'creator__name')
+
+    def get_image_variants(self, row, request):
+        return images.urls_for(row['image'], row['image_variants'], request)
+
+    def get_creator_name(self, row, request):
+        if row['creator'] is not None:
+            return f"{row['creator__profession']} {row['creator__name']}"
+        return "Unknown"
+
+
+FAST_SERIALIZERS = {
+    ClerkUserSerializer: ClerkUserValuesSerializer(),
+    MpesaTransactionSerializer: MpesaTransactionValuesSerializer(),
+    FreelancerSerializer: FreelancerValuesSerializer(),
+    TestimonialSerializer: TestimonialValuesSerializer(),
+    GigSerializer: GigValuesSerializer(),
+}
+
+
+def for_serializer(serializer_class):
+    """The ValuesSerializer standing in for ``serializer_class``, or None to use DRF."""
+    if not settings.FAST_LIST_SERIALIZERS:
+        return None
+    return FAST_SERIALIZERS.get(serializer_class)
@@ -0,0 +1,188 @@
+"""
+Resized JPEG and WebP variants of uploaded gig and profile images.
+
+``Gig.image`` and ``Freelancer.profile_image`` keep the raw upload. After the
+transaction that saved a new upload commits, ``schedule()`` hands it to a
+small thread pool that renders every IMAGE_VARIANT_WIDTHS width (never wider
+than the original) in both formats and stores them next to it, e.g.
+``gig_images/photo.jpg`` -> ``gig_images/photo.w480.webp``. The storage names
+go into the model's variants JSONField::
+
+    {"source": "gig_images/photo.jpg", "webp": {"160": ..., "480": ...}, "jpeg": {...}}
+
+``source`` says which upload they were made from, so variants of a replaced
+image are never served. ``generate_image_variants`` backfills existing rows.
+The row is updated with ``update()``, which skips signals, so cached list
+responses are invalidated here.
+"""
+import io
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from . import cache
+from .models import Freelancer, Gig
+
+# model -> (image field, variants field)
+IMAGE_FIELDS = {
+    Gig: ('image', 'image_variants'),
+    Freelancer: ('profile_image', 'profile_image_variants'),
+}
+
+# Variant formats, in the order clients should prefer them, with their Pillow encoder settings.
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def is_current(variants, name):
+    """True if ``variants`` were rendered from the upload stored as ``name``."""
+    return bool(name) and bool(variants) and variants.get('source') == name
+
+
+def variant_name(name, width, extension):
+    return f"{os.path.splitext(name)[0]}.w{width}.{extension}"
+
+
+def render(file, widths):
+    """
+    Decodes the image in ``file`` once and yields ``(width, extension, bytes)``
+    for each requested width that is narrower than the original, in each of
+    FORMATS. An image narrower than every width gets one variant at its own size.
+    """
+    image = Image.open(file)
+    largest = max(widths)
+    if image.width > largest:
+        # Lets the JPEG decoder downscale by up to 8x while decoding, which is most of the cost for phone photos.
+        image.draft('RGB', (largest, max(1, image.height * largest // image.width)))
+    image = ImageOps.exif_transpose(image)
+    has_alpha = image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info
+    image = image.convert('RGBA' if has_alpha else 'RGB')
+
+    for width in [w for w in sorted(widths) if w < image.width] or [image.width]:
+        resized = image.resize((width, max(1, round(image.height * width / image.width))), Image.LANCZOS, reducing_gap=3.0)
+        for extension, (encoder, params) in FORMATS.items():
+            frame = resized
+            if has_alpha and encoder == 'JPEG':
+                frame = Image.new('RGB', resized.size, (255, 255, 255))
+                frame.paste(resized, mask=resized.getchannel('A'))
+            buffer = io.BytesIO()
+            frame.save(buffer, encoder, **params)
+            yield width, extension, buffer.getvalue()
+
+
+def generate(model, pk, force=False):
+    """
+    Renders and stores the variants for one row and records them on it.
+    Returns the variants dict, or None if there was nothing to do (no image,
+    already current, or the image was replaced while rendering).
+    """
+    image_field, variants_field = IMAGE_FIELDS[model]
+    row = model.objects.filter(pk=pk).values(image_field, variants_field).first()
+    if not row or not row[image_field]:
+        return None
+    name, previous = row[image_field], row[variants_field] or {}
+    if is_current(previous, name) and not force:
+        return None
+
+    variants = {'source': name, **{extension: {} for extension in FORMATS}}
+    try:
+        with default_storage.open(name) as file:
+            for width, extension, data in render(file, settings.IMAGE_VARIANT_WIDTHS):
+                target = variant_name(name, width, extension)
+                if default_storage.exists(target):
+                    default_storage.delete(target)
+                variants[extension][str(width)] = default_storage.save(target, ContentFile(data))
+    except (OSError, Image.DecompressionBombError) as e:
+        print(f"Could not render variants of {name} ({model.__name__} {pk}): {e}")
+        return None
+
+    changes = {variants_field: variants}
+    if any(field.name == 'updated_at' for field in model._meta.fields):
+        changes['updated_at'] = timezone.now()
+    # Only if the row still points at the upload these were made from.
+    if not model.objects.filter(pk=pk, **{image_field: name}).update(**changes):
+        delete_files(variants)
+        return None
+    cache.invalidate(*cache.DEPENDENCIES[model.__name__])
+    if previous.get('source') != name:
+        delete_files(previous)
+    return variants
+
+
+def delete_files(variants):
+    for extension in FORMATS:
+        for name in (variants or {}).get(extension, {}).values():
+            default_storage.delete(name)
+
+
+def _generate_in_background(model, pk):
+    try:
+        generate(model, pk)
+    except Exception as e:
+        print(f"Image variants for {model.__name__} {pk} failed: {e}")
+    finally:
+        # Pool threads are long-lived; don't leave a connection open per thread.
+        connection.close()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=settings.IMAGE_VARIANT_WORKERS, thread_name_prefix='image-variants')
+        return _executor
+
+
+def schedule(instance):
+    """
+    Queues variant generation for ``instance`` once the current transaction
+    commits, unless it has no image or its variants are already current.
+    """
+    model = type(instance)
+    image_field, variants_field = IMAGE_FIELDS[model]
+    name = getattr(instance, image_field).name
+    if not settings.IMAGE_VARIANTS_ENABLED or not name or is_current(getattr(instance, variants_field), name):
+        return
+    pk = instance.pk
+    transaction.on_commit(lambda: get_executor().submit(_generate_in_background, model, pk))
+
+
+def variant_urls(instance, request=None):
+    """
+    The public URLs of ``instance``'s current variants as
+    ``{"webp": {"160": url, ...}, "jpeg": {...}, "srcset": {"webp": "url 160w, ...", ...}}``,
+    or None while there are none. URLs are absolute when ``request`` is given,
+    as DRF's ImageField renders them.
+    """
+    image_field, variants_field = IMAGE_FIELDS[type(instance)]
+    return urls_for(getattr(instance, image_field).name, getattr(instance, variants_field), request)
+
+
+def urls_for(name, variants, request=None):
+    """variant_urls() from the stored image name and variants column, e.g. of a ``.values()`` row."""
+    if not is_current(variants, name):
+        return None
+
+    urls = {}
+    for extension in FORMATS:
+        urls[extension] = {}
+        for width, variant_name in variants.get(extension, {}).items():
+            url = default_storage.url(variant_name)
+            urls[extension][width] = request.build_absolute_uri(url) if request is not None else url
+    urls['srcset'] = {
+        extension: ", ".join(f"{url} {width}w" for width, url in sorted(urls[extension].items(), key=lambda item: int(item[0])))
+        for extension in FORMATS
+    }
+    return urls
@@ -0,0 +1,218 @@
+"""
+Shared HTTP clients for the third-party APIs we call (Safaricom Daraja, Clerk).
+
+Each upstream gets its own keep-alive ``requests.Session`` with per-host
+connection pools, connect/read timeouts, retries with backoff for idempotent
+methods, and latency metrics. Use these instead of bare ``requests`` calls.
+Async views use the ``httpx``-based ``AsyncIntegrationClient`` counterparts,
+which share the same settings and metrics.
+"""
+import asyncio
+import threading
+import time
+import weakref
+from collections import deque
+
+import httpx
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from . import metrics
+
+
+class UpstreamMetrics:
+    """Call counts and a rolling window of latencies for one upstream."""
+
+    def __init__(self, window=1024):
+        self.calls = 0
+        self.errors = 0
+        self._latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds, error=False):
+        metrics.record('http', seconds)
+        with self._lock:
+            self.calls += 1
+            if error:
+                self.errors += 1
+            self._latencies.append(seconds * 1000)
+
+    def snapshot(self):
+        with self._lock:
+            latencies = sorted(self._latencies)
+            calls, errors = self.calls, self.errors
+        return {
+            "calls": calls,
+            "errors": errors,
+            "p50_ms": metrics.percentile(latencies, 50),
+            "p95_ms": metrics.percentile(latencies, 95),
+            "p99_ms": metrics.percentile(latencies, 99),
+            "max_ms": round(latencies[-1], 2) if latencies else None,
+        }
+
+
+class IntegrationClient:
+    """
+    A pooled, keep-alive HTTP client for one upstream service.
+
+    Only idempotent methods (GET, HEAD, PUT, DELETE, ...) are retried, on
+    connection errors and 429/5xx responses; POST and PATCH are sent once so
+    a payment is never initiated twice.
+    """
+
+    retry_statuses = (429, 500, 502, 503, 504)
+
+    def __init__(self, name, connect_timeout=3.05, read_timeout=15, retries=2,
+                 backoff_factor=0.3, pool_connections=4, pool_maxsize=10):
+        self.name = name
+        self.timeout = (connect_timeout, read_timeout)
+        self.metrics = UpstreamMetrics()
+
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=self.retry_statuses,
+            allowed_methods=Retry.DEFAULT_ALLOWED_METHODS,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        start = time.perf_counter()
+        try:
+            response = self.session.request(method, url, **kwargs)
+        except requests.exceptions.RequestException:
+            self.metrics.record(time.perf_counter() - start, error=True)
+            raise
+        self.metrics.record(time.perf_counter() - start, error=response.status_code >= 500)
+        return response
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def patch(self, url, **kwargs):
+        return self.request("PATCH", url, **kwargs)
+
+
+class _AsyncPool:
+    """One small ``httpx.AsyncClient`` pool; callers queue on ``slots``, not inside httpx."""
+
+    def __init__(self, size, timeout):
+        self.client = httpx.AsyncClient(
+            timeout=timeout, limits=httpx.Limits(max_connections=size, max_keepalive_connections=size)
+        )
+        self.slots = asyncio.Semaphore(size)
+        self.in_flight = 0
+
+
+class AsyncIntegrationClient:
+    """
+    The ``httpx.AsyncClient`` counterpart of ``IntegrationClient``, with the
+    same timeouts, retry rules (idempotent methods only) and metrics.
+
+    httpcore scans every connection in a pool for every queued request, which
+    grows quadratically with pool size under load, so ``max_connections`` is
+    spread over several pools of ``pool_size`` and each request goes to the
+    least busy one. Connections belong to the event loop that opened them, so
+    the pools are kept per running loop: under an ASGI server, one set per worker.
+    """
+
+    retry_statuses = IntegrationClient.retry_statuses
+    idempotent_methods = frozenset(Retry.DEFAULT_ALLOWED_METHODS)
+
+    def __init__(self, name, connect_timeout=3.05, read_timeout=15, retries=2,
+                 backoff_factor=0.3, max_connections=100, pool_size=10):
+        self.name = name
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self.pool_size = max(1, min(pool_size, max_connections))
+        self.pool_count = max(1, max_connections // self.pool_size)
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.metrics = UpstreamMetrics()
+        self._pools = weakref.WeakKeyDictionary()
+
+    def _pool(self):
+        loop = asyncio.get_running_loop()
+        pools = self._pools.get(loop)
+        if pools is None:
+            pools = self._pools[loop] = [_AsyncPool(self.pool_size, self.timeout) for _ in range(self.pool_count)]
+        return min(pools, key=lambda pool: pool.in_flight)
+
+    async def _send(self, method, url, **kwargs):
+        pool = self._pool()
+        pool.in_flight += 1
+        try:
+            async with pool.slots:
+                return await pool.client.request(method, url, **kwargs)
+        finally:
+            pool.in_flight -= 1
+
+    async def request(self, method, url, **kwargs):
+        attempts = self.retries + 1 if method.upper() in self.idempotent_methods else 1
+        for attempt in range(attempts):
+            if attempt:
+                await asyncio.sleep(self.backoff_factor * (2 ** (attempt - 1)))
+            start = time.perf_counter()
+            try:
+                response = await self._send(method, url, **kwargs)
+            except httpx.TransportError:
+                self.metrics.record(time.perf_counter() - start, error=True)
+                if attempt + 1 == attempts:
+                    raise
+                continue
+            self.metrics.record(time.perf_counter() - start, error=response.status_code >= 500)
+            if response.status_code not in self.retry_statuses or attempt + 1 == attempts:
+                return response
+
+    async def get(self, url, **kwargs):
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url, **kwargs):
+        return await self.request("POST", url, **kwargs)
+
+
+def _client(name, retries=None):
+    return IntegrationClient(
+        name,
+        connect_timeout=settings.HTTP_CONNECT_TIMEOUT,
+        read_timeout=settings.HTTP_READ_TIMEOUT,
+        retries=settings.HTTP_MAX_RETRIES if retries is None else retries,
+        backoff_factor=settings.HTTP_RETRY_BACKOFF,
+        pool_maxsize=settings.HTTP_POOL_MAXSIZE,
+    )
+
+
+def _async_client(name):
+    return AsyncIntegrationClient(
+        name,
+        connect_timeout=settings.HTTP_CONNECT_TIMEOUT,
+        read_timeout=settings.HTTP_READ_TIMEOUT,
+        retries=settings.HTTP_MAX_RETRIES,
+        backoff_factor=settings.HTTP_RETRY_BACKOFF,
+        max_connections=settings.HTTP_ASYNC_MAX_CONNECTIONS,
+        pool_size=settings.HTTP_ASYNC_POOL_SIZE,
+    )
+
+
+mpesa = _client("mpesa")
+clerk_api = _client("clerk_api")
+# A request waits on a JWKS fetch for an unknown kid, so fail fast: JWKSKeyStore
+# bounds the timeout and keeps serving the keys it has.
+clerk_jwks = _client("clerk_jwks", retries=0)
+mpesa_async = _async_client("mpesa_async")
+
+CLIENTS = {client.name: client for client in (mpesa, clerk_api, clerk_jwks, mpesa_async)}
+
+
+def metrics_snapshot():
+    """Latency and error metrics for every upstream, keyed by client name."""
+    return {name: client.metrics.snapshot() for name, client in CLIENTS.items()}
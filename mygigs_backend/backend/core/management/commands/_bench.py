@@ -0,0 +1,154 @@
+"""
+Helpers shared by the benchmark commands.
+"""
+import asyncio
+import io
+import os
+import statistics
+import tempfile
+import time
+from contextlib import contextmanager
+from decimal import Decimal
+
+from django.db import connection
+
+from core.models import MpesaTransaction
+
+RESULT_CODES = ['0', '0', '0', '0', '1032', '1037', '2001', None]
+
+
+@contextmanager
+def temporary_database(on_disk=False):
+    """
+    Runs the block against a freshly migrated throwaway database (the same one
+    the test runner would create), so benchmarks never touch real data.
+    ``on_disk`` puts a SQLite test database in a temporary file instead of
+    shared-cache memory, which locks up under writers on several threads.
+    """
+    test_settings = connection.settings_dict.setdefault('TEST', {})
+    old_test_name = test_settings.get('NAME')
+    if on_disk and connection.vendor == 'sqlite':
+        test_settings['NAME'] = os.path.join(tempfile.mkdtemp(), 'bench.sqlite3')
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        test_settings['NAME'] = old_test_name
+
+
+def wsgi_post(app, path, body):
+    """Calls a WSGI application in-process and returns the response status code."""
+    environ = {
+        'REQUEST_METHOD': 'POST', 'PATH_INFO': path, 'SCRIPT_NAME': '', 'QUERY_STRING': '',
+        'SERVER_NAME': 'localhost', 'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1',
+        'HTTP_HOST': 'localhost', 'CONTENT_TYPE': 'application/json', 'CONTENT_LENGTH': str(len(body)),
+        'wsgi.input': io.BytesIO(body), 'wsgi.errors': io.StringIO(), 'wsgi.url_scheme': 'http',
+        'wsgi.version': (1, 0), 'wsgi.multithread': True, 'wsgi.multiprocess': False, 'wsgi.run_once': False,
+    }
+    result = {}
+
+    def start_response(status, headers, exc_info=None):
+        result['status'] = int(status.split()[0])
+
+    response = app(environ, start_response)
+    b''.join(response)
+    response.close()
+    return result['status']
+
+
+class AsgiRequest:
+    """
+    One request to an ASGI application, driven in-process without a server.
+    Records the status and when each body chunk arrives; the client stays
+    connected until the response is complete.
+    """
+
+    def __init__(self, app, path, method='GET', body=b'', content_type=None):
+        self.app, self.path, self.method, self.body = app, path, method, body
+        self.headers = [(b'host', b'localhost')]
+        if content_type:
+            self.headers.append((b'content-type', content_type.encode()))
+        if body:
+            self.headers.append((b'content-length', str(len(body)).encode()))
+        self.status = None
+        self.chunks = []
+        self.closed = asyncio.Event()
+
+    async def run(self):
+        path, _, query = self.path.partition('?')
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'scheme': 'http',
+            'method': self.method, 'path': path, 'raw_path': path.encode(), 'root_path': '',
+            'query_string': query.encode(), 'headers': self.headers,
+            'server': ('localhost', 80), 'client': ('127.0.0.1', 50000),
+        }
+        await self.app(scope, self.receive, self.send)
+        return self
+
+    async def receive(self):
+        if not hasattr(self, '_sent_request'):
+            self._sent_request = True
+            return {'type': 'http.request', 'body': self.body, 'more_body': False}
+        await self.closed.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(self, message):
+        if message['type'] == 'http.response.start':
+            self.status = message['status']
+        elif message['type'] == 'http.response.body':
+            if message.get('body'):
+                self.chunks.append((time.perf_counter(), message['body']))
+            if not message.get('more_body'):
+                self.closed.set()
+
+    @property
+    def content(self):
+        return b''.join(chunk for _, chunk in self.chunks)
+
+
+def time_calls(fn, repeat):
+    """Calls ``fn`` ``repeat`` times and returns the timings in milliseconds."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def summarize(timings):
+    timings = sorted(timings)
+    return f"mean {statistics.mean(timings):8.2f} ms  p50 {statistics.median(timings):8.2f} ms  max {timings[-1]:8.2f} ms"
+
+
+def seed_transactions(rows):
+    """
+    Replaces MpesaTransaction with ``rows`` synthetic transactions spread
+    over 2025, completed ones with a callback 5-64s after creation. Returns
+    the seconds taken.
+    """
+    started = time.perf_counter()
+    table = MpesaTransaction._meta.db_table
+    with connection.cursor() as cursor:
+        # Not delete(): its per-row signals would take longer than the benchmark.
+        cursor.execute(f"DELETE FROM {table}")
+    for start in range(0, rows, 50_000):
+        MpesaTransaction.objects.bulk_create([
+            MpesaTransaction(
+                checkout_request_id=f"ws_CO_{i}", merchant_request_id=f"m_{i}", phone_number=f"2547{(i * 7) % 200_000:08d}",
+                amount=Decimal(10 + i % 990), result_code=RESULT_CODES[i % len(RESULT_CODES)],
+                result_desc="The service request is processed successfully.", clerk_id=f"user_{(i * 31) % 10_000}",
+            )
+            for i in range(start, min(start + 50_000, rows))
+        ], batch_size=5000)
+    # bulk_create stamps every row with the same auto_now_add time; spread them over a year.
+    with connection.cursor() as cursor:
+        cursor.execute(f"UPDATE {table} SET created_at = datetime('2025-01-01', '+' || ((rowid * 7919) % 31536000) || ' seconds')")
+        cursor.execute(
+            f"UPDATE {table} SET callback_at = CASE WHEN result_code IS NULL THEN NULL "
+            f"ELSE datetime(created_at, '+' || (5 + rowid % 60) || ' seconds') END"
+        )
+        cursor.execute(f"UPDATE {table} SET updated_at = datetime(created_at, '+1 hour')")
+        cursor.execute("ANALYZE")
+    return time.perf_counter() - started
@@ -0,0 +1,187 @@
+"""
+Local stand-ins for the third-party APIs we integrate with, used by the
+benchmark and load-test commands so they never touch the real services.
+"""
+import itertools
+import json
+import multiprocessing
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+
+class Server(ThreadingHTTPServer):
+    # The default listen backlog of 5 drops connection bursts from concurrent load tests.
+    request_queue_size = 1024
+
+
+class StubServer:
+    """
+    Threaded HTTP server on an ephemeral localhost port.
+
+    ``routes`` maps ``(method, path)`` to a callable taking a ``StubRequest``
+    and returning ``(status_code, json_payload)``; a path ending in ``/*``
+    matches any last segment (e.g. ``/v1/users/*``). ``latency`` (seconds) is
+    added to every response to approximate a round-trip to the real upstream.
+    Load tests should pass ``separate_process=True`` (Linux, uses fork) so the
+    stub's threads don't compete with the code under test for the GIL.
+    """
+
+    def __init__(self, routes, latency=0.0, separate_process=False):
+        self.routes = routes
+        self.latency = latency
+        self.separate_process = separate_process
+        # Shared memory, so hits served by a forked stub process are visible here.
+        self._hits = multiprocessing.get_context("fork").Value("i", 0)
+        self._server = None
+        self._runner = None
+
+    @property
+    def hits(self):
+        return self._hits.value
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body go out in separate writes; don't let Nagle delay the second one.
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                self._dispatch()
+
+            def do_POST(self):
+                self._dispatch()
+
+            def do_PATCH(self):
+                self._dispatch()
+
+            def _dispatch(self):
+                with stub._hits.get_lock():
+                    stub._hits.value += 1
+                if stub.latency:
+                    time.sleep(stub.latency)
+
+                split = urlsplit(self.path)
+                route = stub.routes.get((self.command, split.path)) or stub.routes.get(
+                    (self.command, split.path.rsplit("/", 1)[0] + "/*")
+                )
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                if route is None:
+                    status_code, payload = 404, {"error": "not found"}
+                else:
+                    status_code, payload = route(StubRequest(self, split, body))
+
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status_code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = Server(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        if self.separate_process:
+            self._runner = multiprocessing.get_context("fork").Process(target=self._server.serve_forever, daemon=True)
+        else:
+            self._runner = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._runner.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.separate_process:
+            self._runner.terminate()
+            self._runner.join()
+        else:
+            self._server.shutdown()
+        self._server.server_close()
+
+
+class StubRequest:
+    def __init__(self, handler, split, body):
+        self.method = handler.command
+        self.path = split.path
+        self.query = {k: v[-1] for k, v in parse_qs(split.query).items()}
+        self.headers = handler.headers
+        self.body = body
+
+    def json(self):
+        return json.loads(self.body or b"{}")
+
+
+def jwks_routes(jwks):
+    """Routes serving ``jwks`` (a dict, or a callable returning one) at the Clerk JWKS path."""
+    def handle(request):
+        return 200, jwks() if callable(jwks) else jwks
+    return {("GET", "/.well-known/jwks.json"): handle}
+
+
+def daraja_routes(expires_in=3599):
+    """Routes mimicking the Safaricom Daraja OAuth and STK push endpoints."""
+    counter = itertools.count(1)
+
+    def generate_token(request):
+        if request.query.get("grant_type") != "client_credentials":
+            return 400, {"errorMessage": "Invalid grant type passed"}
+        return 200, {"access_token": f"stub-token-{next(counter)}", "expires_in": str(expires_in)}
+
+    def stk_push(request):
+        if not request.headers.get("Authorization", "").startswith("Bearer stub-token-"):
+            return 401, {"errorMessage": "Invalid Access Token"}
+        n = next(counter)
+        return 200, {
+            "MerchantRequestID": f"stub-merchant-{n}",
+            "CheckoutRequestID": f"ws_CO_stub_{n}",
+            "ResponseCode": "0",
+            "ResponseDescription": "Success. Request accepted for processing",
+            "CustomerMessage": "Success. Request accepted for processing",
+        }
+
+    return {
+        ("GET", "/oauth/v1/generate"): generate_token,
+        ("POST", "/mpesa/stkpush/v1/processrequest"): stk_push,
+    }
+
+
+def clerk_user(n, **overrides):
+    """A Clerk Backend API user object, as ``GET /v1/users`` returns them."""
+    user = {
+        "id": f"user_{n}", "object": "user", "first_name": f"First {n}", "last_name": "Stub",
+        "primary_email_address_id": f"idn_{n}",
+        "email_addresses": [{"id": f"idn_{n}", "object": "email_address", "email_address": f"user{n}@example.com"}],
+        "public_metadata": {"role": "user"}, "created_at": 1_700_000_000_000 + n, "updated_at": 1_700_000_000_000 + n,
+    }
+    user.update(overrides)
+    return user
+
+
+def clerk_users_routes(users):
+    """
+    Routes mimicking the Clerk Users API list (limit/offset) and lookup
+    endpoints over ``users``, a list of user objects kept in ``created_at``
+    order (as ``order_by=+created_at`` returns them).
+    """
+    by_id = {user["id"]: user for user in users}
+
+    def list_users(request):
+        limit, offset = min(int(request.query.get("limit", 10)), 500), int(request.query.get("offset", 0))
+        return 200, users[offset:offset + limit]
+
+    def get_user(request):
+        found = by_id.get(request.path.rsplit("/", 1)[1])
+        if found is None:
+            return 404, {"errors": [{"code": "resource_not_found", "message": "not found"}]}
+        return 200, found
+
+    return {("GET", "/v1/users"): list_users, ("GET", "/v1/users/*"): get_user}
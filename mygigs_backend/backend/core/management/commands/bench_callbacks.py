@@ -0,0 +1,144 @@
+import contextlib
+import io
+import json
+import random
+import time
+
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import override_settings
+
+from core import dashboard
+from core.callbacks import drain_staged
+from core.metrics import percentile
+from core.models import ClerkRoleSyncJob, ClerkUser, MpesaCallback, MpesaTransaction
+
+from ._bench import temporary_database, wsgi_post
+
+
+def callback_body(i, success):
+    callback = {
+        "MerchantRequestID": f"m_{i}",
+        "CheckoutRequestID": f"ws_CO_{i}",
+        "ResultCode": 0 if success else 1032,
+        "ResultDesc": "The service request is processed successfully." if success else "Request cancelled by user",
+    }
+    if success:
+        callback["CallbackMetadata"] = {"Item": [
+            {"Name": "Amount", "Value": 10 + i % 7},
+            {"Name": "MpesaReceiptNumber", "Value": f"R{i:09d}"},
+            {"Name": "TransactionDate", "Value": 20261018101500},
+            {"Name": "PhoneNumber", "Value": 254708374149},
+        ]}
+    return json.dumps({"Body": {"stkCallback": callback}}).encode()
+
+
+class Command(BaseCommand):
+    help = (
+        "Replays synthetic Daraja callbacks (with redeliveries) through /core/callback/, applied "
+        "inline per request versus staged and drained in batches, and checks the results match."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--callbacks', type=int, default=5000, help="Distinct payments called back.")
+        parser.add_argument('--duplicates', type=float, default=0.2, help="Redeliveries, as a fraction of --callbacks.")
+        parser.add_argument('--batch-size', type=int, default=500, help="Staged callbacks applied per batch.")
+
+    def handle(self, *args, **options):
+        n = options['callbacks']
+        rng = random.Random(16)
+        outcomes = [rng.random() < 0.8 for _ in range(n)]
+        deliveries = [callback_body(i, success) for i, success in enumerate(outcomes)]
+        deliveries += [deliveries[rng.randrange(n)] for _ in range(int(n * options['duplicates']))]
+        rng.shuffle(deliveries)
+
+        with temporary_database(on_disk=True):
+            ClerkUser.objects.bulk_create(
+                [ClerkUser(clerk_id=f"user_{i}", email=f"user{i}@example.com") for i in range(n // 10)]
+            )
+            MpesaTransaction.objects.bulk_create([
+                MpesaTransaction(checkout_request_id=f"ws_CO_{i}", merchant_request_id=f"m_{i}",
+                                 amount=10, clerk_id=f"user_{i % (n // 5)}")
+                for i in range(n)
+            ])
+            self.stdout.write(
+                f"{len(deliveries)} callbacks for {n} payments ({len(deliveries) - n} redeliveries, "
+                f"{sum(outcomes)} successful)\n"
+            )
+            app = WSGIHandler()
+            results = {}
+            for mode in ('inline', 'staged'):
+                self.reset()
+                with override_settings(MPESA_CALLBACK_MODE=mode):
+                    self.replay(app, mode, deliveries, options['batch_size'])
+                results[mode] = self.snapshot()
+
+            if results['inline'] == results['staged']:
+                self.stdout.write("\nBoth modes left identical transactions, users, role sync jobs and dashboard counters.")
+            else:
+                self.stderr.write("\nModes disagree: " + ", ".join(
+                    name for name in results['inline'] if results['inline'][name] != results['staged'][name]
+                ))
+
+    def reset(self):
+        MpesaTransaction.objects.update(
+            result_code=None, result_desc=None, mpesa_receipt_number=None, transaction_date=None, phone_number=None,
+        )
+        ClerkUser.objects.update(role='user')
+        ClerkRoleSyncJob.objects.all().delete()
+        MpesaCallback.objects.all().delete()
+        dashboard.rebuild_stats()
+
+    def replay(self, app, mode, deliveries, batch_size):
+        queries = [0]
+
+        def count(execute, sql, params, many, context):
+            queries[0] += 1
+            return execute(sql, params, many, context)
+
+        timings = []
+        # The callback handlers print a line per callback; keep them out of the report.
+        with connection.execute_wrapper(count), contextlib.redirect_stdout(io.StringIO()):
+            started = time.perf_counter()
+            for body in deliveries:
+                start = time.perf_counter()
+                if wsgi_post(app, '/core/callback/', body) != 200:
+                    raise RuntimeError("callback was not acknowledged")
+                timings.append((time.perf_counter() - start) * 1000)
+            ingest = time.perf_counter() - started
+            ingest_queries = queries[0]
+
+            drained, started = 0, time.perf_counter()
+            while True:
+                batch, _ = drain_staged(batch_size)
+                if not batch:
+                    break
+                drained += batch
+            drain = time.perf_counter() - started
+
+        timings.sort()
+        self.stdout.write(
+            f"{mode:<7} ACK: {len(deliveries) / ingest:7.1f} callbacks/s, latency p50 {percentile(timings, 50):.2f} ms "
+            f"p95 {percentile(timings, 95):.2f} ms, {ingest_queries / len(deliveries):.1f} queries per callback"
+        )
+        if drained:
+            self.stdout.write(
+                f"        drain: {drained} staged in {drain:.2f}s ({drained / drain:.0f} callbacks/s), "
+                f"{(queries[0] - ingest_queries) / drained:.2f} queries per callback; "
+                f"end to end {len(deliveries) / (ingest + drain):.1f} callbacks/s"
+            )
+
+    def snapshot(self):
+        counters = dashboard.summary()
+        dashboard.rebuild_stats()
+        if dashboard.summary() != counters:
+            self.stderr.write(f"Dashboard counters drifted: {counters} != {dashboard.summary()}")
+        return {
+            'transactions': list(MpesaTransaction.objects.order_by('id').values_list(
+                'checkout_request_id', 'result_code', 'result_desc', 'mpesa_receipt_number', 'transaction_date', 'phone_number',
+            )),
+            'users': list(ClerkUser.objects.order_by('clerk_id').values_list('clerk_id', 'role')),
+            'role sync jobs': sorted(ClerkRoleSyncJob.objects.values_list('idempotency_key', 'clerk_id')),
+            'dashboard': counters,
+        }
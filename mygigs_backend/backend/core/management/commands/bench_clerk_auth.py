@@ -0,0 +1,94 @@
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+import rsa
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+from jose import jwk, jwt
+
+from core.auth import JWKSKeyStore, VerifiedTokenCache
+from core.views import ClerkJWTAuthentication
+
+from ._stubs import StubServer, jwks_routes
+
+ISSUER = "https://clerk.bench.local"
+
+
+def make_signing_key(kid, bits=2048):
+    _, private_key = rsa.newkeys(bits)
+    pem = private_key.save_pkcs1().decode("utf-8")
+    public_jwk = jwk.construct(pem, "RS256").public_key().to_dict()
+    public_jwk.update({"kid": kid, "use": "sig"})
+    return pem, public_jwk
+
+
+class Command(BaseCommand):
+    help = "Benchmarks Clerk JWT authentication latency against a local stub JWKS server."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=300, help="Authenticated requests per scenario.")
+        parser.add_argument('--latency-ms', type=float, default=40, help="Simulated JWKS round-trip latency.")
+        parser.add_argument('--concurrency', type=int, default=8, help="Threads issuing requests in the burst scenario.")
+
+    def handle(self, *args, **options):
+        self.stdout.write("Generating RSA signing keys...")
+        old_pem, old_jwk = make_signing_key("bench-key-1")
+        new_pem, new_jwk = make_signing_key("bench-key-2")
+        published = {"keys": [old_jwk]}
+
+        with StubServer(jwks_routes(lambda: published), latency=options['latency_ms'] / 1000) as stub:
+            jwks_url = f"{stub.url}/.well-known/jwks.json"
+            token = self._token(old_pem, "bench-key-1")
+            n = options['requests']
+
+            self._report("per-request JWKS fetch (before)", stub, self._time(n, lambda: self._uncached_auth(jwks_url, token)))
+
+            authenticator = ClerkJWTAuthentication()
+            authenticator.issuer = ISSUER
+            authenticator.key_store = store = JWKSKeyStore(jwks_url)
+            authenticator.token_cache = VerifiedTokenCache(maxsize=0)
+            request = RequestFactory().get("/", HTTP_AUTHORIZATION=f"Bearer {token}")
+            self._report("cached key store", stub, self._time(n, lambda: authenticator.authenticate(request)))
+
+            authenticator.token_cache = token_cache = VerifiedTokenCache()
+            self._report("cached key store + verified tokens", stub, self._time(n, lambda: authenticator.authenticate(request)))
+
+            # Rotate keys and hit the server with a concurrent burst of tokens signed by the new key:
+            # the whole burst should be served by a single refetch.
+            published["keys"] = [old_jwk, new_jwk]
+            rotated = RequestFactory().get("/", HTTP_AUTHORIZATION=f"Bearer {self._token(new_pem, 'bench-key-2')}")
+            fetches_before = store.fetch_count
+            with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+                timings = list(pool.map(lambda _: self._timed(lambda: authenticator.authenticate(rotated)), range(n)))
+            self._report("burst after key rotation", stub, timings)
+            self.stdout.write(f"  JWKS refetches during burst: {store.fetch_count - fetches_before}")
+            self.stdout.write(f"  verified-token cache: {token_cache.stats()}")
+
+    def _token(self, pem, kid):
+        claims = {"sub": "user_bench", "iss": ISSUER, "exp": int(time.time()) + 3600}
+        return jwt.encode(claims, pem, algorithm="RS256", headers={"kid": kid})
+
+    def _uncached_auth(self, jwks_url, token):
+        jwks = requests.get(jwks_url).json()
+        kid = jwt.get_unverified_header(token)["kid"]
+        key = next(k for k in jwks["keys"] if k["kid"] == kid)
+        return jwt.decode(token, key, algorithms=["RS256"], issuer=ISSUER)
+
+    def _timed(self, fn):
+        start = time.perf_counter()
+        fn()
+        return (time.perf_counter() - start) * 1000
+
+    def _time(self, n, fn):
+        return [self._timed(fn) for _ in range(n)]
+
+    def _report(self, label, stub, timings):
+        timings = sorted(timings)
+        p95 = timings[int(len(timings) * 0.95) - 1]
+        self.stdout.write(
+            f"{label:<36} mean {statistics.mean(timings):7.2f} ms  "
+            f"p50 {statistics.median(timings):7.2f} ms  p95 {p95:7.2f} ms  "
+            f"(stub hits so far: {stub.hits})"
+        )
@@ -0,0 +1,66 @@
+import contextlib
+import io
+import time
+
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from core import dashboard, webhooks
+from core.clerk_sync import reconcile
+from core.models import ClerkSyncRun, ClerkUser
+
+from ._bench import temporary_database
+from ._stubs import StubServer, clerk_user, clerk_users_routes
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs reconcile_clerk_users against a local fake Clerk Users API with N users while the "
+        "local table has drifted (missing, stale and deleted-in-Clerk users), at several page "
+        "concurrencies, and checks the table matches Clerk afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100_000, help="Users in the fake Clerk.")
+        parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 8], help="Parallel page fetches to try.")
+        parser.add_argument('--page-size', type=int, default=500, help="Users per page.")
+        parser.add_argument('--latency-ms', type=float, default=50, help="Simulated Clerk API round-trip latency.")
+
+    def handle(self, *args, **options):
+        n = options['users']
+        remote = [clerk_user(i) for i in range(n)]
+        # Locally: 10% never arrived, 5% are stale, and 2% more were deleted in Clerk.
+        local = [webhooks.clerk_user(user) for i, user in enumerate(remote) if i % 10]
+        for i, user in enumerate(local):
+            if i % 20 == 0:
+                user.first_name = "Stale"
+        local += [webhooks.clerk_user(clerk_user(n + i)) for i in range(n // 50)]
+
+        with temporary_database(on_disk=True), \
+                StubServer(clerk_users_routes(remote), latency=options['latency_ms'] / 1000, separate_process=True) as stub, \
+                override_settings(CLERK_API_URL=f"{stub.url}/v1", CLERK_SECRET_KEY="sk_test_bench"):
+            self.stdout.write(
+                f"{n} Clerk users, {len(local)} local rows before each run; pages of {options['page_size']}, "
+                f"Clerk stub latency {options['latency_ms']:g} ms\n"
+            )
+            expected = {user['id']: user['first_name'] for user in remote}
+            for concurrency in options['concurrency']:
+                self.reset(local)
+                started = time.perf_counter()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    run = reconcile(page_size=options['page_size'], concurrency=concurrency)
+                elapsed = time.perf_counter() - started
+
+                actual = dict(ClerkUser.objects.values_list('clerk_id', 'first_name'))
+                self.stdout.write(
+                    f"  concurrency {concurrency:>2}: {run.seen / elapsed:8.0f} rows/s ({elapsed:.1f}s); "
+                    f"{run.created} created, {run.updated} updated, {run.deleted} deleted; "
+                    f"matches Clerk: {actual == expected}, dashboard counts {dashboard.summary()['users']}"
+                )
+
+    def reset(self, local):
+        with contextlib.redirect_stdout(io.StringIO()):
+            ClerkUser.objects.all().delete()
+            ClerkSyncRun.objects.all().delete()
+            ClerkUser.objects.bulk_create(local, batch_size=5000)
+            dashboard.rebuild_stats()
@@ -0,0 +1,144 @@
+import contextlib
+import io
+import json
+import random
+import time
+from datetime import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+from django.test.utils import override_settings
+from svix.webhooks import Webhook
+
+from core import dashboard
+from core.models import ClerkUser, ClerkWebhookEvent
+from core.views import clerk_webhook_handler
+from core.webhooks import drain_events
+
+from ._bench import temporary_database
+
+SECRET = "whsec_YmVuY2gtc2VjcmV0LWZvci1jbGVyay13ZWJob29rcw=="
+
+
+def event_body(i, event_type, clerk_id, timestamp):
+    data = {"id": clerk_id, "object": "user", "deleted": True} if event_type == 'user.deleted' else {
+        "id": clerk_id, "object": "user", "first_name": f"First {i}", "last_name": "Bench",
+        "primary_email_address_id": f"idn_{clerk_id}",
+        "email_addresses": [{"id": f"idn_{clerk_id}", "email_address": f"{clerk_id}@example.com"}],
+        "public_metadata": {"role": "user"},
+    }
+    return json.dumps({"type": event_type, "object": "event", "timestamp": timestamp, "data": data})
+
+
+def previous_handler(request):
+    """The handler as it was: a new verifier per call, then get_or_create and a second save per event."""
+    Webhook(settings.CLERK_WEBHOOK_SECRET).verify(request.body.decode(), request.headers)
+    evt = json.loads(request.body)
+    user_data = evt.get("data", {})
+    if evt["type"] in ("user.created", "user.updated"):
+        defaults = {
+            "first_name": user_data.get("first_name"), "last_name": user_data.get("last_name"),
+            "email": user_data.get("email_addresses", [{}])[0].get("email_address"),
+            "role": user_data.get("public_metadata", {}).get("role", "user"),
+        }
+        user, created = ClerkUser.objects.get_or_create(clerk_id=user_data.get("id"), defaults=defaults)
+        if not created:
+            for name, value in defaults.items():
+                setattr(user, name, value)
+            user.save()
+    elif evt["type"] == "user.deleted":
+        ClerkUser.objects.filter(clerk_id=user_data.get("id")).delete()
+
+
+class Command(BaseCommand):
+    help = (
+        "Replays a fixture of signed Clerk user.created/updated/deleted webhooks (with redeliveries and "
+        "out-of-order arrivals) through the previous per-event handler, the inline handler, and the queued "
+        "handler plus process_clerk_webhooks' drain, and checks each leaves every user at its newest state."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--events', type=int, default=50_000, help="Distinct webhook messages.")
+        parser.add_argument('--users', type=int, default=10_000, help="Users the events are spread over.")
+        parser.add_argument('--duplicates', type=float, default=0.05, help="Redeliveries, as a fraction of --events.")
+        parser.add_argument('--batch-size', type=int, default=1000, help="Queued events applied per batch.")
+
+    def handle(self, *args, **options):
+        deliveries, expected = self.fixture(options['events'], options['users'], options['duplicates'])
+        self.stdout.write(
+            f"{len(deliveries)} deliveries ({options['events']} events over {options['users']} users, "
+            f"{options['duplicates']:.0%} redelivered, ~10% out of order)"
+        )
+
+        with temporary_database(on_disk=True), override_settings(CLERK_WEBHOOK_SECRET=SECRET):
+            self.run("previous handler", deliveries, expected, lambda: self.replay(deliveries, previous_handler))
+            self.run("inline", deliveries, expected, lambda: self.replay(deliveries, clerk_webhook_handler))
+            with override_settings(CLERK_WEBHOOK_MODE='queued'):
+                self.run("queued", deliveries, expected, lambda: self.replay_queued(deliveries, options['batch_size']))
+
+    def fixture(self, n, users, duplicates):
+        rng = random.Random(21)
+        events, expected, timestamp = [], {}, 1_760_000_000_000
+        for i in range(n):
+            clerk_id = f"user_{rng.randrange(users)}"
+            event_type = 'user.created' if clerk_id not in expected else rng.choices(['user.updated', 'user.deleted'], [19, 1])[0]
+            if expected.get(clerk_id) is None and clerk_id in expected:
+                event_type = 'user.created'
+            timestamp += rng.randint(1, 50)
+            events.append((f"msg_{i}", event_body(i, event_type, clerk_id, timestamp)))
+            expected[clerk_id] = None if event_type == 'user.deleted' else f"First {i}"
+        # Deliveries that overtake the one before them, and redeliveries of random earlier messages.
+        for i in range(1, len(events)):
+            if rng.random() < 0.1:
+                events[i - 1], events[i] = events[i], events[i - 1]
+        for _ in range(int(n * duplicates)):
+            events.insert(rng.randrange(len(events)), events[rng.randrange(len(events))])
+        return events, {clerk_id: name for clerk_id, name in expected.items() if name is not None}
+
+    def requests(self, deliveries):
+        """Signs every delivery now (Svix rejects timestamps more than five minutes off)."""
+        factory, verifier, now = RequestFactory(), Webhook(SECRET), datetime.now()
+        stamp = str(int(now.timestamp()))
+        return [
+            factory.post('/core/clerk/', body, content_type='application/json', headers={
+                'svix-id': svix_id, 'svix-timestamp': stamp, 'svix-signature': verifier.sign(svix_id, now, body),
+            })
+            for svix_id, body in deliveries
+        ]
+
+    def replay(self, deliveries, handler):
+        requests = self.requests(deliveries)
+        with contextlib.redirect_stdout(io.StringIO()):
+            for request in requests:
+                handler(request)
+
+    def replay_queued(self, deliveries, batch_size):
+        started = time.perf_counter()
+        self.replay(deliveries, clerk_webhook_handler)
+        acked = time.perf_counter() - started
+        started = time.perf_counter()
+        while drain_events(batch_size)[0]:
+            pass
+        drained = time.perf_counter() - started
+        self.stdout.write(
+            f"    acknowledged {len(deliveries) / acked:.0f} deliveries/s, drained {len(deliveries) / drained:.0f} events/s "
+            f"in batches of {batch_size}"
+        )
+
+    def run(self, label, deliveries, expected, replay):
+        ClerkUser.objects.all().delete()
+        ClerkWebhookEvent.objects.all().delete()
+        dashboard.rebuild_stats()
+        self.stdout.write(f"  {label}:")
+        started = time.perf_counter()
+        replay()
+        elapsed = time.perf_counter() - started
+
+        actual = dict(ClerkUser.objects.values_list('clerk_id', 'first_name'))
+        wrong = sum(1 for clerk_id in expected.keys() | actual.keys() if expected.get(clerk_id) != actual.get(clerk_id))
+        counted = dashboard.summary()['users']
+        self.stdout.write(
+            f"    {len(deliveries) / elapsed:.0f} deliveries/s end to end ({elapsed:.1f}s); {len(actual)} users, "
+            f"{wrong} not at their newest state; dashboard counts {counted}"
+        )
@@ -0,0 +1,104 @@
+import json
+import os
+import re
+import shutil
+import statistics
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.test.utils import override_settings
+
+from core import images
+from core.models import Freelancer, Gig
+
+from ._bench import temporary_database
+
+EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+VARIANT_RE = re.compile(r"\.w\d+\.\w+$")
+
+
+class Command(BaseCommand):
+    help = (
+        "Seeds gigs with the images under MEDIA_ROOT/gig_images (copied to a temporary media root), "
+        "renders their variants, and compares the bytes a client downloads for one gig list page "
+        "showing the original uploads versus the resized JPEG/WebP variants."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--gigs', type=int, default=100, help="Gigs to seed, cycling through the sample images.")
+        parser.add_argument('--page-size', type=int, default=20, help="Gigs per list page.")
+        parser.add_argument('--source', default=os.path.join(settings.MEDIA_ROOT, 'gig_images'), help="Directory of sample images.")
+
+    def handle(self, *args, **options):
+        samples = sorted(
+            os.path.join(options['source'], name) for name in os.listdir(options['source'])
+            if name.lower().endswith(EXTENSIONS) and not VARIANT_RE.search(name)
+        ) if os.path.isdir(options['source']) else []
+        if not samples:
+            raise CommandError(f"No sample images in {options['source']}.")
+
+        media_root = tempfile.mkdtemp()
+        try:
+            with temporary_database(), override_settings(MEDIA_ROOT=media_root, IMAGE_VARIANTS_ENABLED=False, API_CACHE_TIMEOUT=0):
+                self.run(samples, options['gigs'], options['page_size'])
+        finally:
+            shutil.rmtree(media_root, ignore_errors=True)
+
+    def run(self, samples, n, page_size):
+        creator = Freelancer.objects.create(name="Bench", profession="Designer", years_of_experience="3", skills="", availability="Full-time")
+        for i in range(n):
+            with open(samples[i % len(samples)], 'rb') as f:
+                gig = Gig(creator=creator, title=f"Gig {i}", description="...", price=100 + i, location="Nairobi")
+                gig.image.save(os.path.basename(samples[i % len(samples)]), ContentFile(f.read()), save=False)
+                gig.save()
+
+        path = f"/core/gigs/?page_size={page_size}"
+        before = self.page(path)
+
+        timings = []
+        for pk in Gig.objects.values_list('pk', flat=True):
+            start = time.perf_counter()
+            images.generate(Gig, pk)
+            timings.append((time.perf_counter() - start) * 1000)
+        after = self.page(path)
+
+        self.stdout.write(
+            f"{n} gigs from {len(samples)} sample images; variants {settings.IMAGE_VARIANT_WIDTHS} px in "
+            f"{', '.join(images.FORMATS)}, rendered in {statistics.median(timings):.0f} ms median / {max(timings):.0f} ms max "
+            f"per upload (kept off the request path)\n"
+        )
+        originals = sum(self.size(gig['image']) for gig in before['results'])
+        rows = [("original uploads", before['json'], originals)]
+        for width in (str(w) for w in settings.IMAGE_VARIANT_WIDTHS):
+            for extension in images.FORMATS:
+                total = sum(self.variant_size(gig['image_variants'], extension, width) for gig in after['results'])
+                rows.append((f"{extension} {width}w", after['json'], total))
+
+        self.stdout.write(f"One page of {len(before['results'])} gigs ({path}):")
+        self.stdout.write(f"  {'images shown':<18} {'JSON':>10} {'images':>12} {'total':>12} {'vs original':>12}")
+        baseline = before['json'] + originals
+        for label, json_bytes, image_bytes in rows:
+            total = json_bytes + image_bytes
+            self.stdout.write(
+                f"  {label:<18} {json_bytes / 1024:>8.1f}KB {image_bytes / 1024:>10.1f}KB {total / 1024:>10.1f}KB "
+                f"{total / baseline:>11.1%}"
+            )
+
+    def page(self, path):
+        response = Client(HTTP_HOST="localhost").get(path)
+        if response.status_code != 200:
+            raise CommandError(f"GET {path} returned {response.status_code}")
+        return {'json': len(response.content), 'results': json.loads(response.content)['results']}
+
+    def variant_size(self, variants, extension, width):
+        """Bytes of the ``width`` variant, or of the widest one for images narrower than ``width``."""
+        urls = variants[extension]
+        return self.size(urls.get(width) or urls[max(urls, key=int)])
+
+    def size(self, url):
+        return default_storage.size(url[len(settings.MEDIA_URL):])
@@ -0,0 +1,81 @@
+import statistics
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import override_settings
+from rest_framework.renderers import JSONRenderer
+
+from core import fast_serializers
+from core.models import ClerkUser, Freelancer, Gig, MpesaTransaction, Testimonial
+from core.serializers import (
+    ClerkUserSerializer, FreelancerSerializer, GigSerializer, MpesaTransactionSerializer, TestimonialSerializer,
+)
+
+from ._bench import seed_transactions, temporary_database, time_calls
+
+LISTS = [
+    ("gigs", lambda: Gig.objects.select_related('creator').order_by('-created_at', '-id'), GigSerializer),
+    ("freelancers", lambda: Freelancer.objects.order_by('-id'), FreelancerSerializer),
+    ("users", lambda: ClerkUser.objects.order_by('-created_at', '-clerk_id'), ClerkUserSerializer),
+    ("testimonials", lambda: Testimonial.objects.order_by('-created_at', '-id'), TestimonialSerializer),
+    ("transactions", lambda: MpesaTransaction.objects.order_by('-created_at', '-id'), MpesaTransactionSerializer),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Times each list endpoint's DRF serializer against its core/fast_serializers.py counterpart "
+        "(query, serialize and render to JSON) at several row counts, and checks the JSON is identical."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10_000, 100_000], help="Row counts to try.")
+
+    def handle(self, *args, **options):
+        render = JSONRenderer().render
+        with temporary_database(on_disk=True), override_settings(DEBUG=False):
+            for n in options['rows']:
+                self.seed(n)
+                repeat = max(1, 30_000 // n)
+                self.stdout.write(f"\n{n} rows (median of {repeat})       DRF: serialize / total     values(): serialize / total   speedup  same JSON")
+                for label, queryset, serializer_class in LISTS:
+                    fast = fast_serializers.FAST_SERIALIZERS[serializer_class]
+                    instances = list(queryset())
+                    rows = list(fast.values(queryset()))
+                    same = render(serializer_class(instances, many=True).data) == render(fast.serialize(rows))
+
+                    drf_serialize = statistics.median(time_calls(lambda: render(serializer_class(instances, many=True).data), repeat))
+                    drf_total = statistics.median(time_calls(lambda: render(serializer_class(list(queryset()), many=True).data), repeat))
+                    fast_serialize = statistics.median(time_calls(lambda: render(fast.serialize(rows)), repeat))
+                    fast_total = statistics.median(time_calls(lambda: render(fast.serialize(list(fast.values(queryset())))), repeat))
+                    self.stdout.write(
+                        f"  {label:<13} {drf_serialize:12.1f} / {drf_total:8.1f} ms  {fast_serialize:14.1f} / {fast_total:8.1f} ms"
+                        f"  {drf_total / fast_total:7.1f}x  {same}"
+                    )
+
+    def seed(self, n):
+        with connection.cursor() as cursor:
+            # Not delete(): its per-row signals would take longer than the benchmark.
+            for model in (Gig, Freelancer, ClerkUser, Testimonial):
+                cursor.execute(f"DELETE FROM {model._meta.db_table}")
+        Freelancer.objects.bulk_create([
+            Freelancer(name=f"Freelancer {i}", profession="Developer", bio="Builds things.", years_of_experience="3",
+                       availability="Full-time", skills="django, react", city="Nairobi", country="Kenya",
+                       profile_image=f"freelancer_profiles/{i}.jpg" if i % 2 else None)
+            for i in range(n)
+        ], batch_size=5000)
+        creators = list(Freelancer.objects.values_list('id', flat=True))
+        Gig.objects.bulk_create([
+            Gig(creator_id=creators[i % len(creators)] if i % 10 else None, title=f"Gig {i}", description="A short brief.",
+                price=Decimal(500 + (i * 7919) % 19500) / 4, location="Nairobi", image=f"gig_images/{i}.png",
+                image_variants={"source": f"gig_images/{i}.png", "webp": {"480": f"gig_images/{i}.w480.webp"},
+                                "jpeg": {"480": f"gig_images/{i}.w480.jpeg"}} if i % 2 else {})
+            for i in range(n)
+        ], batch_size=5000)
+        ClerkUser.objects.bulk_create(
+            [ClerkUser(clerk_id=f"user_{i}", email=f"user{i}@example.com", first_name="Amina", last_name="Odhiambo") for i in range(n)],
+            batch_size=5000,
+        )
+        Testimonial.objects.bulk_create([Testimonial(author_name=f"Client {i}", text="Great work.") for i in range(n)], batch_size=5000)
+        seed_transactions(n)
@@ -0,0 +1,94 @@
+import asyncio
+import resource
+import statistics
+import threading
+import time
+
+from django.core.handlers.asgi import ASGIHandler
+from django.core.management.base import BaseCommand
+
+from core import payment_events
+from core.metrics import percentile
+from core.models import MpesaTransaction
+
+from ._bench import AsgiRequest, temporary_database
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares pushed payment status (SSE via the ASGI app) with polling /core/check-status/: "
+        "connections one worker holds, memory per connection, delivery latency and DB load."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--connections', type=int, default=1000, help="Concurrent clients waiting on a payment.")
+        parser.add_argument('--poll-interval', type=float, default=3.0, help="Seconds between polls in the baseline.")
+        parser.add_argument('--polls', type=int, default=500, help="Polls timed for the baseline.")
+
+    def handle(self, *args, **options):
+        n = options['connections']
+        with temporary_database():
+            MpesaTransaction.objects.bulk_create(
+                [MpesaTransaction(checkout_request_id=f"ws_CO_{i}", merchant_request_id=f"m_{i}", amount=10) for i in range(n)]
+            )
+            app = ASGIHandler()
+            self.polling_baseline(app, n, options['poll_interval'], options['polls'])
+            asyncio.run(self.push(app, n))
+
+    def polling_baseline(self, app, n, interval, polls):
+        async def poll_all():
+            timings = []
+            for i in range(polls):
+                start = time.perf_counter()
+                await AsgiRequest(app, f"/core/check-status/ws_CO_{i % n}/").run()
+                timings.append((time.perf_counter() - start) * 1000)
+            return timings
+
+        timings = sorted(asyncio.run(poll_all()))
+        mean = statistics.mean(timings)
+        self.stdout.write(f"Polling check-status every {interval:g}s:")
+        self.stdout.write(f"  per poll: mean {mean:.2f} ms, p95 {percentile(timings, 95):.2f} ms (one DB query each)")
+        self.stdout.write(f"  one worker saturates at ~{1000 / mean:.0f} polls/s = ~{interval * 1000 / mean:.0f} waiting clients")
+        self.stdout.write(
+            f"  {n} waiting clients: {n / interval:.0f} requests/s and DB queries/s, "
+            f"average {interval / 2:.1f}s extra delay before the result is seen\n"
+        )
+
+    async def push(self, app, n):
+        before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        started = time.perf_counter()
+        connections = [AsgiRequest(app, f"/core/check-status/ws_CO_{i}/stream/") for i in range(n)]
+        tasks = [asyncio.create_task(c.run()) for c in connections]
+        while payment_events.broker.listener_count() < n or sum(1 for c in connections if c.chunks) < n:
+            await asyncio.sleep(0.01)
+        opened = time.perf_counter() - started
+        # Growth of peak RSS (KiB on Linux) while the connections were opened.
+        held = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before
+
+        self.stdout.write(f"SSE stream, {n} connections held by one worker:")
+        self.stdout.write(f"  opened in {opened:.2f}s (one DB query each), ~{held / n:.1f} KiB RSS per connection")
+
+        # Callbacks arrive on another thread, as they would from the sync callback view.
+        published = {}
+
+        def callbacks():
+            for i, transaction in enumerate(MpesaTransaction.objects.order_by('id')):
+                transaction.result_code = '0' if i % 5 else '1032'
+                published[transaction.checkout_request_id] = time.perf_counter()
+                transaction.save()
+
+        started = time.perf_counter()
+        worker = threading.Thread(target=callbacks)
+        worker.start()
+        await asyncio.gather(*tasks)
+        worker.join()
+        elapsed = time.perf_counter() - started
+
+        latencies = sorted(
+            (c.chunks[-1][0] - published[c.path.split('/')[3]]) * 1000 for c in connections if len(c.chunks) > 1
+        )
+        self.stdout.write(
+            f"  {len(latencies)}/{n} results pushed in {elapsed:.2f}s; callback-to-client latency "
+            f"p50 {percentile(latencies, 50):.2f} ms, p95 {percentile(latencies, 95):.2f} ms, max {latencies[-1]:.2f} ms"
+        )
+        self.stdout.write("  no requests or DB queries while waiting")
@@ -0,0 +1,72 @@
+import random
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+
+from core.models import Gig
+from core.search import IcontainsSearchBackend, SQLiteFTSSearchBackend
+
+from ._bench import summarize, temporary_database, time_calls
+
+LOCATIONS = ["Nairobi", "Mombasa", "Kisumu", "Nakuru", "Eldoret", "Kampala", "Lagos", "Accra", "Kigali", "Dar es Salaam"]
+SERVICES = [
+    "logo design", "web development", "plumbing repair", "wedding photography", "house cleaning",
+    "mobile app", "bookkeeping", "hair braiding", "tutoring maths", "event catering", "car detailing",
+    "copywriting", "video editing", "electrical wiring", "interior painting", "social media marketing",
+]
+FILLER = (
+    "professional reliable affordable experienced quick friendly quality certified local team "
+    "weekend available tools included consultation portfolio references guaranteed clients"
+).split()
+
+QUERIES = [
+    ("logo design", {}),
+    ("plumbing", {"location": "Nairobi"}),
+    ("wedding photography", {"min_price": Decimal(2000), "max_price": Decimal(8000)}),
+    ("app", {}),
+    ("certified electrical", {"location": "Kampala", "max_price": Decimal(5000)}),
+]
+
+
+class Command(BaseCommand):
+    help = "Compares the gig search index against icontains scanning on synthetic gigs in a throwaway database."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100_000, help="Synthetic gigs to generate.")
+        parser.add_argument('--repeat', type=int, default=5, help="Runs per query.")
+
+    def handle(self, *args, **options):
+        with temporary_database():
+            self.seed(options['rows'])
+            backends = [("icontains scan", IcontainsSearchBackend()), ("FTS5 index", SQLiteFTSSearchBackend())]
+
+            start = time.perf_counter()
+            backends[1][1].rebuild()
+            self.stdout.write(f"Built FTS index over {options['rows']} gigs in {time.perf_counter() - start:.2f}s\n")
+
+            for query, filters in QUERIES:
+                self.stdout.write(f"q={query!r} {filters or ''}")
+                for label, backend in backends:
+                    total, ids = backend.search(query, **filters)
+                    timings = time_calls(lambda: backend.search(query, **filters), options['repeat'])
+                    self.stdout.write(f"  {label:<15} {summarize(timings)}  ({total} matches)")
+
+    def seed(self, rows):
+        rng = random.Random(42)
+        start = time.perf_counter()
+        batch = []
+        for i in range(rows):
+            service = rng.choice(SERVICES)
+            location = rng.choice(LOCATIONS)
+            batch.append(Gig(
+                title=f"{service.title()} in {location}",
+                description=" ".join([service, *rng.sample(FILLER, 12)]),
+                price=Decimal(rng.randrange(500, 20000)),
+                location=location,
+            ))
+            if len(batch) == 5000:
+                Gig.objects.bulk_create(batch)
+                batch = []
+        Gig.objects.bulk_create(batch)
+        self.stdout.write(f"Seeded {rows} gigs in {time.perf_counter() - start:.2f}s")
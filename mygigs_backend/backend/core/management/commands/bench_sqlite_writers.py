@@ -0,0 +1,144 @@
+import contextlib
+import io
+import multiprocessing
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection
+
+from core import dashboard
+from core.callbacks import apply_callback
+from core.metrics import percentile
+from core.models import ClerkUser, Freelancer, Gig, MpesaTransaction
+
+from ._bench import temporary_database
+
+# SQLite as Django opens it without SQLITE_OPTIONS: rollback journal, 5s busy timeout, DEFERRED transactions.
+CONFIGS = [
+    ("SQLite defaults", 'DELETE', {}),
+    ("SQLITE_OPTIONS", settings.SQLITE_JOURNAL_MODE, settings.SQLITE_OPTIONS),
+]
+
+
+def callback(i):
+    return {"Body": {"stkCallback": {
+        "MerchantRequestID": f"m_{i}", "CheckoutRequestID": f"ws_CO_{i}", "ResultCode": 0, "ResultDesc": "OK",
+        "CallbackMetadata": {"Item": [{"Name": "Amount", "Value": 10}, {"Name": "MpesaReceiptNumber", "Value": f"R{i}"}]},
+    }}}
+
+
+def writer(options, worker, workers, operations, gig_ids, results):
+    """
+    One worker process: applies its share of the M-Pesa callbacks, and every
+    tenth operation edits a gig the way the admin would (signals, search index).
+    """
+    connection.settings_dict['OPTIONS'] = options
+    timings, errors = [], 0
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            for n in range(operations):
+                start = time.perf_counter()
+                try:
+                    if n % 10 == 9:
+                        gig = Gig.objects.get(pk=gig_ids[(worker + n) % len(gig_ids)])
+                        gig.price += 1
+                        gig.save()
+                    else:
+                        apply_callback(callback(worker + n * workers))
+                except OperationalError:
+                    errors += 1
+                    continue
+                timings.append((time.perf_counter() - start) * 1000)
+    finally:
+        connection.close()
+        # Report even if the worker crashed, so the parent isn't left waiting.
+        results.put((timings, errors))
+
+
+def reader(options, stop, results):
+    connection.settings_dict['OPTIONS'] = options
+    reads, errors = 0, 0
+    while not stop.is_set():
+        try:
+            list(MpesaTransaction.objects.order_by('-created_at', '-id')[:21])
+            reads += 1
+        except OperationalError:
+            errors += 1
+    connection.close()
+    results.put((reads, errors))
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures write throughput and 'database is locked' errors with N processes applying M-Pesa "
+        "callbacks and admin edits concurrently, on SQLite defaults versus SQLITE_OPTIONS."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, nargs='+', default=[1, 4, 8, 16], help="Parallel writer processes to try.")
+        parser.add_argument('--operations', type=int, default=200, help="Writes per writer process.")
+        parser.add_argument('--readers', type=int, default=2, help="Processes reading the transaction list meanwhile.")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError("bench_sqlite_writers only applies to SQLite.")
+
+        most = max(options['writers']) * options['operations']
+        with temporary_database(on_disk=True):
+            users = ClerkUser.objects.bulk_create([ClerkUser(clerk_id=f"user_{i}", email=f"user{i}@example.com") for i in range(100)])
+            MpesaTransaction.objects.bulk_create([
+                MpesaTransaction(checkout_request_id=f"ws_CO_{i}", merchant_request_id=f"m_{i}", amount=10,
+                                 clerk_id=users[i % len(users)].clerk_id)
+                for i in range(most)
+            ])
+            creator = Freelancer.objects.create(name="Admin", profession="Ops", years_of_experience="1", skills="", availability="Full-time")
+            gig_ids = [Gig.objects.create(creator=creator, title=f"Gig {i}", description="...", price=100, location="Nairobi").pk
+                       for i in range(50)]
+
+            self.stdout.write(f"{options['operations']} writes per writer (9 callbacks : 1 gig edit), {options['readers']} reader(s)\n")
+            for label, journal_mode, db_options in CONFIGS:
+                self.stdout.write(f"{label} (journal_mode={journal_mode.lower()}, {db_options.get('transaction_mode') or 'DEFERRED'}, "
+                                  f"busy timeout {db_options.get('timeout', 5)}s):")
+                for workers in options['writers']:
+                    self.reset(journal_mode)
+                    self.run(db_options, workers, options['operations'], options['readers'], gig_ids)
+
+    def reset(self, journal_mode):
+        with contextlib.redirect_stdout(io.StringIO()):
+            MpesaTransaction.objects.update(result_code=None, result_desc=None, mpesa_receipt_number=None)
+            ClerkUser.objects.update(role='user')
+            dashboard.rebuild_stats()
+        with connection.cursor() as cursor:
+            cursor.execute(f"PRAGMA journal_mode={journal_mode}")
+        # Workers open their own connections; don't hand them this one across fork().
+        connection.close()
+
+    def run(self, db_options, workers, operations, readers, gig_ids):
+        context = multiprocessing.get_context('fork')
+        results, read_results, stop = context.Queue(), context.Queue(), context.Event()
+        reader_processes = [context.Process(target=reader, args=(db_options, stop, read_results)) for _ in range(readers)]
+        processes = [
+            context.Process(target=writer, args=(db_options, w, workers, operations, gig_ids, results))
+            for w in range(workers)
+        ]
+        for process in reader_processes:
+            process.start()
+        started = time.perf_counter()
+        for process in processes:
+            process.start()
+        outcomes = [results.get() for _ in processes]
+        elapsed = time.perf_counter() - started
+        stop.set()
+        reads = [read_results.get() for _ in reader_processes]
+        for process in processes + reader_processes:
+            process.join()
+
+        timings = sorted(t for worker_timings, _ in outcomes for t in worker_timings)
+        errors = sum(e for _, e in outcomes)
+        self.stdout.write(
+            f"  {workers:>2} writer(s): {len(timings) / elapsed:7.1f} writes/s, "
+            f"p50 {percentile(timings, 50) if timings else 0:.1f} ms p95 {percentile(timings, 95) if timings else 0:.1f} ms, "
+            f"{errors} 'database is locked' ({errors / (workers * operations):.1%}); "
+            f"reads {sum(r for r, _ in reads) / elapsed:.0f}/s with {sum(e for _, e in reads)} errors"
+        )
@@ -0,0 +1,99 @@
+import asyncio
+import json
+import statistics
+import threading
+import time
+
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from core import views
+from core.metrics import percentile
+from core.models import MpesaTransaction
+
+from ._bench import AsgiRequest, temporary_database, wsgi_post
+from ._stubs import StubServer, daraja_routes
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-tests STK push initiation against a local Daraja stub: the sync DRF view on "
+        "WSGI worker threads versus the async view on a single ASGI event loop."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=400, help="Payment initiations per run.")
+        parser.add_argument('--sync-workers', type=int, default=4, help="Sync workers (one request in flight each).")
+        parser.add_argument('--concurrency', type=int, default=200, help="In-flight requests on the async worker.")
+        parser.add_argument('--latency-ms', type=float, default=300, help="Simulated Daraja round-trip latency.")
+
+    def handle(self, *args, **options):
+        n = options['requests']
+        body = json.dumps({"phone_number": "254708374149", "amount": 1, "clerk_id": "user_bench"}).encode()
+
+        with temporary_database(on_disk=True), \
+                StubServer(daraja_routes(), latency=options['latency_ms'] / 1000, separate_process=True) as stub, \
+                override_settings(MPESA_BASE_URL=stub.url, MPESA_CALLBACK_URL="https://example.com/core/callback/",
+                                  CONSUMER_KEY="bench-key", CONSUMER_SECRET="bench-secret"):
+            views.mpesa_tokens.base_url = stub.url
+            self.stdout.write(f"{n} STK pushes, Daraja stub latency {options['latency_ms']:g} ms (token fetched once, then cached)\n")
+
+            self.report("sync view, WSGI", options['sync_workers'], *self.run_sync(
+                WSGIHandler(), body, n, options['sync_workers']
+            ))
+            self.report("async view, ASGI", 1, *asyncio.run(self.run_async(
+                ASGIHandler(), body, n, options['concurrency']
+            )))
+            self.stdout.write(f"\nDaraja stub served {stub.hits} calls; {MpesaTransaction.objects.count()} transactions recorded")
+
+    def run_sync(self, app, body, n, workers):
+        views.mpesa_tokens.invalidate()
+        timings, statuses, lock = [], [], threading.Lock()
+        remaining = iter(range(n))
+
+        def worker():
+            while True:
+                with lock:
+                    if next(remaining, None) is None:
+                        return
+                start = time.perf_counter()
+                code = wsgi_post(app, '/core/stk-push/', body)
+                with lock:
+                    timings.append((time.perf_counter() - start) * 1000)
+                    statuses.append(code)
+
+        started = time.perf_counter()
+        threads = [threading.Thread(target=worker) for _ in range(workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return time.perf_counter() - started, timings, statuses
+
+    async def run_async(self, app, body, n, concurrency):
+        await views.mpesa_tokens.ainvalidate()
+        semaphore = asyncio.Semaphore(concurrency)
+        timings, statuses = [], []
+
+        async def one():
+            async with semaphore:
+                start = time.perf_counter()
+                request = await AsgiRequest(app, '/core/async/stk-push/', 'POST', body, 'application/json').run()
+                timings.append((time.perf_counter() - start) * 1000)
+                statuses.append(request.status)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(n)))
+        return time.perf_counter() - started, timings, statuses
+
+    def report(self, label, workers, elapsed, timings, statuses):
+        timings.sort()
+        ok = sum(1 for code in statuses if code == 200)
+        self.stdout.write(
+            f"{label:<17} {workers} worker(s): {len(timings) / elapsed:7.1f} req/s "
+            f"({len(timings) / elapsed / workers:.1f} per worker), "
+            f"latency mean {statistics.mean(timings):.0f} ms p95 {percentile(timings, 95):.0f} ms, "
+            f"{ok}/{len(statuses)} OK in {elapsed:.2f}s"
+        )
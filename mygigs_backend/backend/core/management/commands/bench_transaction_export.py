@@ -0,0 +1,91 @@
+import io
+import time
+import tracemalloc
+
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.http import QueryDict
+from django.test.utils import override_settings
+
+from core import exports
+from core.models import MpesaTransaction
+
+from ._bench import seed_transactions, temporary_database
+
+
+def wsgi_get(app, path, query=''):
+    """
+    Calls a WSGI application in-process and consumes the body as a client
+    would. Returns (status, bytes, seconds to first byte, seconds in total).
+    """
+    environ = {
+        'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'SCRIPT_NAME': '', 'QUERY_STRING': query,
+        'SERVER_NAME': 'localhost', 'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1', 'HTTP_HOST': 'localhost',
+        'wsgi.input': io.BytesIO(), 'wsgi.errors': io.StringIO(), 'wsgi.url_scheme': 'http',
+        'wsgi.version': (1, 0), 'wsgi.multithread': True, 'wsgi.multiprocess': False, 'wsgi.run_once': False,
+    }
+    result = {}
+
+    def start_response(status, headers, exc_info=None):
+        result['status'] = int(status.split()[0])
+
+    started = time.perf_counter()
+    response = app(environ, start_response)
+    size, first_byte = 0, None
+    for chunk in response:
+        if first_byte is None and chunk:
+            first_byte = time.perf_counter() - started
+        size += len(chunk)
+    response.close()
+    return result['status'], size, first_byte, time.perf_counter() - started
+
+
+class Command(BaseCommand):
+    help = (
+        "Seeds a throwaway database with synthetic M-Pesa transactions and downloads them through "
+        "/core/transactions/export/ (CSV and NDJSON) and the old full-table /core/transactions/ list, "
+        "reporting throughput, time to first byte and peak Python memory."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000, help="Synthetic transactions to export.")
+        parser.add_argument('--list-rows', type=int, default=100_000, help="Rows for the /core/transactions/ comparison (0 to skip).")
+
+    def handle(self, *args, **options):
+        app = WSGIHandler()
+        # API_CACHE_TIMEOUT=0 so the list view can't answer from cache; DEBUG off so queries aren't logged.
+        with temporary_database(on_disk=True), override_settings(DEBUG=False, API_CACHE_TIMEOUT=0):
+            if options['list_rows']:
+                self.seed(options['list_rows'])
+                self.stdout.write(f"\n{options['list_rows']} transactions")
+                self.measure(app, "/core/transactions/ (JSON list)", '/core/transactions/')
+                self.measure(app, "export csv", '/core/transactions/export/')
+
+            self.seed(options['rows'])
+            self.stdout.write(f"\n{options['rows']} transactions")
+            for label, query in [
+                ("export csv", ''),
+                ("export ndjson", 'format=ndjson'),
+                ("export csv, one month, failed only", 'start=2025-03-01&end=2025-04-01&result_code=1032,1037,2001'),
+            ]:
+                self.measure(app, label, '/core/transactions/export/', query)
+
+    def seed(self, rows):
+        elapsed = seed_transactions(rows)
+        self.stdout.write(f"Seeded {rows} transactions in {elapsed:.1f}s")
+
+    def measure(self, app, label, path, query=''):
+        if path.endswith('/export/'):
+            rows = exports.filtered_transactions(QueryDict(query)).count()
+        else:
+            rows = MpesaTransaction.objects.count()
+        status, size, first_byte, elapsed = wsgi_get(app, path, query)
+        # A second pass under tracemalloc, which slows Python down too much to time the first.
+        tracemalloc.start()
+        wsgi_get(app, path, query)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        self.stdout.write(
+            f"  {label:<38} {status}  {size / 2**20:7.1f} MB in {elapsed:6.1f}s ({rows / elapsed:7.0f} rows/s), "
+            f"first byte {first_byte * 1000:8.1f} ms, peak Python memory {peak / 2**20:7.1f} MB"
+        )
@@ -0,0 +1,85 @@
+import statistics
+import time
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate
+from django.test import Client
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from core import rollups
+from core.models import MpesaTransaction, TransactionRollup
+
+from ._bench import seed_transactions, summarize, temporary_database, time_calls
+
+
+class Command(BaseCommand):
+    help = (
+        "Seeds a throwaway database with a year of synthetic M-Pesa transactions, builds the "
+        "transaction rollups (full, then incrementally after some callbacks), and times a year of "
+        "daily and hourly series from /core/transactions/rollups/ against computing it ad hoc."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000, help="Synthetic transactions, spread over 2025.")
+        parser.add_argument('--changed', type=int, default=1000, help="Transactions updated before the incremental refresh.")
+        parser.add_argument('--repeat', type=int, default=20, help="Timed API calls per series.")
+
+    def handle(self, *args, **options):
+        with temporary_database(on_disk=True), override_settings(DEBUG=False):
+            self.stdout.write(f"Seeded {options['rows']} transactions in {seed_transactions(options['rows']):.1f}s")
+
+            started = time.perf_counter()
+            days, _ = rollups.refresh(lag=0)
+            self.stdout.write(f"Full rollup: {days} days in {time.perf_counter() - started:.1f}s")
+
+            pending = MpesaTransaction.objects.filter(result_code__isnull=True).order_by('-created_at')
+            # The usual case: callbacks for the latest transactions, then late ones scattered over the year.
+            recent = list(pending.values_list('pk', flat=True)[:options['changed']])
+            scattered = list(pending.values_list('pk', flat=True))
+            scattered = scattered[::max(1, len(scattered) // options['changed'])][:options['changed']]
+            for label, pks in [("recent", recent), ("scattered", scattered)]:
+                now = timezone.now()
+                MpesaTransaction.objects.filter(pk__in=pks).update(result_code='0', callback_at=now, updated_at=now)
+                started = time.perf_counter()
+                days, _ = rollups.refresh(lag=0)
+                self.stdout.write(
+                    f"Incremental rollup after {len(pks)} {label} callbacks: {days} day(s) in {time.perf_counter() - started:.2f}s"
+                )
+
+            self.check_totals()
+            client = Client(HTTP_HOST="localhost")
+            self.stdout.write("\nA year of data (2025):")
+            for granularity in ('day', 'hour'):
+                url = f"/core/transactions/rollups/?granularity={granularity}&start=2025-01-01&end=2026-01-01"
+                points = len(client.get(url).json()['series'])
+                timings = time_calls(lambda: client.get(url), options['repeat'])
+                self.stdout.write(f"  rollups API, {granularity:<4} ({points:>4} points)  {summarize(timings)}")
+
+            timings = time_calls(self.aggregate_by_day, 3)
+            self.stdout.write(f"  ad hoc SQL GROUP BY day              median {statistics.median(timings):8.0f} ms")
+            timings = time_calls(self.load_everything, 1)
+            self.stdout.write(f"  ad hoc, loading every transaction          {timings[0]:8.0f} ms")
+
+    def aggregate_by_day(self):
+        return list(
+            MpesaTransaction.objects.annotate(day=TruncDate('created_at')).values('day')
+            .annotate(transactions=Count('id'), revenue=Sum('amount', filter=Q(result_code='0'))).order_by('day')
+        )
+
+    def load_everything(self):
+        revenue = defaultdict(int)
+        for transaction in MpesaTransaction.objects.all():
+            if transaction.result_code == '0':
+                revenue[timezone.localdate(transaction.created_at)] += transaction.amount
+        return revenue
+
+    def check_totals(self):
+        expected = {row['day']: (row['transactions'], row['revenue'] or 0) for row in self.aggregate_by_day()}
+        actual = {
+            timezone.localdate(bucket): (transactions, revenue)
+            for bucket, transactions, revenue in TransactionRollup.objects.filter(granularity='day').values_list('bucket', 'transactions', 'revenue')
+        }
+        self.stdout.write(f"Daily rollups match the table: {actual == expected}")
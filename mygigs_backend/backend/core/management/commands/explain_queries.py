@@ -0,0 +1,188 @@
+import importlib
+import statistics
+import time
+from decimal import Decimal
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count, Max
+
+from core import skills
+from core.models import Application, ClerkUser, Freelancer, Gig, MpesaTransaction, Skill, Testimonial
+from core.search import IcontainsSearchBackend
+
+from ._bench import temporary_database, time_calls
+
+LOCATIONS = ["Nairobi", "Mombasa", "Kisumu", "Nakuru", "Eldoret", "Kampala", "Lagos", "Accra", "Kigali", "Dar es Salaam"]
+RESULT_CODES = ['0', '0', '0', '0', '1032', '1037', '2001', None]
+SKILLS = ["python", "django", "react", "figma", "copywriting", "plumbing", "photography", "bookkeeping"]
+PAGE = 21  # API_PAGE_SIZE + 1, as the keyset paginator fetches
+# The indexes whose effect --baseline measures.
+INDEX_MIGRATION = 'core.migrations.0024_hot_path_indexes'
+
+
+def validators(queryset):
+    """The aggregate ConditionalGetMixin runs on every request."""
+    return queryset.aggregate(last_modified=Max('updated_at'), count=Count('pk'))
+
+
+class Command(BaseCommand):
+    help = (
+        "Seeds a throwaway SQLite database with synthetic data and prints the EXPLAIN QUERY PLAN "
+        "and timing of each hot queryset behind core/views.py, to check which indexes they use."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=200_000, help="Synthetic transactions; other tables are scaled from it.")
+        parser.add_argument('--repeat', type=int, default=20, help="Timed runs per query.")
+        parser.add_argument('--baseline', action='store_true', help=f"Also time every query with the {INDEX_MIGRATION.rsplit('.', 1)[1]} indexes dropped.")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError("explain_queries reads SQLite's EXPLAIN QUERY PLAN output.")
+
+        with temporary_database():
+            self.seed(options['rows'])
+            queries = self.queries()
+            indexed = {}
+            for label, fn in queries:
+                statements = self.capture(fn)
+                indexed[label] = statistics.median(time_calls(fn, options['repeat']))
+                self.stdout.write(f"\n{label}  ({indexed[label]:.2f} ms median)")
+                for sql, params in statements:
+                    self.explain(sql, params)
+
+            if options['baseline']:
+                self.drop_indexes()
+                self.stdout.write(f"\n{'query':<48} {'indexed':>10} {'without':>10}")
+                for label, fn in queries:
+                    fn()
+                    without = statistics.median(time_calls(fn, options['repeat']))
+                    self.stdout.write(
+                        f"{label:<48} {indexed[label]:>8.2f}ms {without:>8.2f}ms  {without / max(indexed[label], 1e-3):6.1f}x"
+                    )
+
+    def queries(self):
+        """(label, callable) pairs mirroring the querysets the views run; each callable evaluates its query."""
+        freelancer = Freelancer.objects.order_by('id')[len(LOCATIONS)]
+        wanted = list(Skill.objects.filter(name__in=SKILLS[:2]))
+        checkout_request_id = MpesaTransaction.objects.order_by('id').values_list('checkout_request_id', flat=True)[1000]
+        search = IcontainsSearchBackend()
+        return [
+            ("gigs: list page", lambda: list(Gig.objects.select_related('creator').order_by('-created_at', '-id')[:PAGE])),
+            ("gigs: validators", lambda: validators(Gig.objects.all())),
+            ("gigs: location + price filter", lambda: search.search('', Decimal(2000), Decimal(4000), 'nairobi')),
+            ("gigs: price range", lambda: search.search('', Decimal(19000), Decimal(19500))),
+            ("gigs: one freelancer's (dashboard)", lambda: list(Gig.objects.filter(creator=freelancer).select_related('creator'))),
+            ("applications: one freelancer's (dashboard)", lambda: list(
+                Application.objects.filter(gig__creator=freelancer).select_related('gig')
+            )),
+            ("applications: by status, newest (admin)", lambda: list(
+                Application.objects.filter(status='HIRED').order_by('-applied_at')[:100]
+            )),
+            ("applications: newest (admin)", lambda: list(Application.objects.order_by('-applied_at')[:100])),
+            ("transactions: list page", lambda: list(MpesaTransaction.objects.order_by('-created_at', '-id')[:PAGE])),
+            ("transactions: validators", lambda: validators(MpesaTransaction.objects.all())),
+            ("transactions: status check", lambda: validators(
+                MpesaTransaction.objects.filter(checkout_request_id=checkout_request_id)
+            )),
+            ("transactions: one payer's, newest", lambda: list(
+                MpesaTransaction.objects.filter(clerk_id='user_42').order_by('-created_at')
+            )),
+            ("transactions: failed, newest", lambda: list(
+                MpesaTransaction.objects.filter(result_code='1032').order_by('-created_at')[:100]
+            )),
+            ("transactions: pending", lambda: MpesaTransaction.objects.filter(result_code__isnull=True).count()),
+            ("users: list page", lambda: list(ClerkUser.objects.order_by('-created_at', '-clerk_id')[:PAGE])),
+            ("users: validators", lambda: validators(ClerkUser.objects.all())),
+            ("testimonials: list page", lambda: list(Testimonial.objects.order_by('-created_at', '-id')[:PAGE])),
+            ("freelancers: list page", lambda: list(Freelancer.objects.order_by('-id')[:PAGE])),
+            ("freelancers: skill match in city", lambda: list(skills.match_freelancers(wanted, city='Nairobi')[:PAGE])),
+        ]
+
+    def capture(self, fn):
+        statements = []
+
+        def record(execute, sql, params, many, context):
+            statements.append((sql, params))
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(record):
+            fn()
+        return statements
+
+    def explain(self, sql, params):
+        with connection.cursor() as cursor:
+            cursor.execute("EXPLAIN QUERY PLAN " + sql, params)
+            rows = cursor.fetchall()
+        depth = {0: 0}
+        for node, parent, _, detail in rows:
+            depth[node] = depth.get(parent, 0) + 1
+            note = ""
+            if detail.startswith("SCAN") and "INDEX" not in detail:
+                note = "   <- table scan"
+            elif "TEMP B-TREE" in detail:
+                note = "   <- sort"
+            self.stdout.write(f"{'  ' * depth[node]}{detail}{note}")
+
+    def drop_indexes(self):
+        migration = importlib.import_module(INDEX_MIGRATION).Migration
+        with connection.schema_editor() as editor:
+            for operation in migration.operations:
+                editor.remove_index(apps.get_model('core', operation.model_name), operation.index)
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+    def seed(self, rows):
+        start = time.perf_counter()
+        n_users, n_freelancers, n_gigs = max(rows // 10, 100), max(rows // 100, 20), max(rows // 5, 100)
+
+        Skill.objects.bulk_create([Skill(name=name) for name in SKILLS])
+        skill_ids = list(Skill.objects.values_list('id', flat=True))
+        ClerkUser.objects.bulk_create(
+            [ClerkUser(clerk_id=f"user_{i}", email=f"user{i}@example.com") for i in range(n_users)], batch_size=5000
+        )
+        Freelancer.objects.bulk_create([
+            Freelancer(name=f"Freelancer {i}", profession="Developer", years_of_experience="3", availability="Full-time",
+                       skills="", city=LOCATIONS[i % len(LOCATIONS)])
+            for i in range(n_freelancers)
+        ], batch_size=5000)
+        freelancer_ids = list(Freelancer.objects.values_list('id', flat=True))
+        Freelancer.skill_set.through.objects.bulk_create([
+            Freelancer.skill_set.through(freelancer_id=pk, skill_id=skill_ids[(i + k) % len(skill_ids)])
+            for i, pk in enumerate(freelancer_ids) for k in range(3)
+        ], batch_size=5000)
+        Gig.objects.bulk_create([
+            Gig(creator_id=freelancer_ids[i % n_freelancers], title=f"Gig {i}", description="...",
+                price=Decimal(500 + (i * 7919) % 19500), location=LOCATIONS[(i * 31) % len(LOCATIONS)])
+            for i in range(n_gigs)
+        ], batch_size=5000)
+        gig_ids = list(Gig.objects.values_list('id', flat=True))
+        Application.objects.bulk_create([
+            Application(gig_id=gig_ids[i % n_gigs], applicant_id=f"user_{(i * 7919) % n_users}", cover_letter="...",
+                        status=('PENDING', 'PENDING', 'HIRED', 'REJECTED')[i % 4])
+            for i in range(rows // 4)
+        ], batch_size=5000, ignore_conflicts=True)
+        Testimonial.objects.bulk_create(
+            [Testimonial(author_name=f"Client {i}", text="...") for i in range(max(rows // 50, 100))], batch_size=5000
+        )
+        MpesaTransaction.objects.bulk_create([
+            MpesaTransaction(checkout_request_id=f"ws_CO_{i}", merchant_request_id=f"m_{i}", amount=Decimal(10 + i % 990),
+                             result_code=RESULT_CODES[i % len(RESULT_CODES)], clerk_id=f"user_{(i * 31) % n_users}")
+            for i in range(rows)
+        ], batch_size=5000)
+
+        # bulk_create stamps every row with the same auto_now_add time; spread them over a year.
+        with connection.cursor() as cursor:
+            for model, column in [(ClerkUser, 'created_at'), (Gig, 'created_at'), (Testimonial, 'created_at'),
+                                  (MpesaTransaction, 'created_at'), (Application, 'applied_at')]:
+                table = model._meta.db_table
+                cursor.execute(f"UPDATE {table} SET {column} = datetime('2026-01-01', '+' || ((rowid * 7919) % 31536000) || ' seconds')")
+                if any(field.name == 'updated_at' for field in model._meta.fields):
+                    cursor.execute(f"UPDATE {table} SET updated_at = datetime({column}, '+1 hour')")
+            cursor.execute("ANALYZE")
+        self.stdout.write(
+            f"Seeded {rows} transactions, {n_gigs} gigs, {n_users} users, {n_freelancers} freelancers "
+            f"and {rows // 4} applications in {time.perf_counter() - start:.1f}s (then ANALYZE)"
+        )
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core import images
+
+
+class Command(BaseCommand):
+    help = (
+        "Renders the resized JPEG/WebP variants (IMAGE_VARIANT_WIDTHS) of every gig image and freelancer "
+        "profile image that doesn't have current ones yet, e.g. uploads from before variants existed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help="Re-render variants that are already current.")
+
+    def handle(self, *args, **options):
+        for model, (image_field, variants_field) in images.IMAGE_FIELDS.items():
+            rows = model.objects.exclude(**{f"{image_field}__isnull": True}).exclude(**{image_field: ''})
+            rendered = skipped = 0
+            started = time.perf_counter()
+            for pk, name, variants in rows.values_list('pk', image_field, variants_field).iterator():
+                if images.is_current(variants, name) and not options['force']:
+                    skipped += 1
+                    continue
+                if images.generate(model, pk, force=options['force']):
+                    rendered += 1
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f"{model.__name__}.{image_field}: rendered {rendered}, already current {skipped} "
+                f"in {elapsed:.1f}s ({rendered / elapsed if elapsed else 0:.1f} images/s)"
+            )
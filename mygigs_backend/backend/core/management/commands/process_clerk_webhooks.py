@@ -0,0 +1,51 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Min
+from django.utils import timezone
+
+from core.models import ClerkWebhookEvent
+from core.webhooks import drain_events
+
+
+class Command(BaseCommand):
+    help = "Applies queued Clerk webhook events (CLERK_WEBHOOK_MODE = 'queued') to ClerkUser in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Drain the pending events and exit instead of polling.")
+        parser.add_argument('--batch-size', type=int, default=None, help="Events per batch (default: CLERK_WEBHOOK_BATCH_SIZE).")
+        parser.add_argument('--sleep', type=float, default=1.0, help="Seconds to wait when nothing is pending.")
+        parser.add_argument('--stats', action='store_true', help="Print the backlog and event outcomes, then exit.")
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            for row in ClerkWebhookEvent.objects.values('status').annotate(n=Count('id')).order_by('status'):
+                self.stdout.write(f"{row['status']}: {row['n']}")
+            oldest = ClerkWebhookEvent.objects.filter(status='PENDING').aggregate(oldest=Min('received_at'))['oldest']
+            if oldest:
+                self.stdout.write(f"Oldest pending event is {(timezone.now() - oldest).total_seconds():.1f}s old")
+            return
+
+        total = 0
+        started = time.perf_counter()
+        try:
+            while True:
+                batch_started = time.perf_counter()
+                drained, applied = drain_events(options['batch_size'])
+                if drained:
+                    total += drained
+                    elapsed = time.perf_counter() - batch_started
+                    self.stdout.write(
+                        f"Batch of {drained}: {applied} applied, {drained - applied} superseded, stale or failed "
+                        f"in {elapsed:.2f}s ({drained / elapsed:.1f} events/s)"
+                    )
+                    continue
+                if options['once']:
+                    break
+                time.sleep(options['sleep'])
+        except KeyboardInterrupt:
+            pass
+
+        elapsed = time.perf_counter() - started
+        if total:
+            self.stdout.write(f"Processed {total} event(s) in {elapsed:.2f}s ({total / elapsed:.1f} events/s)")
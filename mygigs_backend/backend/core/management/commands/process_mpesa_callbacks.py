@@ -0,0 +1,51 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Min
+from django.utils import timezone
+
+from core.callbacks import drain_staged
+from core.models import MpesaCallback
+
+
+class Command(BaseCommand):
+    help = "Applies staged M-Pesa callbacks (MPESA_CALLBACK_MODE = 'staged') to their transactions in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Drain the pending callbacks and exit instead of polling.")
+        parser.add_argument('--batch-size', type=int, default=None, help="Callbacks per batch (default: MPESA_CALLBACK_BATCH_SIZE).")
+        parser.add_argument('--sleep', type=float, default=1.0, help="Seconds to wait when nothing is pending.")
+        parser.add_argument('--stats', action='store_true', help="Print the backlog, then exit.")
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            pending = MpesaCallback.objects.filter(processed_at__isnull=True)
+            oldest = pending.aggregate(oldest=Min('received_at'))['oldest']
+            self.stdout.write(f"Pending: {pending.count()}")
+            if oldest:
+                self.stdout.write(f"Oldest pending callback is {(timezone.now() - oldest).total_seconds():.1f}s old")
+            return
+
+        total = 0
+        started = time.perf_counter()
+        try:
+            while True:
+                batch_started = time.perf_counter()
+                drained, applied = drain_staged(options['batch_size'])
+                if drained:
+                    total += drained
+                    elapsed = time.perf_counter() - batch_started
+                    self.stdout.write(
+                        f"Batch of {drained}: {applied} transaction(s) updated, {drained - applied} duplicate or unmatched "
+                        f"in {elapsed:.2f}s ({drained / elapsed:.1f} callbacks/s)"
+                    )
+                    continue
+                if options['once']:
+                    break
+                time.sleep(options['sleep'])
+        except KeyboardInterrupt:
+            pass
+
+        elapsed = time.perf_counter() - started
+        if total:
+            self.stdout.write(f"Processed {total} callback(s) in {elapsed:.2f}s ({total / elapsed:.1f} callbacks/s)")
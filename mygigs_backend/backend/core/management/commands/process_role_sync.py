@@ -0,0 +1,75 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Min
+from django.utils import timezone
+
+from core.metrics import percentile
+from core.models import ClerkRoleSyncJob
+from core.outbox import process_batch
+
+
+class Command(BaseCommand):
+    help = "Delivers queued Clerk role updates (ClerkRoleSyncJob) in batches, retrying failures with backoff."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Drain the due jobs and exit instead of polling.")
+        parser.add_argument('--batch-size', type=int, default=None, help="Jobs claimed per batch (default: ROLE_SYNC_BATCH_SIZE).")
+        parser.add_argument('--concurrency', type=int, default=4, help="Parallel Clerk API calls per batch.")
+        parser.add_argument('--sleep', type=float, default=2.0, help="Seconds to wait when the queue is empty.")
+        parser.add_argument('--stats', action='store_true', help="Print queue depth and age, then exit.")
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            self.print_stats()
+            return
+
+        total = 0
+        started = time.perf_counter()
+        try:
+            while True:
+                batch_started = time.perf_counter()
+                jobs = process_batch(options['batch_size'], options['concurrency'])
+                if jobs:
+                    total += len(jobs)
+                    self.report(jobs, time.perf_counter() - batch_started)
+                    continue
+                if options['once']:
+                    break
+                time.sleep(options['sleep'])
+        except KeyboardInterrupt:
+            pass
+
+        elapsed = time.perf_counter() - started
+        if total:
+            self.stdout.write(f"Processed {total} job(s) in {elapsed:.2f}s ({total / elapsed:.1f} jobs/s)")
+
+    def report(self, jobs, elapsed):
+        done = [job for job in jobs if job.status == 'DONE']
+        failed = sum(1 for job in jobs if job.status == 'FAILED')
+        retrying = len(jobs) - len(done) - failed
+        lags = sorted((job.processed_at - job.created_at).total_seconds() * 1000 for job in done)
+        lag = f"lag p50 {percentile(lags, 50)} ms, p95 {percentile(lags, 95)} ms" if lags else "no deliveries"
+        self.stdout.write(
+            f"Batch of {len(jobs)}: {len(done)} done, {retrying} retrying, {failed} failed "
+            f"in {elapsed:.2f}s ({len(jobs) / elapsed:.1f} jobs/s); {lag}"
+        )
+        for job in jobs:
+            if job.last_error:
+                self.stderr.write(f"  {job.clerk_id}: {job.last_error}")
+
+    def print_stats(self):
+        counts = dict(ClerkRoleSyncJob.objects.values_list('status').annotate(n=Count('id')))
+        oldest = ClerkRoleSyncJob.objects.filter(status='PENDING').aggregate(oldest=Min('created_at'))['oldest']
+        self.stdout.write(f"Pending: {counts.get('PENDING', 0)}  Done: {counts.get('DONE', 0)}  Failed: {counts.get('FAILED', 0)}")
+        if oldest:
+            self.stdout.write(f"Oldest pending job is {(timezone.now() - oldest).total_seconds():.1f}s old")
+
+        recent = ClerkRoleSyncJob.objects.filter(status='DONE').order_by('-processed_at')[:1000]
+        lags = [(job.processed_at - job.created_at).total_seconds() for job in recent]
+        if lags:
+            self.stdout.write(
+                f"End-to-end lag over last {len(lags)} deliveries: "
+                f"mean {statistics.mean(lags):.2f}s, max {max(lags):.2f}s"
+            )
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core import dashboard
+
+
+class Command(BaseCommand):
+    help = "Recomputes the admin dashboard counters from the source tables (e.g. after bulk imports)."
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            dashboard.rebuild_stats()
+        for name, value in dashboard.summary().items():
+            self.stdout.write(f"{name}: {value}")
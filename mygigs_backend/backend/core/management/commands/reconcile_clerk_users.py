@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.clerk_sync import ClerkSyncError, reconcile
+
+
+class Command(BaseCommand):
+    help = (
+        "Brings ClerkUser in line with the Clerk Users API (CLERK_API_URL): inserts missing users, "
+        "updates stale ones and deletes users Clerk no longer has. Interrupted runs can be resumed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--resume', action='store_true', help="Continue the latest unfinished run from its checkpoint.")
+        parser.add_argument('--page-size', type=int, default=None, help="Users per page (default: CLERK_SYNC_PAGE_SIZE, at most 500).")
+        parser.add_argument('--concurrency', type=int, default=None, help="Pages fetched in parallel (default: CLERK_SYNC_CONCURRENCY).")
+        parser.add_argument('--no-delete', action='store_true', help="Leave users missing from Clerk in place.")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+
+        def progress(run):
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f"Offset {run.next_offset}: {run.seen} seen, {run.created} created, {run.updated} updated, "
+                f"{run.failed} failed ({run.seen / elapsed:.0f} rows/s)"
+            )
+
+        try:
+            run = reconcile(
+                resume=options['resume'], page_size=options['page_size'], concurrency=options['concurrency'],
+                delete=not options['no_delete'], progress=progress if options['verbosity'] > 1 else None,
+            )
+        except ClerkSyncError as e:
+            raise CommandError(f"{e} (run again with --resume to continue from the last checkpoint)")
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f"Reconciled {run.seen} Clerk users in {elapsed:.1f}s ({run.seen / elapsed if elapsed else 0:.0f} rows/s): "
+            f"{run.created} created, {run.updated} updated, {run.deleted} deleted, {run.failed} failed"
+        )
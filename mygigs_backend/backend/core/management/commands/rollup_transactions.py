@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.rollups import refresh
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuilds the hourly/daily TransactionRollup rows of every day with M-Pesa transactions "
+        "changed since the last run (by updated_at). Meant to run on a schedule, e.g. every few minutes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help="Rebuild every day, e.g. after transactions were deleted.")
+        parser.add_argument('--lag', type=int, default=None, help="Seconds the watermark trails the clock (default: TRANSACTION_ROLLUP_LAG_SECONDS).")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        days, watermark = refresh(full=options['full'], lag=options['lag'])
+        self.stdout.write(
+            f"Rebuilt rollups for {days} day(s) in {time.perf_counter() - started:.2f}s; "
+            f"transactions updated up to {watermark:%Y-%m-%d %H:%M:%S} are included"
+        )
@@ -0,0 +1,37 @@
+import sqlite3
+import time
+from contextlib import closing
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.routers import REPLICA_DB_ALIAS
+
+
+class Command(BaseCommand):
+    help = (
+        "Copies the primary SQLite database over the replica file (DB_REPLICA_NAME) with SQLite's "
+        "online backup, once or every --every seconds, to try replica routing locally with replication lag."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--every', type=float, default=0, help="Repeat every N seconds (0 copies once).")
+
+    def handle(self, *args, **options):
+        primary, replica = settings.DATABASES['default'], settings.DATABASES[REPLICA_DB_ALIAS]
+        if primary['ENGINE'] != 'django.db.backends.sqlite3' or not settings.DB_REPLICA_NAME:
+            raise CommandError("sync_replica needs SQLite and DB_REPLICA_NAME pointing at a separate file.")
+        if str(replica['NAME']) == str(primary['NAME']):
+            raise CommandError("DB_REPLICA_NAME is the primary database itself.")
+
+        try:
+            while True:
+                start = time.perf_counter()
+                with closing(sqlite3.connect(primary['NAME'])) as source, closing(sqlite3.connect(replica['NAME'])) as target:
+                    source.backup(target)
+                self.stdout.write(f"Copied {primary['NAME']} to {replica['NAME']} in {(time.perf_counter() - start) * 1000:.0f} ms")
+                if not options['every']:
+                    break
+                time.sleep(options['every'])
+        except KeyboardInterrupt:
+            pass
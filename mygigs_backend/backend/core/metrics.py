@@ -0,0 +1,158 @@
+"""
+Per-request timing breakdown (DB, serialization, upstream HTTP) and
+per-route aggregates, collected by ``RequestMetricsMiddleware``.
+
+Code that wants its time attributed wraps it in ``span(name)`` or calls
+``record(name, seconds)``; both are no-ops unless a request is being measured.
+"""
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+_current = ContextVar('request_timings', default=None)
+
+# Order in which spans appear in the Server-Timing header.
+SPANS = ('db', 'serialize', 'http')
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(len(sorted_values) * pct / 100))
+    return round(sorted_values[index], 2)
+
+
+class RequestTimings:
+    def __init__(self):
+        self.queries = 0
+        self.seconds = dict.fromkeys(SPANS, 0.0)
+
+    def add(self, name, seconds):
+        self.seconds[name] = self.seconds.get(name, 0.0) + seconds
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        """Hook for ``connection.execute_wrapper`` counting queries and DB time."""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.add('db', time.perf_counter() - start)
+
+    def server_timing(self, total_seconds):
+        entries = []
+        for name, seconds in self.seconds.items():
+            entry = f"{name};dur={seconds * 1000:.2f}"
+            if name == 'db':
+                entry += f';desc="{self.queries} queries"'
+            entries.append(entry)
+        entries.append(f"total;dur={total_seconds * 1000:.2f}")
+        return ", ".join(entries)
+
+
+def activate(timings):
+    return _current.set(timings)
+
+
+def deactivate(token):
+    _current.reset(token)
+
+
+def current():
+    """The RequestTimings of the request being measured, or None."""
+    return _current.get()
+
+
+def execute_wrapper(execute, sql, params, many, context):
+    """
+    Attributes a query to the request being measured. It is installed on
+    every connection as it opens (see CoreConfig.ready) rather than per
+    request, because async views run their queries on another thread's
+    connection; the timings follow the request's context there. Outside a
+    measured request it costs one ContextVar lookup per query.
+    """
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    return timings.execute_wrapper(execute, sql, params, many, context)
+
+
+def instrument(connection, **kwargs):
+    """``connection_created`` receiver installing ``execute_wrapper`` on ``connection``."""
+    if execute_wrapper not in connection.execute_wrappers:
+        # First, so that ``connection.execute_wrapper()`` blocks, which pop the last wrapper, keep working.
+        connection.execute_wrappers.insert(0, execute_wrapper)
+
+
+def record(name, seconds):
+    timings = _current.get()
+    if timings is not None:
+        timings.add(name, seconds)
+
+
+@contextmanager
+def span(name):
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter() - start)
+
+
+class RouteStats:
+    """Rolling window of request timings for one URL route."""
+
+    def __init__(self, window=2048):
+        self.requests = 0
+        self._samples = deque(maxlen=window)
+
+    def add(self, timings, total_seconds):
+        self.requests += 1
+        self._samples.append((
+            total_seconds * 1000,
+            timings.queries,
+            *(timings.seconds[name] * 1000 for name in SPANS),
+        ))
+
+    def snapshot(self):
+        samples = list(self._samples)
+        columns = list(zip(*samples)) if samples else [()] * (2 + len(SPANS))
+        snapshot = {"requests": self.requests, "window": len(samples)}
+        for name, values in zip(('total_ms', 'queries', *(f"{name}_ms" for name in SPANS)), columns):
+            values = sorted(values)
+            snapshot[name] = {
+                "p50": percentile(values, 50),
+                "p95": percentile(values, 95),
+                "p99": percentile(values, 99),
+            }
+        return snapshot
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._routes = {}
+        self._lock = threading.Lock()
+
+    def add(self, route, timings, total_seconds):
+        with self._lock:
+            stats = self._routes.get(route)
+            if stats is None:
+                stats = self._routes[route] = RouteStats()
+            stats.add(timings, total_seconds)
+
+    def snapshot(self):
+        with self._lock:
+            return {route: stats.snapshot() for route, stats in sorted(self._routes.items())}
+
+    def reset(self):
+        with self._lock:
+            self._routes.clear()
+
+
+registry = MetricsRegistry()
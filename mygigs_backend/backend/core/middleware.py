@@ -1,6 +1,13 @@
-import jwt
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
 from django.conf import settings
 from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from jose import jwt
+
+from . import metrics, routers
 
 class ClerkJWTAuthenticationMiddleware:
     def __init__(self, get_response):
@@ -17,4 +24,116 @@ class ClerkJWTAuthenticationMiddleware:
                 request.user = user
             except Exception:
                 pass  # Handle invalid token
-        return self.get_response(request)
\ No newline at end of file
+        return self.get_response(request)
+
+
+class RequestMetricsMiddleware:
+    """
+    Records query count, DB time, serialization time and upstream HTTP time
+    for every request, reports them in a ``Server-Timing`` header and
+    aggregates them per route for the ``/core/metrics/`` endpoint.
+
+    Enabled with REQUEST_METRICS_ENABLED; when it is off Django drops the
+    middleware entirely, so there is no per-request cost.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.REQUEST_METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        timings = metrics.RequestTimings()
+        token = metrics.activate(timings)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.deactivate(token)
+        return self.finish(request, response, timings, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        timings = metrics.RequestTimings()
+        token = metrics.activate(timings)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.deactivate(token)
+        return self.finish(request, response, timings, time.perf_counter() - start)
+
+    @staticmethod
+    def finish(request, response, timings, total):
+        match = request.resolver_match
+        route = f"{request.method} /{match.route}" if match else f"{request.method} <unresolved>"
+        metrics.registry.add(route, timings, total)
+        response['Server-Timing'] = timings.server_timing(total)
+        return response
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered (JSON-encoded) after this hook; count that as serialization.
+        timings = metrics.current()
+        if timings is not None:
+            render_start = time.perf_counter()
+            response.add_post_render_callback(
+                lambda rendered: timings.add('serialize', time.perf_counter() - render_start)
+            )
+        return response
+
+
+class ReplicaStickinessMiddleware:
+    """
+    After a successful write, pins the client to the primary database for
+    DB_REPLICA_STICKY_SECONDS, both with a cookie and by the user id of its
+    bearer token (see core/routers.py), so that ``ReplicaReadMixin`` serves
+    the client's next reads from the primary and they see its own change.
+    Dropped when replica routing is off.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not routers.routing_enabled():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        response = self.get_response(request)
+        if self.is_write(request, response):
+            key = self.pin(request, response)
+            if key is not None:
+                cache.set(key, 1, settings.DB_REPLICA_STICKY_SECONDS)
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        if self.is_write(request, response):
+            key = self.pin(request, response)
+            if key is not None:
+                await cache.aset(key, 1, settings.DB_REPLICA_STICKY_SECONDS)
+        return response
+
+    @staticmethod
+    def is_write(request, response):
+        return request.method not in ('GET', 'HEAD', 'OPTIONS') and response.status_code < 400
+
+    @staticmethod
+    def pin(request, response):
+        """Sets the cookie and returns the cache key to pin the bearer token's user with, if any."""
+        response.set_cookie(
+            settings.DB_REPLICA_STICKY_COOKIE, '1', max_age=settings.DB_REPLICA_STICKY_SECONDS,
+            httponly=True, samesite='Lax',
+        )
+        return routers.pin_key(request)
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:12
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_remove_application_status_gig_clerk_user_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClerkRoleSyncJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('clerk_id', models.CharField(max_length=255)),
+                ('role', models.CharField(max_length=50)),
+                ('idempotency_key', models.CharField(max_length=255, unique=True)),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('DONE', 'Done'), ('FAILED', 'Failed')], default='PENDING', max_length=10)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True, null=True)),
+                ('available_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'available_at'], name='core_rolesync_due_idx')],
+            },
+        ),
+    ]
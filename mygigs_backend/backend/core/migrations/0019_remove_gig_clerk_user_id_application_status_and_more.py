@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:12
+
+from django.db import migrations, models
+
+# Brings the schema back in line with models.py, which 0018 had drifted from.
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('core', '0019_clerk_role_sync_job'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='gig',
+            name='clerk_user_id',
+        ),
+        migrations.AddField(
+            model_name='application',
+            name='status',
+            field=models.CharField(choices=[('PENDING', 'Pending Review'), ('HIRED', 'Hired'), ('REJECTED', 'Rejected')], default='PENDING', max_length=10),
+        ),
+        migrations.AlterUniqueTogether(
+            name='application',
+            unique_together={('gig', 'applicant')},
+        ),
+    ]
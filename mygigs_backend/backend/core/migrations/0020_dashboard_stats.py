@@ -0,0 +1,62 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:16
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate
+
+
+def backfill_stats(apps, schema_editor):
+    db = schema_editor.connection.alias
+    DashboardStat = apps.get_model('core', 'DashboardStat')
+    DailySignupStat = apps.get_model('core', 'DailySignupStat')
+    ClerkUser = apps.get_model('core', 'ClerkUser')
+    MpesaTransaction = apps.get_model('core', 'MpesaTransaction')
+
+    transactions = MpesaTransaction.objects.using(db).aggregate(
+        total=Count('id'),
+        successful=Count('id', filter=Q(result_code='0')),
+        failed=Count('id', filter=Q(result_code__isnull=False) & ~Q(result_code__in=['', '0'])),
+        revenue=Sum('amount', filter=Q(result_code='0')),
+    )
+    values = {
+        'gigs': apps.get_model('core', 'Gig').objects.using(db).count(),
+        'freelancers': apps.get_model('core', 'Freelancer').objects.using(db).count(),
+        'testimonials': apps.get_model('core', 'Testimonial').objects.using(db).count(),
+        'users': ClerkUser.objects.using(db).count(),
+        'transactions': transactions['total'],
+        'successful_transactions': transactions['successful'],
+        'failed_transactions': transactions['failed'],
+        'revenue': transactions['revenue'] or 0,
+    }
+    DashboardStat.objects.using(db).bulk_create([DashboardStat(name=name, value=value) for name, value in values.items()])
+
+    signups = ClerkUser.objects.using(db).annotate(day=TruncDate('created_at')).values('day').annotate(count=Count('clerk_id')).order_by()
+    DailySignupStat.objects.using(db).bulk_create([DailySignupStat(day=row['day'], count=row['count']) for row in signups])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0019_remove_gig_clerk_user_id_application_status_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySignupStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(unique=True)),
+                ('count', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DashboardStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('value', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(backfill_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+from django.db import migrations
+
+
+def create_fts_index(apps, schema_editor):
+    # The FTS5 index only exists on SQLite; other databases use a different search backend.
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS core_gig_fts USING fts5("
+        "title, description, location, tokenize = 'unicode61 remove_diacritics 2')"
+    )
+    schema_editor.execute(
+        "INSERT INTO core_gig_fts (rowid, title, description, location) "
+        "SELECT id, title, description, location FROM core_gig"
+    )
+
+
+def drop_fts_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute("DROP TABLE IF EXISTS core_gig_fts")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0020_dashboard_stats'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts_index, drop_fts_index),
+    ]
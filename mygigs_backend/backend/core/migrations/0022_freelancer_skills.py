@@ -0,0 +1,61 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:20
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+def split_skills(apps, schema_editor):
+    db = schema_editor.connection.alias
+    # Same normalization as core.skills.parse_skills, inlined so the migration doesn't import app code.
+    Freelancer = apps.get_model('core', 'Freelancer')
+    Skill = apps.get_model('core', 'Skill')
+    Through = Freelancer.skill_set.through
+
+    names_by_freelancer = {}
+    for pk, raw in Freelancer.objects.using(db).values_list('pk', 'skills').iterator():
+        names = []
+        for part in (raw or '').split(','):
+            name = ' '.join(part.split()).lower()[:100]
+            if name and name not in names:
+                names.append(name)
+        names_by_freelancer[pk] = names
+
+    all_names = {name for names in names_by_freelancer.values() for name in names}
+    Skill.objects.using(db).bulk_create([Skill(name=name) for name in all_names], ignore_conflicts=True)
+    skill_ids = dict(Skill.objects.using(db).values_list('name', 'pk'))
+    Through.objects.using(db).bulk_create(
+        [
+            Through(freelancer_id=pk, skill_id=skill_ids[name])
+            for pk, names in names_by_freelancer.items()
+            for name in names
+        ],
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0021_gig_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Skill',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='freelancer',
+            name='skill_set',
+            field=models.ManyToManyField(blank=True, related_name='freelancers', to='core.skill'),
+        ),
+        migrations.AddIndex(
+            model_name='freelancer',
+            index=models.Index(django.db.models.functions.text.Lower('city'), name='core_freelancer_city_lower_idx'),
+        ),
+        migrations.RunPython(split_skills, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0022_freelancer_skills'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MpesaCallback',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('checkout_request_id', models.CharField(blank=True, max_length=255, null=True)),
+                ('payload', models.JSONField()),
+                ('received_at', models.DateTimeField(auto_now_add=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('processed_at__isnull', True)), fields=['id'], name='core_mpesacallback_pending_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:45
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0023_mpesa_callback_staging'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='application',
+            index=models.Index(fields=['status', 'applied_at'], name='core_application_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='application',
+            index=models.Index(fields=['applied_at'], name='core_application_applied_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='clerkuser',
+            index=models.Index(fields=['created_at', 'clerk_id'], name='core_clerkuser_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='gig',
+            index=models.Index(fields=['created_at', 'id'], name='core_gig_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='gig',
+            index=models.Index(fields=['price'], name='core_gig_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='gig',
+            index=models.Index(django.db.models.functions.text.Lower('location'), models.F('price'), name='core_gig_location_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mpesatransaction',
+            index=models.Index(fields=['created_at', 'id'], name='core_mpesa_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mpesatransaction',
+            index=models.Index(fields=['clerk_id', 'created_at'], name='core_mpesa_clerk_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mpesatransaction',
+            index=models.Index(fields=['result_code', 'created_at'], name='core_mpesa_result_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='testimonial',
+            index=models.Index(fields=['created_at', 'id'], name='core_testimonial_created_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0024_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='freelancer',
+            name='profile_image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='gig',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
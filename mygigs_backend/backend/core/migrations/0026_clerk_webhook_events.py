@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0025_image_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClerkWebhookEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('svix_id', models.CharField(max_length=255, unique=True)),
+                ('event_type', models.CharField(max_length=100)),
+                ('clerk_id', models.CharField(blank=True, max_length=255, null=True)),
+                ('occurred_at', models.DateTimeField()),
+                ('payload', models.JSONField()),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('APPLIED', 'Applied'), ('SKIPPED', 'Skipped'), ('FAILED', 'Failed')], default='PENDING', max_length=10)),
+                ('error', models.TextField(blank=True, null=True)),
+                ('received_at', models.DateTimeField(auto_now_add=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('status', 'PENDING')), fields=['id'], name='core_clerkevent_pending_idx'), models.Index(fields=['clerk_id', 'status', 'occurred_at'], name='core_clerkevent_applied_idx')],
+            },
+        ),
+    ]
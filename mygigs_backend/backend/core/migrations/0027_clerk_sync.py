@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0026_clerk_webhook_events'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClerkSyncRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('next_offset', models.PositiveIntegerField(default=0)),
+                ('seen', models.PositiveIntegerField(default=0)),
+                ('created', models.PositiveIntegerField(default=0)),
+                ('updated', models.PositiveIntegerField(default=0)),
+                ('deleted', models.PositiveIntegerField(default=0)),
+                ('failed', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='clerkuser',
+            name='synced_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
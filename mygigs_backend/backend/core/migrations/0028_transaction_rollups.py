@@ -0,0 +1,58 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:10
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_callback_at(apps, schema_editor):
+    # Callbacks are the last write to a completed transaction, so updated_at is when it arrived.
+    MpesaTransaction = apps.get_model('core', 'MpesaTransaction')
+    MpesaTransaction.objects.using(schema_editor.connection.alias).filter(
+        result_code__isnull=False
+    ).update(callback_at=F('updated_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0027_clerk_sync'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('watermark', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TransactionRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('granularity', models.CharField(choices=[('hour', 'Hour'), ('day', 'Day')], max_length=4)),
+                ('bucket', models.DateTimeField(help_text='Start of the hour or day.')),
+                ('transactions', models.IntegerField(default=0)),
+                ('successful', models.IntegerField(default=0)),
+                ('failed', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+                ('payers', models.IntegerField(default=0, help_text='Distinct phone numbers with a successful payment.')),
+                ('median_callback_seconds', models.FloatField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='mpesatransaction',
+            name='callback_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_callback_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='mpesatransaction',
+            index=models.Index(fields=['updated_at'], name='core_mpesa_updated_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='transactionrollup',
+            constraint=models.UniqueConstraint(fields=('granularity', 'bucket'), name='core_rollup_granularity_bucket_uniq'),
+        ),
+    ]
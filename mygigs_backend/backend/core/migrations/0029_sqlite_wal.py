@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.db import migrations
+
+
+def set_journal_mode(apps, schema_editor):
+    # Persistent in the database file, so it only needs setting once.
+    if schema_editor.connection.vendor == 'sqlite' and settings.SQLITE_TUNING:
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute(f"PRAGMA journal_mode={settings.SQLITE_JOURNAL_MODE}")
+
+
+class Migration(migrations.Migration):
+    # journal_mode can't be changed inside a transaction.
+    atomic = False
+
+    dependencies = [
+        ('core', '0028_transaction_rollups'),
+    ]
+
+    operations = [
+        migrations.RunPython(set_journal_mode, migrations.RunPython.noop),
+    ]
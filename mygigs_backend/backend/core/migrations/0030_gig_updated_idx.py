@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0029_sqlite_wal'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='gig',
+            index=models.Index(fields=['updated_at'], name='core_gig_updated_idx'),
+        ),
+    ]
@@ -1,4 +1,6 @@
 from django.db import models
+from django.db.models.functions import Lower
+from django.utils import timezone
 
 class MpesaTransaction(models.Model):
     # IDs for linking the initial request to the callback
@@ -20,12 +22,81 @@ class MpesaTransaction(models.Model):
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # When Daraja's callback arrived, for time-to-callback in the rollups.
+    callback_at = models.DateTimeField(null=True, blank=True)
 
     clerk_id = models.CharField(max_length=255, null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Newest first, with the pk as the keyset tie-breaker (list views and dashboard drill-down).
+            models.Index(fields=['created_at', 'id'], name='core_mpesa_created_idx'),
+            models.Index(fields=['clerk_id', 'created_at'], name='core_mpesa_clerk_created_idx'),
+            # Payments by outcome (result_code IS NULL for pending ones), newest first.
+            models.Index(fields=['result_code', 'created_at'], name='core_mpesa_result_created_idx'),
+            # Rows changed since the last rollup_transactions watermark.
+            models.Index(fields=['updated_at'], name='core_mpesa_updated_idx'),
+        ]
     
     def __str__(self):
         return f"Transaction {self.mpesa_receipt_number or self.merchant_request_id}"
 
+class MpesaCallback(models.Model):
+    """
+    Staging row for a raw Daraja STK callback, written when
+    MPESA_CALLBACK_MODE is "staged" so the callback is acknowledged after a
+    single INSERT. ``process_mpesa_callbacks`` applies pending rows to
+    ``MpesaTransaction`` in bulk and stamps ``processed_at``.
+    """
+    checkout_request_id = models.CharField(max_length=255, null=True, blank=True)
+    payload = models.JSONField()
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Only unprocessed rows are indexed, so the drain's scan stays small as history grows.
+            models.Index(fields=['id'], condition=models.Q(processed_at__isnull=True), name='core_mpesacallback_pending_idx'),
+        ]
+
+    def __str__(self):
+        return f"Callback for {self.checkout_request_id}"
+
+class ClerkWebhookEvent(models.Model):
+    """
+    A verified Clerk (Svix) webhook delivery, keyed by its ``svix-id`` so a
+    redelivered message is stored once. ``core/webhooks.py`` applies pending
+    events to ``ClerkUser`` in batches; ``occurred_at`` (Clerk's event
+    timestamp) orders them per ``clerk_id``, so an event older than one
+    already applied for that user is skipped.
+    """
+    STATUS_CHOICES = (
+        ('PENDING', 'Pending'),
+        ('APPLIED', 'Applied'),
+        ('SKIPPED', 'Skipped'),
+        ('FAILED', 'Failed'),
+    )
+
+    svix_id = models.CharField(max_length=255, unique=True)
+    event_type = models.CharField(max_length=100)
+    clerk_id = models.CharField(max_length=255, null=True, blank=True)
+    occurred_at = models.DateTimeField()
+    payload = models.JSONField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
+    error = models.TextField(blank=True, null=True)
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['id'], condition=models.Q(status='PENDING'), name='core_clerkevent_pending_idx'),
+            # The newest applied event per user, which later events are ordered against.
+            models.Index(fields=['clerk_id', 'status', 'occurred_at'], name='core_clerkevent_applied_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.event_type} for {self.clerk_id} ({self.status})"
+
 class ClerkUser(models.Model):
     # Store Clerk's user ID. It's a string, so use CharField.
     clerk_id = models.CharField(max_length=255, unique=True, primary_key=True)
@@ -35,10 +106,48 @@ class ClerkUser(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     role = models.CharField(max_length=50, default='user')
+    # When reconcile_clerk_users last saw this user in Clerk; rows a full run didn't see are deleted.
+    synced_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'clerk_id'], name='core_clerkuser_created_idx'),
+            # Covers the users list validators, Max(updated_at) + Count(clerk_id) (core/conditional.py).
+            models.Index(fields=['updated_at', 'clerk_id'], name='core_clerkuser_updated_idx'),
+        ]
 
     def __str__(self):
         return f"{self.first_name} {self.last_name} ({self.email})"
 
+class ClerkSyncRun(models.Model):
+    """
+    Checkpoint of a ``reconcile_clerk_users`` run: how far it has paged
+    through the Clerk users list, so an interrupted run can resume there.
+    """
+    started_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    # Offset of the first Clerk user not yet applied.
+    next_offset = models.PositiveIntegerField(default=0)
+    seen = models.PositiveIntegerField(default=0)
+    created = models.PositiveIntegerField(default=0)
+    updated = models.PositiveIntegerField(default=0)
+    deleted = models.PositiveIntegerField(default=0)
+    failed = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"Clerk sync started {self.started_at:%Y-%m-%d %H:%M} ({'finished' if self.finished_at else f'at {self.next_offset}'})"
+
+class Skill(models.Model):
+    """
+    A normalized skill name (trimmed, single-spaced, lower-case), shared by
+    all freelancers who list it. ``name`` is unique, hence indexed.
+    """
+    name = models.CharField(max_length=100, unique=True)
+
+    def __str__(self):
+        return self.name
+
+
 class Freelancer(models.Model):
 
     """
@@ -52,10 +161,14 @@ class Freelancer(models.Model):
     
     # Profile details
     profile_image = models.ImageField(upload_to='freelancer_profiles/', blank=True, null=True, help_text="Profile picture for the freelancer.")
+    # Resized JPEG/WebP copies of profile_image, filled in by core/images.py.
+    profile_image_variants = models.JSONField(default=dict, blank=True, editable=False)
     years_of_experience = models.CharField(max_length=255, help_text="Number of years of experience in their profession.")
     
     # Skills and contact
     skills = models.CharField(max_length=500, help_text="A comma-separated list of skills (e.g., 'React, Django, Python').")
+    # Normalized copy of `skills`, kept in sync on save, for indexed skill lookups.
+    skill_set = models.ManyToManyField(Skill, related_name='freelancers', blank=True)
     availability = models.CharField(max_length=100, help_text="The freelancer's current availability (e.g., 'Full-time', 'Part-time').")
     phone_number = models.CharField(max_length=20, blank=True, null=True)
     
@@ -63,6 +176,11 @@ class Freelancer(models.Model):
     city = models.CharField(max_length=100, blank=True, null=True)
     country = models.CharField(max_length=100, blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            models.Index(Lower('city'), name='core_freelancer_city_lower_idx'),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -92,11 +210,23 @@ class Gig(models.Model):
 
     # Image and date fields
     image = models.ImageField(upload_to='gig_images/', help_text="An image representing the gig.", blank=True, null=True)
+    # Resized JPEG/WebP copies of image, filled in by core/images.py.
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
 
     # Automatic fields for tracking
     created_at = models.DateTimeField(auto_now_add=True, help_text="The date and time the gig was created.")
     updated_at = models.DateTimeField(auto_now=True, help_text="The date and time the gig was last updated.")
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='core_gig_created_idx'),
+            models.Index(fields=['price'], name='core_gig_price_idx'),
+            # Case-insensitive location match plus a price range (search filters).
+            models.Index(Lower('location'), 'price', name='core_gig_location_price_idx'),
+            # Max(updated_at) for the list's Last-Modified validator (core/conditional.py).
+            models.Index(fields=['updated_at'], name='core_gig_updated_idx'),
+        ]
+
     def __str__(self):
         """String representation of the Gig object."""
         return self.title
@@ -109,6 +239,11 @@ class Testimonial(models.Model):
     text = models.TextField(help_text="The full testimonial text.")
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='core_testimonial_created_idx'),
+        ]
+
     def __str__(self):
         return f"Testimonial by {self.author_name}"
 
@@ -135,8 +270,105 @@ class Application(models.Model):
     applied_at = models.DateTimeField(auto_now_add=True)
     class Meta:
         unique_together = ['gig', 'applicant']
+        indexes = [
+            # The admin lists applications newest first, optionally filtered by status.
+            models.Index(fields=['status', 'applied_at'], name='core_application_status_idx'),
+            models.Index(fields=['applied_at'], name='core_application_applied_idx'),
+        ]
 
     def __str__(self):
         return f"Application for {self.gig.title} by {self.applicant.username}"
 
-   
\ No newline at end of file
+
+class ClerkRoleSyncJob(models.Model):
+    """
+    Outbox row for pushing a role change to Clerk. Written in the request that
+    changes the role (e.g. the M-Pesa callback) and delivered later by the
+    ``process_role_sync`` management command, so callers never wait on Clerk.
+    """
+    STATUS_CHOICES = (
+        ('PENDING', 'Pending'),
+        ('DONE', 'Done'),
+        ('FAILED', 'Failed'),
+    )
+
+    clerk_id = models.CharField(max_length=255)
+    role = models.CharField(max_length=50)
+    # One job per triggering event (e.g. "mpesa:<CheckoutRequestID>"), so redelivered callbacks don't enqueue twice.
+    idempotency_key = models.CharField(max_length=255, unique=True)
+
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True, null=True)
+    # Jobs are only picked up once this is in the past; used for retry backoff and worker leases.
+    available_at = models.DateTimeField(default=timezone.now)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'available_at'], name='core_rolesync_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"Set {self.clerk_id} to {self.role} ({self.status})"
+
+
+class DashboardStat(models.Model):
+    """
+    Running totals shown on the admin dashboard (row counts, revenue, ...),
+    kept up to date by the signal handlers in core/signals.py so the dashboard
+    never has to scan the underlying tables.
+    """
+    name = models.CharField(max_length=50, unique=True)
+    value = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} = {self.value}"
+
+
+class DailySignupStat(models.Model):
+    """Number of ClerkUser sign-ups per (UTC) day, maintained like DashboardStat."""
+    day = models.DateField(unique=True)
+    count = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.day}: {self.count} sign-ups"
+
+
+class TransactionRollup(models.Model):
+    """
+    MpesaTransaction totals per hour or per (UTC) day, by ``created_at``,
+    rebuilt for the days that changed by ``manage.py rollup_transactions``.
+    """
+    GRANULARITY_CHOICES = [
+        ('hour', 'Hour'),
+        ('day', 'Day'),
+    ]
+    granularity = models.CharField(max_length=4, choices=GRANULARITY_CHOICES)
+    bucket = models.DateTimeField(help_text="Start of the hour or day.")
+    transactions = models.IntegerField(default=0)
+    successful = models.IntegerField(default=0)
+    failed = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    payers = models.IntegerField(default=0, help_text="Distinct phone numbers with a successful payment.")
+    median_callback_seconds = models.FloatField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['granularity', 'bucket'], name='core_rollup_granularity_bucket_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.granularity} {self.bucket:%Y-%m-%d %H:%M}: {self.transactions} transactions"
+
+
+class RollupWatermark(models.Model):
+    """How far (by ``updated_at``) a rollup has read its source table."""
+    name = models.CharField(max_length=50, unique=True)
+    watermark = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.name} up to {self.watermark}"
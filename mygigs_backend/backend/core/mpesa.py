@@ -0,0 +1,223 @@
+import asyncio
+import threading
+import time
+import weakref
+
+import httpx
+import requests
+from django.core.cache import cache as default_cache
+from requests.auth import HTTPBasicAuth
+
+from . import integrations
+
+
+class MpesaTokenManager:
+    """
+    Reuses the Daraja OAuth access token until shortly before it expires.
+
+    The token lives in Django's cache so every thread and worker process shares
+    it. Once it is within ``refresh_ahead`` seconds of expiry a background
+    refresh is started while the current token keeps being served, and it is
+    treated as expired ``expiry_margin`` seconds early. Concurrent refreshes
+    are de-duplicated with a lock inside the process and a ``cache.add`` lease
+    across processes. ``aget_token()`` is the same for async views, using the
+    cache's async API and the ``httpx`` client.
+    """
+
+    cache_key = "mpesa:access_token"
+    lease_key = "mpesa:access_token:refresh"
+
+    def __init__(self, base_url, consumer_key, consumer_secret, expiry_margin=60,
+                 refresh_ahead=300, lease_timeout=10, cache=None, client=None, async_client=None):
+        self.base_url = base_url.rstrip("/")
+        self.consumer_key = consumer_key
+        self.consumer_secret = consumer_secret
+        self.expiry_margin = expiry_margin
+        self.refresh_ahead = refresh_ahead
+        self.lease_timeout = lease_timeout
+        self.cache = cache or default_cache
+        self.client = client or integrations.mpesa
+        self.async_client = async_client or integrations.mpesa_async
+        self.fetch_count = 0
+        self._lock = threading.Lock()
+        self._async_locks = weakref.WeakKeyDictionary()
+        self._background_refresh = None
+
+    def get_token(self):
+        """
+        Returns a valid access token, fetching one only if none is cached.
+        Raises requests.RequestException or ValueError if the fetch fails.
+        """
+        entry = self.cache.get(self.cache_key)
+        remaining = self._remaining(entry)
+        if remaining > self.expiry_margin:
+            if remaining < self.refresh_ahead:
+                self._refresh_in_background()
+            return entry["token"]
+        return self.refresh()
+
+    def refresh(self, min_remaining=None, wait_for_lease=True):
+        """
+        Fetches a new token unless the cached one still has more than
+        ``min_remaining`` seconds left (by the time we get the lock, another
+        caller may already have refreshed it).
+        """
+        if min_remaining is None:
+            min_remaining = self.expiry_margin
+
+        with self._lock:
+            entry = self.cache.get(self.cache_key)
+            if self._remaining(entry) > min_remaining:
+                return entry["token"]
+
+            acquired = self.cache.add(self.lease_key, True, self.lease_timeout)
+            if not acquired:
+                # Another process is already refreshing; wait for it to publish the token.
+                if not wait_for_lease:
+                    return entry["token"] if entry else None
+                token = self._wait_for_lease(min_remaining)
+                if token:
+                    return token
+
+            try:
+                token, expires_in = self._fetch_token()
+                self.cache.set(
+                    self.cache_key,
+                    {"token": token, "expires_at": time.time() + expires_in},
+                    timeout=expires_in,
+                )
+                return token
+            finally:
+                # Only our own lease: after a timed-out wait it is still the other process's.
+                if acquired:
+                    self.cache.delete(self.lease_key)
+
+    async def aget_token(self):
+        """
+        Async ``get_token()``. Raises httpx.HTTPError or ValueError if the fetch fails.
+        """
+        entry = await self.cache.aget(self.cache_key)
+        remaining = self._remaining(entry)
+        if remaining > self.expiry_margin:
+            if remaining < self.refresh_ahead:
+                self._refresh_in_background()
+            return entry["token"]
+        return await self.arefresh()
+
+    async def arefresh(self, min_remaining=None):
+        if min_remaining is None:
+            min_remaining = self.expiry_margin
+
+        async with self._async_lock():
+            entry = await self.cache.aget(self.cache_key)
+            if self._remaining(entry) > min_remaining:
+                return entry["token"]
+
+            acquired = await self.cache.aadd(self.lease_key, True, self.lease_timeout)
+            if not acquired:
+                token = await self._await_lease(min_remaining)
+                if token:
+                    return token
+
+            try:
+                token, expires_in = await self._afetch_token()
+                await self.cache.aset(
+                    self.cache_key,
+                    {"token": token, "expires_at": time.time() + expires_in},
+                    timeout=expires_in,
+                )
+                return token
+            finally:
+                if acquired:
+                    await self.cache.adelete(self.lease_key)
+
+    def invalidate(self):
+        """Drops the cached token, e.g. after Daraja rejected it with a 401."""
+        self.cache.delete(self.cache_key)
+
+    async def ainvalidate(self):
+        await self.cache.adelete(self.cache_key)
+
+    def _fetch_token(self):
+        if not self.consumer_key or not self.consumer_secret:
+            raise ValueError("CONSUMER_KEY or CONSUMER_SECRET not found in settings.")
+
+        response = self.client.get(
+            f"{self.base_url}/oauth/v1/generate",
+            params={"grant_type": "client_credentials"},
+            auth=HTTPBasicAuth(self.consumer_key, self.consumer_secret),
+        )
+        response.raise_for_status()
+        self.fetch_count += 1
+        return self._parse_token(response.json())
+
+    @staticmethod
+    def _parse_token(data):
+        access_token = data.get('access_token')
+        if not access_token:
+            raise ValueError("Access token not found in API response.")
+        # Daraja sends expires_in as a string, e.g. "3599".
+        return access_token, int(data.get('expires_in') or 3599)
+
+    async def _afetch_token(self):
+        if not self.consumer_key or not self.consumer_secret:
+            raise ValueError("CONSUMER_KEY or CONSUMER_SECRET not found in settings.")
+
+        response = await self.async_client.get(
+            f"{self.base_url}/oauth/v1/generate",
+            params={"grant_type": "client_credentials"},
+            auth=httpx.BasicAuth(self.consumer_key, self.consumer_secret),
+        )
+        response.raise_for_status()
+        self.fetch_count += 1
+        return self._parse_token(response.json())
+
+    def _wait_for_lease(self, min_remaining):
+        deadline = time.monotonic() + self.lease_timeout
+        while time.monotonic() < deadline:
+            time.sleep(0.05)
+            entry = self.cache.get(self.cache_key)
+            if self._remaining(entry) > min_remaining:
+                return entry["token"]
+            if self.cache.get(self.lease_key) is None:
+                break
+        return None
+
+    async def _await_lease(self, min_remaining):
+        deadline = time.monotonic() + self.lease_timeout
+        while time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+            entry = await self.cache.aget(self.cache_key)
+            if self._remaining(entry) > min_remaining:
+                return entry["token"]
+            if await self.cache.aget(self.lease_key) is None:
+                break
+        return None
+
+    def _async_lock(self):
+        # asyncio locks are bound to one event loop, so there is one per loop.
+        loop = asyncio.get_running_loop()
+        lock = self._async_locks.get(loop)
+        if lock is None:
+            lock = self._async_locks[loop] = asyncio.Lock()
+        return lock
+
+    def _refresh_in_background(self):
+        thread = self._background_refresh
+        if thread is not None and thread.is_alive():
+            return
+        self._background_refresh = threading.Thread(target=self._run_background_refresh, daemon=True)
+        self._background_refresh.start()
+
+    def _run_background_refresh(self):
+        try:
+            self.refresh(min_remaining=self.refresh_ahead, wait_for_lease=False)
+        except (requests.exceptions.RequestException, ValueError) as e:
+            # The current token is still valid; the next request will try again.
+            print(f"Background M-Pesa token refresh failed: {e}")
+
+    @staticmethod
+    def _remaining(entry):
+        if not entry:
+            return 0
+        return entry["expires_at"] - time.time()
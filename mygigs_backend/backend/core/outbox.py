@@ -0,0 +1,128 @@
+"""
+Outbox for Clerk role updates.
+
+Requests that change a user's role only insert a ``ClerkRoleSyncJob`` row;
+``process_role_sync`` claims due jobs in batches, pushes them to the Clerk
+API, and reschedules failures with exponential backoff.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import requests
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import integrations
+from .models import ClerkRoleSyncJob
+
+
+class RoleSyncError(Exception):
+    pass
+
+
+def enqueue_role_sync(clerk_id, role, idempotency_key):
+    """
+    Queues a role update for ``clerk_id``. Enqueuing the same
+    ``idempotency_key`` twice is a no-op; returns True if a job was created.
+    """
+    try:
+        with transaction.atomic():
+            ClerkRoleSyncJob.objects.create(clerk_id=clerk_id, role=role, idempotency_key=idempotency_key)
+    except IntegrityError:
+        return False
+    return True
+
+
+def update_clerk_role(clerk_id, role):
+    """Sets ``public_metadata.role`` on the Clerk user. Raises RoleSyncError on failure."""
+    if not settings.CLERK_SECRET_KEY:
+        raise RoleSyncError("CLERK_SECRET_KEY not set in environment.")
+
+    headers = {
+        "Authorization": f"Bearer {settings.CLERK_SECRET_KEY}",
+        "Content-Type": "application/json"
+    }
+    data = {
+        "public_metadata": {
+            "role": role
+        }
+    }
+    try:
+        resp = integrations.clerk_api.patch(
+            f"{settings.CLERK_API_URL}/users/{clerk_id}",
+            headers=headers,
+            json=data
+        )
+    except requests.exceptions.RequestException as e:
+        raise RoleSyncError(str(e)) from e
+    if resp.status_code >= 400:
+        raise RoleSyncError(f"Clerk API responded {resp.status_code}: {resp.text[:500]}")
+
+
+def claim_due_jobs(batch_size, lease_seconds):
+    """
+    Claims up to ``batch_size`` due jobs by pushing their ``available_at``
+    past the lease, so a crashed worker's jobs become due again afterwards.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        ids = list(
+            ClerkRoleSyncJob.objects
+            .select_for_update(skip_locked=True)
+            .filter(status='PENDING', available_at__lte=now)
+            .order_by('available_at', 'id')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        ClerkRoleSyncJob.objects.filter(pk__in=ids).update(
+            available_at=now + timedelta(seconds=lease_seconds),
+            attempts=F('attempts') + 1,
+        )
+    return list(ClerkRoleSyncJob.objects.filter(pk__in=ids).order_by('id'))
+
+
+def process_batch(batch_size=None, concurrency=4, push=update_clerk_role):
+    """
+    Delivers one batch of due jobs and returns the jobs that were claimed.
+    Jobs for the same (clerk_id, role) in a batch share a single API call.
+    """
+    batch_size = batch_size or settings.ROLE_SYNC_BATCH_SIZE
+    jobs = claim_due_jobs(batch_size, settings.ROLE_SYNC_LEASE_SECONDS)
+    if not jobs:
+        return jobs
+
+    groups = {}
+    for job in jobs:
+        groups.setdefault((job.clerk_id, job.role), []).append(job)
+
+    def deliver(key):
+        try:
+            push(*key)
+            return key, None
+        except RoleSyncError as e:
+            return key, str(e)
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        results = list(pool.map(deliver, groups))
+
+    now = timezone.now()
+    for key, error in results:
+        for job in groups[key]:
+            if error is None:
+                job.status = 'DONE'
+                job.processed_at = now
+                job.last_error = None
+            else:
+                job.last_error = error
+                if job.attempts >= settings.ROLE_SYNC_MAX_ATTEMPTS:
+                    job.status = 'FAILED'
+                    job.processed_at = now
+                else:
+                    job.available_at = now + retry_delay(job.attempts)
+    ClerkRoleSyncJob.objects.bulk_update(jobs, ['status', 'processed_at', 'last_error', 'available_at'])
+    return jobs
+
+
+def retry_delay(attempts):
+    return timedelta(seconds=min(settings.ROLE_SYNC_RETRY_BASE_SECONDS * 2 ** (attempts - 1), 3600))
@@ -0,0 +1,71 @@
+from django.conf import settings
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+
+from . import fast_serializers, metrics
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Keyset (cursor) pagination, newest first, ordered by ``created_at`` with
+    the primary key as a tie-breaker so cursors stay stable as rows are added.
+
+    It is opt-in to keep the existing frontend working: a request is only
+    paginated when it passes ``?page_size=`` or a ``?cursor=`` taken from a
+    previous page; otherwise the full list is returned as before. Views can
+    set ``keyset_ordering`` for models without a ``created_at`` column, and
+    subclasses can set ``opt_in = False`` to always paginate.
+    """
+    opt_in = True
+    ordering = ('-created_at', '-id')
+    page_size = settings.API_PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = settings.API_MAX_PAGE_SIZE
+
+    def is_requested(self, request):
+        if not self.opt_in:
+            return True
+        params = request.query_params
+        return self.cursor_query_param in params or self.page_size_query_param in params
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not self.is_requested(request):
+            return None
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_ordering(self, request, queryset, view):
+        ordering = getattr(view, 'keyset_ordering', None) or self.ordering
+        return (ordering,) if isinstance(ordering, str) else tuple(ordering)
+
+
+class AlwaysKeysetPagination(KeysetPagination):
+    opt_in = False
+
+
+class KeysetListMixin:
+    """
+    Gives plain ``APIView`` list endpoints the same opt-in pagination as the
+    generic views, via ``self.list_response(request, queryset, SerializerClass)``.
+    Serializers with a core/fast_serializers.py counterpart are rendered by it.
+    """
+    pagination_class = KeysetPagination
+
+    def list_response(self, request, queryset, serializer_class):
+        fast = fast_serializers.for_serializer(serializer_class)
+        if fast is not None:
+            # The cursor paginator reads its position from dict rows as well as instances.
+            queryset = fast.values(queryset)
+            serialize = fast.serialize
+        else:
+            serialize = lambda rows: serializer_class(rows, many=True).data
+
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        if page is None:
+            # Evaluate the queryset up front so its time is attributed to the DB, not serialization.
+            page = list(queryset)
+            with metrics.span('serialize'):
+                return Response(serialize(page))
+        with metrics.span('serialize'):
+            data = serialize(page)
+        return paginator.get_paginated_response(data)
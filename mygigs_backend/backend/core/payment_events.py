@@ -0,0 +1,144 @@
+"""
+Push notifications for M-Pesa payment status.
+
+Clients waiting on an STK push hold a connection open on one of the async
+status views (served through backend/asgi.py) instead of polling
+/core/check-status/. Every saved ``MpesaTransaction`` publishes its status
+once the write commits (see core/signals.py), and ``PaymentStatusBroker``
+wakes the listeners for that CheckoutRequestID on this process's event loop.
+
+The broker only reaches listeners in the same process. With several worker
+processes, set PAYMENT_EVENTS_CHANNEL to a cross-process channel such as
+``RedisChannel`` so a callback handled by one worker reaches streams held by
+the others.
+"""
+import asyncio
+import json
+import threading
+from collections import defaultdict
+from contextlib import asynccontextmanager
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.module_loading import import_string
+
+PENDING, SUCCESS, FAILED = 'pending', 'success', 'failed'
+FINAL_STATUSES = (SUCCESS, FAILED)
+
+
+def transaction_status(result_code):
+    """Maps an MpesaTransaction.result_code to the status reported to the frontend."""
+    result_code = None if result_code in (None, '') else str(result_code)
+    if result_code is None:
+        return PENDING
+    return SUCCESS if result_code == '0' else FAILED
+
+
+class PaymentStatusBroker:
+    """
+    In-process pub/sub keyed by CheckoutRequestID. Listeners are asyncio
+    queues; ``deliver()`` may be called from any thread (the callback view is
+    synchronous) and hands the status to each listener's own event loop.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._listeners = defaultdict(set)
+
+    def subscribe(self, key):
+        queue = asyncio.Queue()
+        with self._lock:
+            self._listeners[key].add((asyncio.get_running_loop(), queue))
+        return queue
+
+    def unsubscribe(self, key, queue):
+        with self._lock:
+            listeners = self._listeners.get(key)
+            if listeners is None:
+                return
+            listeners.difference_update([entry for entry in listeners if entry[1] is queue])
+            if not listeners:
+                del self._listeners[key]
+
+    def deliver(self, key, status):
+        with self._lock:
+            listeners = list(self._listeners.get(key, ()))
+        for loop, queue in listeners:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, status)
+            except RuntimeError:
+                # The listener's loop has shut down; its subscription goes with it.
+                pass
+
+    def listener_count(self):
+        with self._lock:
+            return sum(len(listeners) for listeners in self._listeners.values())
+
+
+broker = PaymentStatusBroker()
+
+
+class LocalChannel:
+    """Delivers events to listeners in this process only (single-worker deployments)."""
+
+    def publish(self, key, status):
+        broker.deliver(key, status)
+
+
+class RedisChannel:
+    """
+    Relays events through Redis pub/sub so every worker process sees them.
+    Needs the optional ``redis`` package and PAYMENT_EVENTS_REDIS_URL.
+    """
+    channel = 'mygigs:payment-status'
+
+    def __init__(self):
+        try:
+            import redis
+        except ImportError:
+            raise ImproperlyConfigured("RedisChannel requires the 'redis' package (pip install redis).")
+        self.client = redis.Redis.from_url(settings.PAYMENT_EVENTS_REDIS_URL)
+        threading.Thread(target=self._listen, name='payment-events', daemon=True).start()
+
+    def publish(self, key, status):
+        # Our own subscriber thread receives this too, so local listeners aren't notified directly.
+        self.client.publish(self.channel, json.dumps([key, status]))
+
+    def _listen(self):
+        pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(self.channel)
+        for message in pubsub.listen():
+            try:
+                key, status = json.loads(message['data'])
+            except (TypeError, ValueError):
+                continue
+            broker.deliver(key, status)
+
+
+_channel = None
+_channel_lock = threading.Lock()
+
+
+def get_channel():
+    global _channel
+    with _channel_lock:
+        if _channel is None:
+            _channel = import_string(settings.PAYMENT_EVENTS_CHANNEL)()
+    return _channel
+
+
+def publish(key, status):
+    try:
+        get_channel().publish(key, status)
+    except Exception as e:
+        # Listeners fall back to their timeout; the payment itself is already recorded.
+        print(f"Could not publish payment status for {key}: {e}")
+
+
+@asynccontextmanager
+async def subscription(key):
+    queue = broker.subscribe(key)
+    try:
+        yield queue
+    finally:
+        broker.unsubscribe(key, queue)
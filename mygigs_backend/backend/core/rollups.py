@@ -0,0 +1,158 @@
+"""
+Hourly and daily rollups of M-Pesa transactions for revenue and conversion
+charts.
+
+``refresh()`` (``manage.py rollup_transactions``, run on a schedule) finds
+the transactions whose ``updated_at`` is past the ``RollupWatermark`` and
+rebuilds the ``TransactionRollup`` rows of just the (UTC) days they were
+created on. Whole days are recomputed rather than adjusted by deltas because
+distinct payers and the median time to callback can't be added up. The
+watermark trails the clock by TRANSACTION_ROLLUP_LAG_SECONDS so writes that
+commit late are still picked up next time. Deleted transactions don't move
+any ``updated_at``; ``refresh(full=True)`` recomputes everything.
+
+``series()`` serves /core/transactions/rollups/ from the rollup table alone,
+so a year of data is a few hundred (or, hourly, a few thousand) rows.
+"""
+import statistics
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncHour
+from django.utils import timezone
+
+from .models import MpesaTransaction, RollupWatermark, TransactionRollup
+
+WATERMARK = 'transactions'
+STEPS = {'hour': timedelta(hours=1), 'day': timedelta(days=1)}
+# Default range of /core/transactions/rollups/ per granularity, and the most buckets one request may span.
+DEFAULT_SPANS = {'hour': timedelta(hours=48), 'day': timedelta(days=30)}
+MAX_BUCKETS = 24 * 366
+SERIES_FIELDS = ('transactions', 'successful', 'failed', 'revenue', 'payers', 'median_callback_seconds')
+
+SUCCESSFUL = Q(result_code='0')
+# As the dashboard counts them: any result other than success.
+FAILED = Q(result_code__isnull=False) & ~Q(result_code__in=['', '0'])
+AGGREGATES = {
+    'transactions': Count('id'),
+    'successful': Count('id', filter=SUCCESSFUL),
+    'failed': Count('id', filter=FAILED),
+    'revenue': Sum('amount', filter=SUCCESSFUL),
+    'payers': Count('phone_number', filter=SUCCESSFUL, distinct=True),
+}
+
+
+def day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def refresh(full=False, lag=None):
+    """
+    Brings the rollups up to date and returns (days rebuilt, new watermark).
+    With ``full``, every day is rebuilt and rollups of days with no
+    transactions left are dropped.
+    """
+    lag = settings.TRANSACTION_ROLLUP_LAG_SECONDS if lag is None else lag
+    cutoff = timezone.now() - timedelta(seconds=lag)
+    with transaction.atomic():
+        state, _ = RollupWatermark.objects.select_for_update().get_or_create(name=WATERMARK)
+        changed = MpesaTransaction.objects.filter(updated_at__lte=cutoff)
+        if state.watermark is not None and not full:
+            changed = changed.filter(updated_at__gt=state.watermark)
+        else:
+            TransactionRollup.objects.all().delete()
+        days = list(changed.dates('created_at', 'day'))
+        for day in days:
+            rebuild_day(day)
+        state.watermark = cutoff
+        state.save(update_fields=['watermark'])
+    return len(days), cutoff
+
+
+def rebuild_day(day):
+    """Replaces the hourly and daily rollups of one day with totals recomputed from its transactions."""
+    start = day_start(day)
+    end = start + STEPS['day']
+    rows = MpesaTransaction.objects.filter(created_at__gte=start, created_at__lt=end)
+
+    totals = {
+        ('hour', row.pop('bucket')): row
+        for row in rows.annotate(bucket=TruncHour('created_at')).values('bucket').annotate(**AGGREGATES).order_by()
+    }
+    daily = rows.aggregate(**AGGREGATES)
+    if daily['transactions']:
+        totals['day', start] = daily
+
+    waits = defaultdict(list)
+    for created_at, callback_at in rows.filter(callback_at__isnull=False).values_list('created_at', 'callback_at'):
+        seconds = (callback_at - created_at).total_seconds()
+        waits['hour', created_at.replace(minute=0, second=0, microsecond=0)].append(seconds)
+        waits['day', start].append(seconds)
+
+    TransactionRollup.objects.filter(bucket__gte=start, bucket__lt=end).delete()
+    TransactionRollup.objects.bulk_create([
+        TransactionRollup(
+            granularity=granularity,
+            bucket=bucket,
+            revenue=values.pop('revenue') or 0,
+            median_callback_seconds=round(statistics.median(waits[granularity, bucket]), 1) if waits[granularity, bucket] else None,
+            **values,
+        )
+        for (granularity, bucket), values in totals.items()
+    ])
+
+
+def truncate(moment, granularity):
+    moment = timezone.localtime(moment).replace(minute=0, second=0, microsecond=0)
+    return moment.replace(hour=0) if granularity == 'day' else moment
+
+
+def series(granularity, start=None, end=None):
+    """
+    The ``granularity`` ('hour' or 'day') buckets in [start, end), oldest
+    first, with empty buckets included. ``end`` defaults to the current
+    bucket, ``start`` to DEFAULT_SPANS before it. Raises ValueError for an
+    unknown granularity or a range of more than MAX_BUCKETS.
+    """
+    if granularity not in STEPS:
+        raise ValueError(f"granularity must be one of {', '.join(STEPS)}.")
+    step = STEPS[granularity]
+    end = truncate(end, granularity) if end else truncate(timezone.now(), granularity) + step
+    start = truncate(start, granularity) if start else end - DEFAULT_SPANS[granularity]
+    if start >= end:
+        return []
+    if (end - start) / step > MAX_BUCKETS:
+        raise ValueError(f"At most {MAX_BUCKETS} {granularity} buckets per request; narrow start/end.")
+
+    rollups = {
+        bucket: values
+        for bucket, *values in TransactionRollup.objects.filter(
+            granularity=granularity, bucket__gte=start, bucket__lt=end
+        ).values_list('bucket', *SERIES_FIELDS)
+    }
+    empty = [0, 0, 0, 0, 0, None]
+    points = []
+    bucket = start
+    while bucket < end:
+        transactions, successful, failed, revenue, payers, median_callback_seconds = rollups.get(bucket, empty)
+        completed = successful + failed
+        points.append({
+            'bucket': bucket.isoformat().replace('+00:00', 'Z'),
+            'transactions': transactions,
+            'successful': successful,
+            'failed': failed,
+            'pending': transactions - completed,
+            'revenue': f"{revenue:.2f}",
+            'success_rate': round(successful / completed, 4) if completed else None,
+            'payers': payers,
+            'median_callback_seconds': median_callback_seconds,
+        })
+        bucket += step
+    return points
+
+
+def watermark():
+    return RollupWatermark.objects.filter(name=WATERMARK).values_list('watermark', flat=True).first()
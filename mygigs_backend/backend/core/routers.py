@@ -0,0 +1,103 @@
+"""
+Read replica routing.
+
+With DB_REPLICA_NAME set, views that list ``ReplicaReadMixin`` run their
+GET/HEAD queries on the ``replica`` database; all writes, all other views
+(STK push, status checks, webhooks) and raw ``connection`` queries stay on
+``default``. A client that has just written something reads from the
+primary for DB_REPLICA_STICKY_SECONDS afterwards, so it sees its own write
+despite replication lag; DB_REPLICA_STICKY_SECONDS should exceed the
+replica's worst lag.
+
+``ReplicaStickinessMiddleware`` pins the client two ways. The
+DB_REPLICA_STICKY_COOKIE only comes back from same-origin or credentialed
+requests, which the cross-origin frontend does not make, so the Clerk user id
+(``sub``) of the request's bearer token is also pinned in the cache. That
+pin is only seen by every worker when the cache is shared (see
+API_CACHE_TIMEOUT). The token is not verified here: a forged one can do no
+more than send its own reads to the primary.
+"""
+import contextvars
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from jose import jwt
+from jose.exceptions import JOSEError
+
+REPLICA_DB_ALIAS = 'replica'
+
+_replica_reads = contextvars.ContextVar('replica_reads', default=False)
+
+
+def routing_enabled():
+    return settings.DB_REPLICA_ROUTING and REPLICA_DB_ALIAS in settings.DATABASES
+
+
+@contextmanager
+def replica_reads():
+    """Sends reads in the block to the replica (when routing is enabled)."""
+    token = _replica_reads.set(True)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def reading_from_replica():
+    return _replica_reads.get() and routing_enabled()
+
+
+def may_lag(version):
+    """
+    True while a change made at ``version`` (a ``time_ns()`` stamp, as the
+    cache namespace versions are) may not have reached the replica yet.
+    """
+    return time.time_ns() - version < settings.DB_REPLICA_STICKY_SECONDS * 1_000_000_000
+
+
+def pin_key(request):
+    """Cache key pinning the bearer token's user to the primary, or None without a usable token."""
+    auth_header = request.headers.get('Authorization', '')
+    if not auth_header.startswith('Bearer '):
+        return None
+    try:
+        sub = jwt.get_unverified_claims(auth_header[len('Bearer '):]).get('sub')
+    except JOSEError:
+        return None
+    return f"replica:pinned:{sub}" if isinstance(sub, str) and sub else None
+
+
+def is_pinned(request):
+    if settings.DB_REPLICA_STICKY_COOKIE in request.COOKIES:
+        return True
+    key = pin_key(request)
+    return key is not None and cache.get(key) is not None
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return REPLICA_DB_ALIAS if reading_from_replica() else DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica is a copy of the primary, so objects from either can be related.
+        return True
+
+
+class ReplicaReadMixin:
+    """
+    For read-only ``APIView`` subclasses that can tolerate replication lag.
+    List it first so validators (ConditionalGetMixin) and cache fills
+    (CachedResponseMixin) read from the replica too.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method in ('GET', 'HEAD') and not is_pinned(request):
+            with replica_reads():
+                return super().dispatch(request, *args, **kwargs)
+        return super().dispatch(request, *args, **kwargs)
@@ -0,0 +1,157 @@
+"""
+Full-text search over gigs.
+
+On SQLite the index is an FTS5 table (``core_gig_fts``, created by migration)
+ranked with bm25; other databases fall back to ``IcontainsSearchBackend``
+unless GIG_SEARCH_BACKEND points at another backend class. The index is kept
+in sync by the Gig signal handlers in core/signals.py.
+"""
+import re
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.db.models.functions import Lower
+from django.utils.module_loading import import_string
+
+from .models import Gig
+
+TERM_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def search_terms(query):
+    return TERM_RE.findall((query or "").lower())[:10]
+
+
+class GigSearchBackend:
+    """
+    Interface for gig search backends. ``search`` returns the total number of
+    matches and the ids of one page of them, best match first.
+    """
+
+    def index(self, gig):
+        pass
+
+    def remove(self, gig_id):
+        pass
+
+    def rebuild(self):
+        pass
+
+    def search(self, query, min_price=None, max_price=None, location=None, offset=0, limit=20):
+        raise NotImplementedError
+
+    def filtered(self, min_price=None, max_price=None, location=None):
+        gigs = Gig.objects.all()
+        if min_price is not None:
+            gigs = gigs.filter(price__gte=min_price)
+        if max_price is not None:
+            gigs = gigs.filter(price__lte=max_price)
+        if location:
+            # Compared via LOWER(location) so the core_gig_location_price_idx expression index is used.
+            gigs = gigs.annotate(location_lower=Lower('location')).filter(location_lower=location.lower())
+        return gigs
+
+
+class IcontainsSearchBackend(GigSearchBackend):
+    """
+    Portable fallback: every term must appear somewhere in the gig; matches in
+    the title rank above the location, which rank above the description.
+    """
+
+    def search(self, query, min_price=None, max_price=None, location=None, offset=0, limit=20):
+        gigs = self.filtered(min_price, max_price, location)
+        terms = search_terms(query)
+        if not terms:
+            gigs = gigs.order_by('-created_at', '-id')
+            return gigs.count(), list(gigs.values_list('id', flat=True)[offset:offset + limit])
+
+        score = Value(0)
+        for term in terms:
+            gigs = gigs.filter(Q(title__icontains=term) | Q(description__icontains=term) | Q(location__icontains=term))
+            score = score + Case(
+                When(title__icontains=term, then=Value(3)),
+                When(location__icontains=term, then=Value(2)),
+                default=Value(1),
+                output_field=IntegerField(),
+            )
+        gigs = gigs.annotate(score=score).order_by('-score', '-created_at', '-id')
+        return gigs.count(), list(gigs.values_list('id', flat=True)[offset:offset + limit])
+
+
+class SQLiteFTSSearchBackend(GigSearchBackend):
+    """Inverted index in the ``core_gig_fts`` FTS5 table, keyed by gig id."""
+
+    table = "core_gig_fts"
+    # bm25 column weights for (title, description, location).
+    weights = (10.0, 1.0, 5.0)
+
+    def index(self, gig):
+        # One transaction, or concurrent saves of a gig can both delete and then both insert its rowid.
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table} WHERE rowid = %s", [gig.pk])
+            cursor.execute(
+                f"INSERT INTO {self.table} (rowid, title, description, location) VALUES (%s, %s, %s, %s)",
+                [gig.pk, gig.title, gig.description, gig.location],
+            )
+
+    def remove(self, gig_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table} WHERE rowid = %s", [gig_id])
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table}")
+            cursor.execute(
+                f"INSERT INTO {self.table} (rowid, title, description, location) "
+                f"SELECT id, title, description, location FROM {Gig._meta.db_table}"
+            )
+
+    def search(self, query, min_price=None, max_price=None, location=None, offset=0, limit=20):
+        terms = search_terms(query)
+        if not terms:
+            return IcontainsSearchBackend().search(None, min_price, max_price, location, offset, limit)
+
+        # Quote each term so user input can't inject FTS syntax; the trailing * makes it a prefix match.
+        match = " ".join(f'"{term}"*' for term in terms)
+        where = [f"{self.table} MATCH %s"]
+        params = [match]
+        if min_price is not None:
+            where.append("g.price >= %s")
+            params.append(min_price)
+        if max_price is not None:
+            where.append("g.price <= %s")
+            params.append(max_price)
+        if location:
+            where.append("g.location = %s COLLATE NOCASE")
+            params.append(location)
+
+        source = (
+            f"FROM {self.table} JOIN {Gig._meta.db_table} g ON g.id = {self.table}.rowid "
+            f"WHERE {' AND '.join(where)}"
+        )
+        weights = ", ".join(str(w) for w in self.weights)
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT COUNT(*) {source}", params)
+            total = cursor.fetchone()[0]
+            cursor.execute(
+                f"SELECT g.id {source} ORDER BY bm25({self.table}, {weights}), g.id DESC LIMIT %s OFFSET %s",
+                params + [limit, offset],
+            )
+            ids = [row[0] for row in cursor.fetchall()]
+        return total, ids
+
+
+_backend = None
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        if settings.GIG_SEARCH_BACKEND:
+            _backend = import_string(settings.GIG_SEARCH_BACKEND)()
+        elif connection.vendor == 'sqlite':
+            _backend = SQLiteFTSSearchBackend()
+        else:
+            _backend = IcontainsSearchBackend()
+    return _backend
@@ -1,11 +1,13 @@
 from rest_framework import serializers
+from . import images
 from .models import MpesaTransaction, Gig, ClerkUser, Freelancer, Testimonial, Application
 
 class ClerkUserSerializer(serializers.ModelSerializer):
     """Serializer for the ClerkUser model."""
     class Meta:
         model = ClerkUser
-        fields = '__all__'
+        # synced_at is bookkeeping for reconcile_clerk_users.
+        exclude = ['synced_at']
         
 class MpesaTransactionSerializer(serializers.ModelSerializer):
     """Serializer for the MpesaTransaction model."""
@@ -15,21 +17,25 @@ class MpesaTransactionSerializer(serializers.ModelSerializer):
 
 class FreelancerSerializer(serializers.ModelSerializer):
     """
-    Serializer for the Freelancer model, including nested user profile data.
-    We use a nested serializer to correctly represent the ClerkUser details.
+    Serializer for the Freelancer model.
     """
-    user_profile = ClerkUserSerializer(read_only=True)
+    # Only present when the list is ranked by skill overlap (?skills= or ?gig=).
+    skill_overlap = serializers.IntegerField(read_only=True)
+    # Resized JPEG/WebP URLs and srcsets for profile_image; null until they are rendered.
+    profile_image_variants = serializers.SerializerMethodField()
     
     class Meta:
         model = Freelancer
-        fields = '__all__'
+        # skill_set mirrors `skills` and is maintained on save, so it is left out of the payload.
+        exclude = ['skill_set']
+
+    def get_profile_image_variants(self, obj):
+        return images.variant_urls(obj, self.context.get('request'))
 
 class TestimonialSerializer(serializers.ModelSerializer):
     """
-    Serializer for the Testimonial model, including the full reviewer profile.
+    Serializer for the Testimonial model.
     """
-    reviewer = ClerkUserSerializer(read_only=True)
-
     class Meta:
         model = Testimonial
         fields = '__all__'
@@ -40,13 +46,21 @@ class GigSerializer(serializers.ModelSerializer):
     to display their name.
     """
     creator_name = serializers.SerializerMethodField()
+    # Resized JPEG/WebP URLs and srcsets for image; null until they are rendered.
+    image_variants = serializers.SerializerMethodField()
     
     class Meta:
         model = Gig
         fields = '__all__'
+
+    def get_image_variants(self, obj):
+        return images.variant_urls(obj, self.context.get('request'))
         
     def get_creator_name(self, obj):
-        """Returns the full name of the gig creator."""
+        """
+        Returns the full name of the gig creator. Views should
+        select_related('creator') so this doesn't cost a query per gig.
+        """
         if obj.creator:
             return f"{obj.creator.profession} {obj.creator.name}"
         return "Unknown"
@@ -59,7 +73,9 @@ class ClerkUserNestedSerializer(serializers.ModelSerializer):
         read_only_fields = fields # Ensure these fields are only for display
 
 class ApplicationSerializer(serializers.ModelSerializer):
+    # Views must select_related('gig') so gig_title doesn't cost a query per row.
     gig_title = serializers.CharField(source='gig.title', read_only=True)
+    applicant_clerk_id = serializers.CharField(source='applicant_id', read_only=True)
 
     class Meta:
         model = Application
@@ -0,0 +1,110 @@
+"""
+Signal handlers that keep denormalized data in step with the models they derive from.
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import cache, dashboard, images, payment_events, search, skills
+from .models import ClerkUser, Freelancer, Gig, MpesaTransaction, Testimonial
+
+COUNTED_MODELS = {
+    Gig: 'gigs',
+    Freelancer: 'freelancers',
+    Testimonial: 'testimonials',
+    ClerkUser: 'users',
+    MpesaTransaction: 'transactions',
+}
+
+
+def count_created(sender, instance, created, **kwargs):
+    # Fixture loads (loaddata) are raw saves; rebuild_stats() counts what they load.
+    if created and not kwargs.get('raw'):
+        dashboard.bump(**{COUNTED_MODELS[sender]: 1})
+
+
+def count_deleted(sender, instance, **kwargs):
+    dashboard.bump(**{COUNTED_MODELS[sender]: -1})
+
+
+for model in COUNTED_MODELS:
+    post_save.connect(count_created, sender=model, dispatch_uid=f"dashboard_count_created_{model.__name__}")
+    post_delete.connect(count_deleted, sender=model, dispatch_uid=f"dashboard_count_deleted_{model.__name__}")
+
+
+@receiver(post_save, sender=ClerkUser)
+def count_signup(sender, instance, created, **kwargs):
+    if created and not kwargs.get('raw'):
+        dashboard.bump_signups(timezone.localdate(instance.created_at), 1)
+
+
+@receiver(post_delete, sender=ClerkUser)
+def uncount_signup(sender, instance, **kwargs):
+    dashboard.bump_signups(timezone.localdate(instance.created_at), -1)
+
+
+@receiver(pre_save, sender=MpesaTransaction)
+def remember_transaction_outcome(sender, instance, **kwargs):
+    if kwargs.get('raw'):
+        return
+    # Needed to work out how much this save changes the success/revenue totals.
+    previous = None
+    if instance.pk:
+        previous = sender.objects.filter(pk=instance.pk).values_list('result_code', 'amount').first()
+    instance._previous_contribution = dashboard.transaction_contribution(*(previous or (None, None)))
+
+
+@receiver(post_save, sender=MpesaTransaction)
+def count_transaction_outcome(sender, instance, **kwargs):
+    if kwargs.get('raw'):
+        return
+    before = getattr(instance, '_previous_contribution', None) or dashboard.transaction_contribution(None, None)
+    after = dashboard.transaction_contribution(instance.result_code, instance.amount)
+    dashboard.bump(**{name: after[name] - before[name] for name in after})
+
+
+@receiver(post_save, sender=MpesaTransaction)
+def publish_payment_status(sender, instance, **kwargs):
+    key, status = instance.checkout_request_id, payment_events.transaction_status(instance.result_code)
+    transaction.on_commit(lambda: payment_events.publish(key, status))
+
+
+@receiver(post_delete, sender=MpesaTransaction)
+def uncount_transaction_outcome(sender, instance, **kwargs):
+    removed = dashboard.transaction_contribution(instance.result_code, instance.amount)
+    dashboard.bump(**{name: -value for name, value in removed.items()})
+
+
+@receiver(post_save, sender=Gig)
+def index_gig(sender, instance, **kwargs):
+    search.get_backend().index(instance)
+
+
+@receiver(post_delete, sender=Gig)
+def unindex_gig(sender, instance, **kwargs):
+    search.get_backend().remove(instance.pk)
+
+
+@receiver(post_save, sender=Freelancer)
+def sync_skills(sender, instance, **kwargs):
+    skills.sync_freelancer_skills(instance)
+
+
+def render_image_variants(sender, instance, **kwargs):
+    images.schedule(instance)
+
+
+for model in images.IMAGE_FIELDS:
+    post_save.connect(render_image_variants, sender=model, dispatch_uid=f"image_variants_{model.__name__}")
+
+
+def invalidate_cached_responses(sender, instance, **kwargs):
+    # After commit: bumped earlier, a reader could still see the old rows and cache them under the new version.
+    namespaces = cache.DEPENDENCIES[sender.__name__]
+    transaction.on_commit(lambda: cache.invalidate(*namespaces))
+
+
+for model in (Gig, Freelancer, Testimonial):
+    post_save.connect(invalidate_cached_responses, sender=model, dispatch_uid=f"cache_invalidate_saved_{model.__name__}")
+    post_delete.connect(invalidate_cached_responses, sender=model, dispatch_uid=f"cache_invalidate_deleted_{model.__name__}")
@@ -0,0 +1,75 @@
+"""
+Normalized freelancer skills and skill-overlap matching.
+
+``Freelancer.skills`` stays the comma-separated text the frontend edits;
+``Freelancer.skill_set`` mirrors it as Skill rows so that "who knows Django"
+is an indexed join instead of a LIKE scan over every freelancer.
+"""
+import re
+
+from django.db.models import Count, Q
+from django.db.models.functions import Lower
+
+from .models import Freelancer, Skill
+
+WORD_RE = re.compile(r"[\w+#.]+", re.UNICODE)
+
+
+def normalize_skill(name):
+    return " ".join(name.split()).lower()[:100]
+
+
+def parse_skills(raw):
+    """Splits a comma-separated skills string into unique normalized names, keeping order."""
+    names = []
+    for part in (raw or "").split(","):
+        name = normalize_skill(part)
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+def get_or_create_skills(names):
+    if not names:
+        return []
+    Skill.objects.bulk_create([Skill(name=name) for name in names], ignore_conflicts=True)
+    return list(Skill.objects.filter(name__in=names))
+
+
+def sync_freelancer_skills(freelancer):
+    freelancer.skill_set.set(get_or_create_skills(parse_skills(freelancer.skills)))
+
+
+def skills_mentioned_in(text):
+    """Known skills whose name appears in ``text`` as a word or two-word phrase (e.g. a gig description)."""
+    words = [word.strip(".").lower() for word in WORD_RE.findall(text or "")]
+    candidates = set(words) | {f"{a} {b}" for a, b in zip(words, words[1:])}
+    candidates.discard("")
+    return list(Skill.objects.filter(name__in=candidates))
+
+
+def match_freelancers(skills, city=None, require_all=False, queryset=None, requested=None):
+    """
+    Freelancers having at least one of ``skills`` (all of them with
+    ``require_all``), annotated with ``skill_overlap`` and best match first.
+    ``requested`` is how many skill names were asked for, when ``skills``
+    only holds the ones that exist: with ``require_all``, nobody can have
+    one that doesn't, so nothing matches.
+    """
+    if require_all and requested is not None and requested > len(skills):
+        return Freelancer.objects.none()
+    freelancers = Freelancer.objects.all() if queryset is None else queryset
+    if city:
+        freelancers = filter_city(freelancers, city)
+    skill_ids = [skill.pk for skill in skills]
+    freelancers = freelancers.filter(skill_set__in=skill_ids).annotate(
+        skill_overlap=Count('skill_set', filter=Q(skill_set__in=skill_ids), distinct=True)
+    )
+    if require_all:
+        freelancers = freelancers.filter(skill_overlap=len(skill_ids))
+    return freelancers.order_by('-skill_overlap', '-id')
+
+
+def filter_city(freelancers, city):
+    # Compared via LOWER(city) so the core_freelancer_city_lower_idx expression index is used.
+    return freelancers.annotate(city_lower=Lower('city')).filter(city_lower=city.strip().lower())
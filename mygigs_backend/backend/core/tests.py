@@ -1,3 +1,973 @@
+import io
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core import serializers
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+import httpx
+from jose import jwt
+from PIL import Image
+import requests
+from rest_framework import exceptions
+from rest_framework.test import APIRequestFactory, force_authenticate
+from svix.webhooks import Webhook
+
+from . import callbacks, clerk_sync, dashboard, exports, images, integrations, metrics, outbox, rollups, routers, search, skills, webhooks
+from .auth import JWKSKeyStore, VerifiedTokenCache
+from .management.commands._stubs import StubServer, clerk_user, clerk_users_routes, jwks_routes
+from .management.commands.bench_clerk_auth import make_signing_key
+from .models import Application, ClerkRoleSyncJob, ClerkSyncRun, ClerkUser, ClerkWebhookEvent, DailySignupStat, DashboardStat, Freelancer, Gig, MpesaTransaction, Testimonial, TransactionRollup
+from .mpesa import MpesaTokenManager
+from .views import ClerkJWTAuthentication, FreelancerDashboardAPIView
+
+
+@override_settings(API_CACHE_TIMEOUT=0)
+class QueryCountTests(TestCase):
+    """
+    Guards against N+1 regressions: each endpoint must issue a fixed number of
+    queries no matter how many rows it serializes.
+    """
+
+    def setUp(self):
+        self.owner = Freelancer.objects.create(
+            name="Owner", profession="Designer", years_of_experience="3",
+            skills="Figma", availability="Full-time",
+        )
+        self.rows = 0
+
+    def add_rows(self, n):
+        for _ in range(n):
+            i = self.rows = self.rows + 1
+            creator = Freelancer.objects.create(
+                name=f"Freelancer {i}", profession="Developer", years_of_experience="2",
+                skills="Django", availability="Part-time",
+            )
+            Gig.objects.create(creator=creator, title=f"Gig {i}", description="...", price=100, location="Nairobi")
+            owned = Gig.objects.create(creator=self.owner, title=f"Owned gig {i}", description="...", price=50, location="Mombasa")
+            user = ClerkUser.objects.create(clerk_id=f"user_{i}", email=f"user{i}@example.com")
+            Application.objects.create(gig=owned, applicant=user, cover_letter="Hire me")
+            Testimonial.objects.create(author_name=f"Client {i}", text="Great work")
+            MpesaTransaction.objects.create(checkout_request_id=f"ws_CO_{i}", amount=10, clerk_id=user.clerk_id)
+
+    def count_queries(self, fn):
+        with CaptureQueriesContext(connection) as ctx:
+            response = fn()
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def assertConstantQueries(self, expected, fn):
+        self.add_rows(2)
+        self.assertEqual(self.count_queries(fn), expected)
+        self.add_rows(10)
+        self.assertEqual(self.count_queries(fn), expected)
+
+    # Views using ConditionalGetMixin add one aggregate query for their validators.
+
+    def test_gig_list(self):
+        self.assertConstantQueries(2, lambda: self.client.get('/core/gigs/'))
+
+    def test_gig_list_paginated(self):
+        self.assertConstantQueries(2, lambda: self.client.get('/core/gigs/?page_size=5'))
+
+    def test_freelancer_list(self):
+        self.assertConstantQueries(1, lambda: self.client.get('/core/freelancers/'))
+
+    def test_testimonial_list(self):
+        self.assertConstantQueries(1, lambda: self.client.get('/core/testimonials/'))
+
+    def test_clerk_user_list(self):
+        self.assertConstantQueries(2, lambda: self.client.get('/core/clerk-users/'))
+
+    def test_transaction_list(self):
+        self.assertConstantQueries(2, lambda: self.client.get('/core/transactions/'))
+
+    def test_dashboard_data(self):
+        self.assertConstantQueries(2, lambda: self.client.get('/core/dashboard-data/'))
+
+    def test_dashboard_sections(self):
+        for section in ('gigs', 'freelancers', 'testimonials', 'transactions', 'users'):
+            with self.subTest(section=section):
+                self.assertConstantQueries(1, lambda: self.client.get(f'/core/dashboard-data/{section}/?page_size=5'))
+
+    def test_freelancer_dashboard(self):
+        def fetch():
+            request = APIRequestFactory().get('/core/freelancers-dashboard/')
+            force_authenticate(request, user=SimpleNamespace(freelancer=self.owner, is_authenticated=True))
+            return FreelancerDashboardAPIView.as_view()(request)
+
+        self.assertConstantQueries(2, fetch)
+
+
+class ConditionalGetTests(TestCase):
+    """Unchanged resources must be answered with a 304 from the validator query alone."""
+
+    def test_not_modified_until_row_changes(self):
+        transaction = MpesaTransaction.objects.create(checkout_request_id="ws_CO_1", amount=10)
+        url = '/core/check-status/ws_CO_1/'
+        first = self.client.get(url)
+        self.assertEqual(first.json(), {"status": "pending"})
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+        self.assertEqual(len(ctx.captured_queries), 1)
+
+        transaction.result_code = "0"
+        transaction.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"status": "success"})
+        self.assertNotEqual(response['ETag'], first['ETag'])
+
+
+class CachedResponseTests(TestCase):
+    """Cached list responses must go stale once a write they depend on commits."""
+
+    def test_gig_edit_invalidates_freelancer_ranking(self):
+        Freelancer.objects.create(name="A", profession="Developer", years_of_experience="2", availability="Full-time", skills="django")
+        Freelancer.objects.create(name="B", profession="Designer", years_of_experience="2", availability="Full-time", skills="figma")
+        with self.captureOnCommitCallbacks(execute=True):
+            gig = Gig.objects.create(title="Django API", description="...", price=100, location="Nairobi")
+        url = f'/core/freelancers/?gig={gig.pk}'
+        self.assertEqual([f['name'] for f in self.client.get(url).json()], ["A"])
+
+        with self.captureOnCommitCallbacks(execute=False) as scheduled:
+            gig.title = "Figma mockups"
+            gig.save()
+        # Not before the commit, when a concurrent reader could still cache the old ranking.
+        self.assertEqual([f['name'] for f in self.client.get(url).json()], ["A"])
+        for callback in scheduled:
+            callback()
+        self.assertEqual([f['name'] for f in self.client.get(url).json()], ["B"])
+
+    @override_settings(ALLOWED_HOSTS=['a.example.com', 'b.example.com'])
+    def test_keyed_by_host(self):
+        for title in ("First", "Second"):
+            Gig.objects.create(title=title, description="...", price=100, location="Nairobi")
+        for host in ('a.example.com', 'b.example.com'):
+            page = self.client.get('/core/gigs/?page_size=1', HTTP_HOST=host).json()
+            self.assertTrue(page['next'].startswith(f"http://{host}/core/gigs/?"), page['next'])
+
+
+@override_settings(API_CACHE_TIMEOUT=0)
+class FreelancerSkillTests(TestCase):
+    """Skill filters on /core/freelancers/: any/all matching, ranking by overlap, ?gig= and ?city=."""
+
+    def setUp(self):
+        for name, skill_list, city in [
+            ("Both", "Django, React", "Nairobi"), ("Django only", " django ,DJANGO", "Mombasa"),
+            ("React only", "react", "nairobi"), ("Neither", "Figma", "Nairobi"),
+        ]:
+            Freelancer.objects.create(name=name, profession="Developer", years_of_experience="2", availability="Full-time", skills=skill_list, city=city)
+
+    def names(self, query):
+        response = self.client.get(f'/core/freelancers/?{query}')
+        self.assertEqual(response.status_code, 200)
+        return [freelancer['name'] for freelancer in response.json()]
+
+    def test_parse_skills(self):
+        self.assertEqual(skills.parse_skills(" Django ,react,  DJANGO,, Machine   Learning"), ["django", "react", "machine learning"])
+        self.assertEqual(
+            sorted(Freelancer.objects.get(name="Django only").skill_set.values_list('name', flat=True)), ["django"],
+        )
+
+    def test_any_and_all(self):
+        self.assertEqual(self.names("skills=django,react")[0], "Both")
+        self.assertEqual(set(self.names("skills=django,react")), {"Both", "Django only", "React only"})
+        self.assertEqual(self.names("skills=django,react&match=all"), ["Both"])
+        self.assertEqual(self.names("skills=django,nonexistent&match=all"), [])
+        self.assertEqual(self.names("skills=django,nonexistent"), ["Django only", "Both"])
+
+    def test_gig_ranking_and_city(self):
+        gig = Gig.objects.create(title="React frontend", description="Django REST backend", price=100, location="Nairobi")
+        ranked = self.names(f"gig={gig.pk}")
+        self.assertEqual(ranked[0], "Both")
+        self.assertEqual(set(ranked), {"Both", "Django only", "React only"})
+        self.assertEqual(self.names(f"gig={gig.pk}&city=NAIROBI"), ["Both", "React only"])
+        self.assertEqual(set(self.names("city= nairobi")), {"Both", "React only", "Neither"})
+        self.assertEqual(self.client.get('/core/freelancers/?gig=999').status_code, 404)
+
+
+@override_settings(API_CACHE_TIMEOUT=0)
+class GigSearchTests(TestCase):
+    """/core/gigs/search/ through the SQLite FTS5 index and the icontains fallback."""
+
+    def setUp(self):
+        self.logo = Gig.objects.create(title="Logo design", description="Brand identity for a startup", price=500, location="Nairobi")
+        self.brand = Gig.objects.create(title="Website copy", description="Logo refresh and brand voice", price=1500, location="Kisumu")
+        self.plumbing = Gig.objects.create(title="Plumbing repair", description="Fix a leaking sink", price=800, location="Nairobi")
+
+    def search(self, **params):
+        response = self.client.get('/core/gigs/search/', params)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        return data['count'], [gig['id'] for gig in data['results']]
+
+    def assertSearches(self):
+        # Title matches rank above description matches.
+        self.assertEqual(self.search(q="logo"), (2, [self.logo.pk, self.brand.pk]))
+        self.assertEqual(self.search(q="logo", location="nairobi"), (1, [self.logo.pk]))
+        self.assertEqual(self.search(q="logo", min_price="1000"), (1, [self.brand.pk]))
+        self.assertEqual(self.search(q="logo brand", max_price="600"), (1, [self.logo.pk]))
+        self.assertEqual(self.search(q="logo", page_size="1", page="2"), (2, [self.brand.pk]))
+        self.assertEqual(self.search(q="guitar")[0], 0)
+
+        self.plumbing.title = "Logo animation"
+        self.plumbing.save()
+        self.assertIn(self.plumbing.pk, self.search(q="logo")[1])
+        self.logo.delete()
+        self.assertNotIn(self.logo.pk, self.search(q="logo")[1])
+
+    def test_fts5(self):
+        self.assertIsInstance(search.get_backend(), search.SQLiteFTSSearchBackend)
+        self.assertEqual(self.search(q="plumb"), (1, [self.plumbing.pk]))  # prefix match
+        self.assertEqual(self.search(q='"logo* -')[0], 2)  # FTS syntax is quoted away
+        self.assertSearches()
+
+    def test_icontains_fallback(self):
+        with mock.patch.object(search, '_backend', search.IcontainsSearchBackend()):
+            self.assertSearches()
+
+    def test_bad_prices(self):
+        for value in ("nan", "inf", "-Infinity", "abc"):
+            with self.subTest(value=value):
+                self.assertEqual(self.client.get('/core/gigs/search/', {"q": "logo", "min_price": value}).status_code, 400)
+        for params in ({"page": "99999999999999999999"}, {"page": "2.5"}, {"page_size": "x"}):
+            with self.subTest(**params):
+                self.assertEqual(self.client.get('/core/gigs/search/', {"q": "logo", **params}).status_code, 400)
+        # The last page whose OFFSET still fits in SQL is an empty page, with either backend.
+        for backend in (search.SQLiteFTSSearchBackend(), search.IcontainsSearchBackend()):
+            with self.subTest(backend=type(backend).__name__), mock.patch.object(search, '_backend', backend):
+                self.assertEqual(self.search(q="logo", page_size="1", page=str(2 ** 63)), (2, []))
+                self.assertEqual(
+                    self.client.get('/core/gigs/search/', {"q": "logo", "page_size": "1", "page": str(2 ** 63 + 1)}).status_code, 400,
+                )
+
+
+class DashboardStatsTests(TestCase):
+    """The incrementally maintained dashboard counters must match a full recount."""
+
+    def test_counters_match_rebuild(self):
+        freelancer = Freelancer.objects.create(
+            name="Amina", profession="Writer", years_of_experience="4",
+            skills="Copywriting", availability="Full-time",
+        )
+        Gig.objects.create(creator=freelancer, title="Blog posts", description="...", price=300, location="Kisumu")
+        ClerkUser.objects.create(clerk_id="user_a", email="a@example.com")
+        ClerkUser.objects.create(clerk_id="user_b", email="b@example.com").delete()
+        Testimonial.objects.create(author_name="Client", text="Great")
+
+        paid = MpesaTransaction.objects.create(checkout_request_id="ws_CO_1", amount=100)
+        failed = MpesaTransaction.objects.create(checkout_request_id="ws_CO_2", amount=50)
+        MpesaTransaction.objects.create(checkout_request_id="ws_CO_3", amount=75)
+        paid.result_code, paid.amount = 0, 120
+        paid.save()
+        failed.result_code = "1032"
+        failed.save()
+        paid.save()  # re-saving must not double count
+        MpesaTransaction.objects.create(checkout_request_id="ws_CO_4", amount=10, result_code="0").delete()
+
+        incremental = (dashboard.summary(), dashboard.signups_per_day(2))
+        self.assertEqual(incremental[0]['revenue'], "120.00")
+        self.assertEqual(incremental[0]['pending_transactions'], 1)
+        self.assertEqual(incremental[0]['success_rate'], 0.5)
+
+        dashboard.rebuild_stats()
+        self.assertEqual((dashboard.summary(), dashboard.signups_per_day(2)), incremental)
+
+    def test_fixture_load_not_counted(self):
+        # A dumpdata of the whole database carries the counters along with the rows they count.
+        ClerkUser.objects.create(clerk_id="user_a", email="a@example.com")
+        MpesaTransaction.objects.create(checkout_request_id="ws_CO_1", amount=100, result_code="0")
+        snapshot = (dashboard.summary(), dashboard.signups_per_day(2))
+        models = (MpesaTransaction, ClerkUser, DashboardStat, DailySignupStat)
+        fixture = tempfile.NamedTemporaryFile('w', suffix='.json', delete=False)
+        self.addCleanup(os.unlink, fixture.name)
+        with fixture:
+            serializers.serialize('json', [obj for model in models for obj in model.objects.all()], stream=fixture)
+        for model in models:
+            model.objects.all().delete()
+
+        call_command('loaddata', fixture.name, verbosity=0)
+        self.assertEqual((dashboard.summary(), dashboard.signups_per_day(2)), snapshot)
+
+
+
+@override_settings(ROLE_SYNC_MAX_ATTEMPTS=3, ROLE_SYNC_RETRY_BASE_SECONDS=30)
+class RoleSyncOutboxTests(TestCase):
+    """ClerkRoleSyncJob delivery: dedupe by idempotency key, retries with backoff, then FAILED."""
+
+    def setUp(self):
+        self.pushes = []
+
+    def failing_push(self, clerk_id, role):
+        self.pushes.append((clerk_id, role))
+        raise outbox.RoleSyncError("Clerk API responded 503")
+
+    def make_due(self):
+        ClerkRoleSyncJob.objects.update(available_at=timezone.now())
+
+    def test_idempotency_key(self):
+        self.assertTrue(outbox.enqueue_role_sync("user_a", "freelancer", "mpesa:ws_CO_1"))
+        self.assertFalse(outbox.enqueue_role_sync("user_a", "freelancer", "mpesa:ws_CO_1"))
+        self.assertTrue(outbox.enqueue_role_sync("user_a", "freelancer", "mpesa:ws_CO_2"))
+        self.assertEqual(ClerkRoleSyncJob.objects.count(), 2)
+
+        # Both jobs are for the same (clerk_id, role), so they share one API call.
+        jobs = outbox.process_batch(push=lambda *key: self.pushes.append(key))
+        self.assertEqual(len(jobs), 2)
+        self.assertEqual(self.pushes, [("user_a", "freelancer")])
+        self.assertEqual(set(ClerkRoleSyncJob.objects.values_list('status', flat=True)), {'DONE'})
+        self.assertEqual(outbox.process_batch(push=lambda *key: self.pushes.append(key)), [])
+
+    def test_retry_backoff_then_failed(self):
+        outbox.enqueue_role_sync("user_a", "freelancer", "mpesa:ws_CO_1")
+        for attempt, delay in ((1, 30), (2, 60)):
+            start = timezone.now()
+            self.assertEqual(len(outbox.process_batch(push=self.failing_push)), 1)
+            job = ClerkRoleSyncJob.objects.get()
+            self.assertEqual((job.status, job.attempts, job.last_error), ('PENDING', attempt, "Clerk API responded 503"))
+            self.assertAlmostEqual((job.available_at - start).total_seconds(), delay, delta=5)
+            # Not due again until the backoff has passed.
+            self.assertEqual(outbox.process_batch(push=self.failing_push), [])
+            self.make_due()
+
+        outbox.process_batch(push=self.failing_push)
+        job = ClerkRoleSyncJob.objects.get()
+        self.assertEqual((job.status, job.attempts), ('FAILED', 3))
+        self.assertIsNotNone(job.processed_at)
+        self.make_due()
+        self.assertEqual(outbox.process_batch(push=self.failing_push), [])
+        self.assertEqual(len(self.pushes), 3)
+
+
+class MpesaCallbackTests(TestCase):
+    """Redelivered callbacks must be no-ops, whether applied inline or staged and drained."""
+
+    def setUp(self):
+        ClerkUser.objects.create(clerk_id="user_a", email="a@example.com")
+        MpesaTransaction.objects.create(checkout_request_id="ws_CO_1", merchant_request_id="m_1", amount=10, clerk_id="user_a")
+        MpesaTransaction.objects.create(checkout_request_id="ws_CO_2", merchant_request_id="m_2", amount=10)
+
+    def deliver(self, i, result_code, merchant_request_id=None):
+        callback = {"MerchantRequestID": merchant_request_id or f"m_{i}", "CheckoutRequestID": f"ws_CO_{i}", "ResultCode": result_code, "ResultDesc": "..."}
+        if result_code == 0:
+            callback["CallbackMetadata"] = {"Item": [
+                {"Name": "Amount", "Value": 25}, {"Name": "MpesaReceiptNumber", "Value": "R1"},
+                {"Name": "TransactionDate", "Value": 20261018101500}, {"Name": "PhoneNumber", "Value": 254708374149},
+            ]}
+        response = self.client.post('/core/callback/', {"Body": {"stkCallback": callback}}, content_type='application/json')
+        self.assertEqual(response.json(), {"ResultCode": 0, "ResultDesc": "Success"})
+
+    def replay(self):
+        self.deliver(1, 0)
+        self.deliver(2, 1032)
+        self.deliver(1, 1032)  # a late redelivery with a different result must not win
+        self.deliver(1, 0)
+
+    def assertApplied(self):
+        self.assertEqual(MpesaTransaction.objects.get(checkout_request_id="ws_CO_1").result_code, "0")
+        self.assertEqual(MpesaTransaction.objects.get(checkout_request_id="ws_CO_2").result_code, "1032")
+        self.assertEqual(ClerkUser.objects.get(clerk_id="user_a").role, "freelancer")
+        self.assertEqual(ClerkRoleSyncJob.objects.filter(clerk_id="user_a").count(), 1)
+        stats = dashboard.summary()
+        self.assertEqual((stats['successful_transactions'], stats['failed_transactions'], stats['revenue']), (1, 1, "25.00"))
+        dashboard.rebuild_stats()
+        self.assertEqual(dashboard.summary(), stats)
+
+    def test_inline(self):
+        self.replay()
+        self.assertApplied()
+
+    @override_settings(MPESA_CALLBACK_MODE='staged')
+    def test_staged(self):
+        self.replay()
+        self.assertEqual(MpesaTransaction.objects.filter(result_code__isnull=True).count(), 2)
+        self.assertEqual(callbacks.drain_staged(), (4, 2))
+        self.assertEqual(callbacks.drain_staged(), (0, 0))
+        self.assertApplied()
+
+    @override_settings(MPESA_CALLBACK_MODE='staged')
+    def test_staged_mismatched_copy_first(self):
+        self.deliver(1, 1032, merchant_request_id="m_other")  # not this transaction's; ignored
+        self.replay()
+        self.assertEqual(callbacks.drain_staged(), (5, 2))
+        self.assertApplied()
+
+
+@override_settings(API_CACHE_TIMEOUT=0)
+class RequestMetricsTests(TestCase):
+    """Server-Timing and the per-route aggregates behind /core/metrics/, for sync and async views."""
+
+    def setUp(self):
+        metrics.registry.reset()
+        MpesaTransaction.objects.create(checkout_request_id="ws_CO_1", merchant_request_id="m_1", amount=10)
+
+    def queries(self, response):
+        return int(re.search(r'db;dur=[\d.]+;desc="(\d+) queries"', response['Server-Timing'])[1])
+
+    def test_disabled(self):
+        response = self.client.get('/core/gigs/')
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual(metrics.registry.snapshot(), {})
+
+    @override_settings(REQUEST_METRICS_ENABLED=True, REQUEST_METRICS_TOKEN="metrics-token")
+    def test_spans_recorded(self):
+        response = self.client.get('/core/transactions/')
+        self.assertEqual(self.queries(response), 2)  # the ETag validator and the list
+        self.assertRegex(response['Server-Timing'], r'serialize;dur=[\d.]+, http;dur=[\d.]+, total;dur=')
+
+        self.assertEqual(self.client.get('/core/metrics/').status_code, 403)
+        self.assertEqual(self.client.get('/core/metrics/', headers={'X-Metrics-Token': "wrong"}).status_code, 403)
+        routes = self.client.get('/core/metrics/', headers={'X-Metrics-Token': "metrics-token"}).json()['routes']
+        self.assertEqual(routes['GET /core/transactions/']['requests'], 1)
+        self.assertEqual(routes['GET /core/transactions/']['queries']['p50'], 2)
+
+    @override_settings(REQUEST_METRICS_ENABLED=True)
+    async def test_async_view(self):
+        response = await self.async_client.get('/core/check-status/ws_CO_1/wait/', {'timeout': '0'})
+        self.assertEqual(response.json(), {"status": "pending"})
+        self.assertEqual(self.queries(response), 1)
+        self.assertEqual(metrics.registry.snapshot()['GET /core/check-status/<str:checkout_request_id>/wait/']['requests'], 1)
+
+
+class ClerkKeyStoreTests(TestCase):
+    """JWKSKeyStore refetch throttling and single-flight refresh; VerifiedTokenCache expiry and eviction."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # Small keys: only the key handling is under test, and generating them in pure Python is slow.
+        _, cls.jwk_1 = make_signing_key("key-1", bits=1024)
+        _, cls.jwk_2 = make_signing_key("key-2", bits=1024)
+
+    def setUp(self):
+        self.published = {"keys": [self.jwk_1]}
+        self.stub = self.enterContext(StubServer(jwks_routes(lambda: self.published), latency=0.1))
+        self.store = JWKSKeyStore(f"{self.stub.url}/.well-known/jwks.json", min_refresh_interval=60)
+
+    def test_unknown_kid_refetch_throttled(self):
+        self.assertIsNotNone(self.store.get_key("key-1"))
+        self.assertIsNotNone(self.store.get_key("key-1"))
+        self.assertEqual(self.store.fetch_count, 1)
+        # An unknown kid may mean rotated keys, so it refetches once...
+        self.assertIsNone(self.store.get_key("forged-1"))
+        self.assertEqual(self.store.fetch_count, 2)
+        # ...but not again within min_refresh_interval, whatever kids a caller makes up.
+        self.published["keys"].append(self.jwk_2)
+        self.assertIsNone(self.store.get_key("key-2"))
+        self.assertEqual(self.store.fetch_count, 2)
+        with mock.patch('core.auth.time.monotonic', return_value=time.monotonic() + 60):
+            self.assertIsNotNone(self.store.get_key("key-2"))
+        self.assertEqual(self.store.fetch_count, 3)
+
+    def test_single_flight_refresh(self):
+        self.store.get_key("key-1")
+        self.published["keys"].append(self.jwk_2)
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            keys = list(pool.map(lambda _: self.store.get_key("key-2"), range(8)))
+        self.assertTrue(all(key is not None for key in keys))
+        self.assertEqual(self.store.fetch_count, 2)
+        self.assertEqual(self.stub.hits, 2)
+
+    def test_cached_token_rejected_after_exp(self):
+        tokens = VerifiedTokenCache()
+        now = time.time()
+        tokens.set("token", {"sub": "user_a", "exp": now + 60})
+        tokens.set("no-exp", {"sub": "user_a"})
+        with mock.patch('core.auth.time.time', return_value=now + 59):
+            self.assertEqual(tokens.get("token"), {"sub": "user_a", "exp": now + 60})
+        with mock.patch('core.auth.time.time', return_value=now + 60):
+            self.assertIsNone(tokens.get("token"))
+        self.assertIsNone(tokens.get("no-exp"))  # never cached, so always verified
+        self.assertEqual(tokens.stats()["size"], 0)
+
+    def test_lru_eviction(self):
+        tokens = VerifiedTokenCache(maxsize=2)
+        exp = time.time() + 60
+        tokens.set("a", {"sub": "a", "exp": exp})
+        tokens.set("b", {"sub": "b", "exp": exp})
+        tokens.get("a")  # now the most recently used
+        tokens.set("c", {"sub": "c", "exp": exp})
+        self.assertIsNone(tokens.get("b"))
+        self.assertEqual([tokens.get(t)["sub"] for t in ("a", "c")], ["a", "c"])
+        self.assertEqual(tokens.stats()["evictions"], 1)
+
+
+class ClerkJWTAuthenticationTests(TestCase):
+    """Verified tokens are served from the cache without JWKS or signature work, but only until exp."""
+    issuer = "https://clerk.test"
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.pem, jwk_1 = make_signing_key("key-1", bits=1024)
+        cls.jwks = {"keys": [jwk_1]}
+
+    def setUp(self):
+        stub = self.enterContext(StubServer(jwks_routes(self.jwks)))
+        self.authenticator = ClerkJWTAuthentication()
+        self.authenticator.issuer = self.issuer
+        self.authenticator.key_store = JWKSKeyStore(f"{stub.url}/.well-known/jwks.json")
+        self.authenticator.token_cache = VerifiedTokenCache()
+
+    def authenticate(self, exp):
+        token = jwt.encode({"sub": "user_a", "iss": self.issuer, "exp": exp}, self.pem, algorithm="RS256", headers={"kid": "key-1"})
+        request = APIRequestFactory().get('/', HTTP_AUTHORIZATION=f"Bearer {token}")
+        return lambda: self.authenticator.authenticate(request)
+
+    def test_cache_hit_skips_verification(self):
+        authenticate = self.authenticate(int(time.time()) + 60)
+        self.assertEqual(authenticate()[0]["sub"], "user_a")
+        with mock.patch('core.views.jwt.decode') as decode, \
+                mock.patch.object(self.authenticator.key_store, 'get_key') as get_key:
+            self.assertEqual(authenticate()[0]["sub"], "user_a")
+        decode.assert_not_called()
+        get_key.assert_not_called()
+        self.assertEqual(self.authenticator.token_cache.stats()["hits"], 1)
+
+    def test_expired_token_rejected_once_cache_entry_expires(self):
+        exp = int(time.time()) + 1
+        authenticate = self.authenticate(exp)
+        self.assertEqual(authenticate()[0]["sub"], "user_a")
+        # python-jose checks exp against the real clock, so let it pass.
+        time.sleep(exp + 1.1 - time.time())
+        with self.assertRaisesMessage(exceptions.AuthenticationFailed, "Expired Clerk token"):
+            authenticate()
+        self.assertEqual(self.authenticator.token_cache.stats()["size"], 0)
+
+
+class IntegrationClientTests(TestCase):
+    """Only idempotent requests are retried, with backoff, and every request has a timeout."""
+
+    def setUp(self):
+        self.stub = self.enterContext(StubServer({
+            ("GET", "/busy"): lambda request: (503, {}),
+            ("POST", "/busy"): lambda request: (503, {}),
+            ("PATCH", "/busy"): lambda request: (503, {}),
+            ("GET", "/ok"): lambda request: (200, {}),
+        }))
+
+    def test_post_and_patch_sent_once(self):
+        client = integrations.IntegrationClient("test", retries=2, backoff_factor=0)
+        self.assertEqual(client.post(f"{self.stub.url}/busy", json={}).status_code, 503)  # e.g. an STK push
+        self.assertEqual(client.patch(f"{self.stub.url}/busy", json={}).status_code, 503)  # a Clerk role update
+        self.assertEqual(self.stub.hits, 2)
+
+    def test_get_retried_with_backoff(self):
+        client = integrations.IntegrationClient("test", retries=2, backoff_factor=0.1)
+        start = time.perf_counter()
+        self.assertEqual(client.get(f"{self.stub.url}/busy").status_code, 503)
+        self.assertEqual(self.stub.hits, 3)
+        self.assertGreaterEqual(time.perf_counter() - start, 0.2)  # urllib3 sleeps 0, then 0.1 * 2
+        self.assertEqual(client.metrics.snapshot()["calls"], 1)
+
+    def test_timeout(self):
+        self.stub.latency = 0.5
+        client = integrations.IntegrationClient("test", read_timeout=0.1, retries=0)
+        start = time.perf_counter()
+        # requests reports a read timeout as ConnectionError once urllib3 has given up retrying.
+        with self.assertRaisesMessage(requests.exceptions.RequestException, "Read timed out"):
+            client.get(f"{self.stub.url}/ok")
+        self.assertLess(time.perf_counter() - start, 0.4)
+        self.assertEqual(client.metrics.snapshot()["errors"], 1)
+
+    def test_jwks_fetch_bounded(self):
+        # A hung JWKS endpoint costs one timeout, not the shared clients' retries.
+        self.stub.latency = 1
+        store = JWKSKeyStore(f"{self.stub.url}/ok", timeout=0.1)
+        start = time.perf_counter()
+        self.assertIsNone(store.get_key("key-1"))
+        self.assertLess(time.perf_counter() - start, 0.5)
+        self.assertEqual(self.stub.hits, 1)
+
+    async def test_async_retries(self):
+        client = integrations.AsyncIntegrationClient("test", retries=2, backoff_factor=0.3)
+        with mock.patch('core.integrations.asyncio.sleep', new=mock.AsyncMock()) as sleep:
+            self.assertEqual((await client.post(f"{self.stub.url}/busy", json={})).status_code, 503)
+            self.assertEqual(self.stub.hits, 1)
+            self.assertEqual((await client.get(f"{self.stub.url}/busy")).status_code, 503)
+        self.assertEqual(self.stub.hits, 4)
+        # httpx also yields with sleep(0).
+        self.assertEqual([call.args[0] for call in sleep.await_args_list if call.args[0]], [0.3, 0.6])
+
+    async def test_async_timeout(self):
+        self.stub.latency = 0.5
+        client = integrations.AsyncIntegrationClient("test", read_timeout=0.1, retries=0)
+        with self.assertRaises(httpx.TimeoutException):
+            await client.get(f"{self.stub.url}/ok")
+
+
+class MpesaTokenTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        daraja = mock.Mock()
+        daraja.get.return_value.json.return_value = {"access_token": "token", "expires_in": "3599"}
+        async_daraja = mock.Mock()
+        async_daraja.get = mock.AsyncMock(return_value=daraja.get.return_value)
+        self.tokens = MpesaTokenManager(
+            "https://daraja.test", "key", "secret", lease_timeout=0.1, client=daraja, async_client=async_daraja,
+        )
+
+    def test_other_process_lease_kept(self):
+        # Another process holds the lease past our wait; we fetch anyway but must not release its lease.
+        cache.add(self.tokens.lease_key, True, 60)
+        self.assertEqual(self.tokens.refresh(), "token")
+        self.assertIsNotNone(cache.get(self.tokens.lease_key))
+        cache.delete(self.tokens.cache_key)
+        self.assertEqual(async_to_sync(self.tokens.arefresh)(), "token")
+        self.assertIsNotNone(cache.get(self.tokens.lease_key))
+
+    def test_own_lease_released(self):
+        self.assertEqual(self.tokens.refresh(), "token")
+        self.assertIsNone(cache.get(self.tokens.lease_key))
+        self.assertEqual(self.tokens.fetch_count, 1)
+
+
+class AsyncSTKPushTests(TestCase):
+    """Bad input is a 400 and an unusable Daraja reply a 500 JSON error, as with the sync view."""
+
+    def daraja(self, response):
+        response.request = httpx.Request('POST', 'https://daraja.test/')
+        return mock.patch('core.views.aget_access_token', mock.AsyncMock(return_value="token")), mock.patch.object(integrations.mpesa_async, 'post', mock.AsyncMock(return_value=response))
+
+    async def push(self, body):
+        return await self.async_client.post('/core/async/stk-push/', body, content_type='application/json')
+
+    async def test_body_not_object(self):
+        for body in ([], "x", 5):
+            response = await self.push(body)
+            self.assertEqual(response.status_code, 400)
+
+    async def test_unusable_reply(self):
+        await MpesaTransaction.objects.acreate(checkout_request_id="ws_CO_1", merchant_request_id="m_1", amount=10)
+        replies = (
+            httpx.Response(200, text="<html>Service unavailable</html>"),
+            httpx.Response(200, json={"MerchantRequestID": "m_2", "CheckoutRequestID": "ws_CO_1"}),  # duplicate
+        )
+        for reply in replies:
+            token, post = self.daraja(reply)
+            with token, post:
+                response = await self.push({"phone_number": "254708374149", "amount": 1})
+            self.assertEqual(response.status_code, 500)
+            self.assertEqual(response.json(), {"error": "An internal server error occurred."})
+
+
+class PaymentStatusWaitTests(TestCase):
+    async def test_timeout(self):
+        await MpesaTransaction.objects.acreate(checkout_request_id="ws_CO_1", merchant_request_id="m_1", amount=10)
+        response = await self.async_client.get('/core/check-status/ws_CO_1/wait/', {'timeout': '0'})
+        self.assertEqual(response.json(), {"status": "pending"})
+        for timeout in ("soon", "nan", "inf", "-inf"):
+            response = await self.async_client.get('/core/check-status/ws_CO_1/wait/', {'timeout': timeout})
+            self.assertEqual(response.status_code, 400, timeout)
+
+
+@override_settings(DB_REPLICA_ROUTING=True, API_CACHE_TIMEOUT=0)
+class ReplicaRoutingTests(TestCase):
+    """Listing views read from the replica; writers and status checks see the primary."""
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        creator = Freelancer.objects.create(
+            name="Amina", profession="Writer", years_of_experience="4", skills="Copywriting", availability="Full-time",
+        )
+        Gig.objects.create(creator=creator, title="Blog posts", description="...", price=300, location="Kisumu")
+        MpesaTransaction.objects.create(checkout_request_id="ws_CO_1", merchant_request_id="m_1", amount=10)
+
+    def sync_replica(self):
+        """Stands in for replication: copies the primary's rows to the replica."""
+        for model in (Freelancer, Gig, MpesaTransaction):
+            model.objects.using('replica').all().delete()
+            model.objects.using('replica').bulk_create(model.objects.using('default').all())
+
+    def test_lists_read_replica(self):
+        self.assertEqual(self.client.get('/core/gigs/').json(), [])
+        self.assertEqual(self.client.get('/core/transactions/').json(), [])
+        self.sync_replica()
+        self.assertEqual([gig['title'] for gig in self.client.get('/core/gigs/').json()], ["Blog posts"])
+
+    def test_status_check_reads_primary(self):
+        self.assertEqual(self.client.get('/core/check-status/ws_CO_1/').json(), {"status": "pending"})
+
+    def test_sticky_primary_after_write(self):
+        response = self.client.post('/core/callback/', {}, content_type='application/json')
+        self.assertIn(settings.DB_REPLICA_STICKY_COOKIE, response.cookies)
+        self.assertEqual(response.cookies[settings.DB_REPLICA_STICKY_COOKIE]['max-age'], settings.DB_REPLICA_STICKY_SECONDS)
+        # The test client keeps the cookie, so this read sees the unreplicated gig.
+        self.assertEqual([gig['title'] for gig in self.client.get('/core/gigs/').json()], ["Blog posts"])
+
+    def test_sticky_primary_by_bearer_user(self):
+        # A cross-origin client doesn't send the cookie back, but does send its Clerk token.
+        auth = {'HTTP_AUTHORIZATION': f"Bearer {jwt.encode({'sub': 'user_1'}, 'secret', algorithm='HS256')}"}
+        self.client.post('/core/callback/', {}, content_type='application/json', **auth)
+        self.client.cookies.clear()
+        self.assertEqual([gig['title'] for gig in self.client.get('/core/gigs/', **auth).json()], ["Blog posts"])
+        self.assertEqual(self.client.get('/core/gigs/').json(), [])  # other clients still read the replica
+
+    async def test_sticky_primary_after_async_write(self):
+        auth = {'Authorization': f"Bearer {jwt.encode({'sub': 'user_2'}, 'secret', algorithm='HS256')}"}
+        response = await self.async_client.post('/core/async/callback/', {}, content_type='application/json', headers=auth)
+        self.assertIn(settings.DB_REPLICA_STICKY_COOKIE, response.cookies)
+        self.assertTrue(await cache.aget(routers.pin_key(SimpleNamespace(headers=auth))))
+
+
+@override_settings(IMAGE_VARIANT_WIDTHS=[160, 480], API_CACHE_TIMEOUT=0)
+class ImageVariantTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.gig = Gig.objects.create(title="Logo design", description="...", price=500, location="Nairobi")
+        self.upload(self.gig, 'logo.png', mode='RGBA')
+
+    def upload(self, gig, name, mode='RGB', size=(800, 600)):
+        buffer = io.BytesIO()
+        Image.new(mode, size, (200, 80, 20, 128) if mode == 'RGBA' else (200, 80, 20)).save(buffer, 'PNG')
+        with self.captureOnCommitCallbacks() as scheduled:
+            gig.image.save(name, ContentFile(buffer.getvalue()))
+        return scheduled
+
+    def test_variants_rendered_and_served(self):
+        variants = images.generate(Gig, self.gig.pk)
+        self.assertEqual(set(variants['webp']), {"160", "480"})
+        with default_storage.open(variants['jpeg']['480']) as f:
+            self.assertEqual(Image.open(f).size, (480, 360))
+        self.assertIsNone(images.generate(Gig, self.gig.pk))  # already current
+
+        data = self.client.get('/core/gigs/').json()[0]['image_variants']
+        self.assertEqual(data['webp']['160'], f"/media/{variants['webp']['160']}")
+        self.assertEqual(data['srcset']['jpeg'], f"/media/{variants['jpeg']['160']} 160w, /media/{variants['jpeg']['480']} 480w")
+
+    def test_replaced_image(self):
+        old = images.generate(Gig, self.gig.pk)
+        self.gig.refresh_from_db()
+        scheduled = self.upload(self.gig, 'small.png', size=(100, 50))
+        self.assertEqual(len(scheduled), 2)  # the render and the response cache invalidation
+        # Variants of the previous upload are never served for the new one.
+        self.assertIsNone(self.client.get('/core/gigs/').json()[0]['image_variants'])
+
+        variants = images.generate(Gig, self.gig.pk)
+        self.assertEqual(set(variants['webp']), {"100"})  # never upscaled
+        self.assertFalse(default_storage.exists(old['webp']['160']))
+        self.gig.refresh_from_db()
+        with self.captureOnCommitCallbacks() as scheduled:
+            self.gig.save()
+        self.assertEqual(len(scheduled), 1)  # no render, only the cache invalidation
+
+
+@override_settings(CLERK_WEBHOOK_SECRET="whsec_dGVzdC1zZWNyZXQtZm9yLWNsZXJrLXdlYmhvb2tz")
+class ClerkWebhookTests(TestCase):
+    """Redelivered and out-of-order Clerk events leave each user at its newest state."""
+
+    def deliver(self, svix_id, event_type, timestamp, first_name="Amina", signature=None, header_prefix="svix"):
+        body = json.dumps({
+            "type": event_type, "timestamp": timestamp, "object": "event",
+            "data": {"id": "user_a", "first_name": first_name, "primary_email_address_id": "idn_2",
+                     "email_addresses": [{"id": "idn_1", "email_address": "old@example.com"},
+                                         {"id": "idn_2", "email_address": "a@example.com"}]},
+        })
+        now = datetime.now()
+        headers = {
+            f"{header_prefix}-id": svix_id, f"{header_prefix}-timestamp": str(int(now.timestamp())),
+            f"{header_prefix}-signature": signature or Webhook(settings.CLERK_WEBHOOK_SECRET).sign(svix_id, now, body),
+        }
+        return self.client.post('/core/clerk/', body, content_type='application/json', headers=headers)
+
+    def replay(self):
+        self.assertEqual(self.deliver("msg_1", "user.created", 1000).status_code, 200)
+        self.deliver("msg_3", "user.updated", 3000, first_name="Neema")
+        self.deliver("msg_1", "user.created", 1000)  # redelivery
+        self.deliver("msg_2", "user.updated", 2000, first_name="Stale")  # arrives after a newer update
+
+    def assertNewestState(self):
+        user = ClerkUser.objects.get(clerk_id="user_a")
+        self.assertEqual((user.first_name, user.email), ("Neema", "a@example.com"))
+        self.assertEqual(ClerkWebhookEvent.objects.count(), 3)
+        incremental = (dashboard.summary(), dashboard.signups_per_day(2))
+        self.assertEqual(incremental[0]['users'], 1)
+        dashboard.rebuild_stats()
+        self.assertEqual((dashboard.summary(), dashboard.signups_per_day(2)), incremental)
+
+    def test_inline(self):
+        self.replay()
+        self.assertNewestState()
+        self.assertEqual(ClerkWebhookEvent.objects.get(svix_id="msg_2").status, 'SKIPPED')
+
+    def test_webhook_header_names(self):
+        # Svix also accepts, and may send, the Standard Webhooks header names.
+        self.assertEqual(self.deliver("msg_1", "user.created", 1000, header_prefix="webhook").status_code, 200)
+        self.assertEqual(ClerkWebhookEvent.objects.get().svix_id, "msg_1")
+        self.assertEqual(ClerkUser.objects.get(clerk_id="user_a").first_name, "Amina")
+        self.assertEqual(self.deliver("msg_2", "user.updated", 2000, header_prefix="webhook", signature="v1,bad").status_code, 400)
+
+    @override_settings(CLERK_WEBHOOK_MODE='queued')
+    def test_queued(self):
+        self.replay()
+        self.assertFalse(ClerkUser.objects.exists())
+        self.assertEqual(webhooks.drain_events(), (3, 1))
+        self.assertNewestState()
+
+        self.deliver("msg_5", "user.deleted", 5000)
+        self.deliver("msg_4", "user.updated", 4000)  # must not resurrect the user
+        self.assertEqual(webhooks.drain_events(), (2, 1))
+        self.assertFalse(ClerkUser.objects.exists())
+        self.assertEqual(dashboard.summary()['users'], 0)
+
+    def test_bad_signature(self):
+        self.assertEqual(self.deliver("msg_1", "user.created", 1000, signature="v1,bm9wZQ==").status_code, 400)
+        self.assertFalse(ClerkWebhookEvent.objects.exists())
+
+
+class ClerkReconcileTests(TestCase):
+    """reconcile_clerk_users against a fake Clerk Users API, including resuming after a failure."""
+
+    def test_reconcile_and_resume(self):
+        remote = [clerk_user(n) for n in range(5)]
+        routes = clerk_users_routes(remote)
+        list_users = routes[("GET", "/v1/users")]
+        failures = [4]  # the page at offset 4 fails once
+
+        def flaky_list(request):
+            if int(request.query.get("offset", 0)) in failures:
+                failures.clear()
+                return 400, {"errors": [{"message": "bad request"}]}
+            return list_users(request)
+        routes[("GET", "/v1/users")] = flaky_list
+
+        ClerkUser.objects.create(clerk_id="user_1", email="user1@example.com", first_name="Stale")
+        ClerkUser.objects.create(clerk_id="user_9", email="user9@example.com")  # deleted in Clerk
+        with StubServer(routes) as stub, override_settings(CLERK_API_URL=f"{stub.url}/v1", CLERK_SECRET_KEY="sk_test"):
+            with self.assertRaises(clerk_sync.ClerkSyncError):
+                clerk_sync.reconcile(page_size=2, concurrency=2)
+            self.assertEqual(ClerkSyncRun.objects.get().next_offset, 4)
+            run = clerk_sync.reconcile(resume=True, page_size=2, concurrency=2)
+
+        self.assertEqual((run.seen, run.created, run.updated, run.deleted), (5, 4, 1, 1))
+        self.assertEqual(
+            dict(ClerkUser.objects.values_list('clerk_id', 'first_name')),
+            {user["id"]: user["first_name"] for user in remote},
+        )
+        self.assertEqual(dashboard.summary()['users'], 5)
+
+
+class TransactionExportTests(TestCase):
+    """The streaming export must filter like the request says and format values as the API does."""
+
+    def setUp(self):
+        for i, (day, result_code) in enumerate([(1, "0"), (2, "1032"), (3, None), (4, "0")]):
+            transaction = MpesaTransaction.objects.create(checkout_request_id=f"ws_CO_{i}", amount=10, result_code=result_code)
+            MpesaTransaction.objects.filter(pk=transaction.pk).update(created_at=datetime(2026, 10, day, 12, tzinfo=dt_timezone.utc))
+
+    def export(self, **params):
+        response = self.client.get('/core/transactions/export/', params)
+        self.assertEqual(response.status_code, 200)
+        return b"".join(response.streaming_content).decode()
+
+    def test_csv_and_ndjson(self):
+        lines = self.export(start="2026-10-02", end="2026-10-04").splitlines()
+        self.assertEqual(lines[0].split(","), exports.FIELDS)
+        self.assertEqual([line.split(",")[3] for line in lines[1:]], ["ws_CO_1", "ws_CO_2"])
+        self.assertIn("2026-10-02T12:00:00Z", lines[1])
+        self.assertIn(",10.00,", lines[1])
+
+        rows = [json.loads(line) for line in self.export(format="ndjson", result_code="0,pending").splitlines()]
+        self.assertEqual([row['checkout_request_id'] for row in rows], ["ws_CO_0", "ws_CO_2", "ws_CO_3"])
+        self.assertEqual(rows[0]['amount'], "10.00")
+
+    def test_bad_parameters(self):
+        self.assertEqual(self.client.get('/core/transactions/export/', {"start": "yesterday"}).status_code, 400)
+        self.assertEqual(self.client.get('/core/transactions/export/', {"format": "xlsx"}).status_code, 400)
+
+
+class TransactionRollupTests(TestCase):
+    """Rollups must match the transactions they summarize, and only changed days are rebuilt."""
+
+    def setUp(self):
+        rows = [  # (day, hour, result_code, amount, phone, seconds to callback)
+            (1, 9, "0", 100, "254700000001", 10), (1, 9, "0", 50, "254700000001", 30), (1, 10, "1032", 20, "254700000002", 50),
+            (1, 10, None, 20, "254700000003", None), (2, 12, "0", 70, "254700000002", 20),
+        ]
+        for i, (day, hour, result_code, amount, phone, wait) in enumerate(rows):
+            created_at = datetime(2026, 10, day, hour, 15, tzinfo=dt_timezone.utc)
+            transaction = MpesaTransaction.objects.create(checkout_request_id=f"ws_CO_{i}", amount=amount, phone_number=phone, result_code=result_code)
+            MpesaTransaction.objects.filter(pk=transaction.pk).update(
+                created_at=created_at, callback_at=created_at + timedelta(seconds=wait) if wait else None,
+            )
+
+    def test_refresh_and_series(self):
+        self.assertEqual(rollups.refresh(lag=0)[0], 2)
+        day = TransactionRollup.objects.get(granularity='day', bucket=datetime(2026, 10, 1, tzinfo=dt_timezone.utc))
+        self.assertEqual((day.transactions, day.successful, day.failed, day.revenue, day.payers), (4, 2, 1, 150, 1))
+        self.assertEqual(day.median_callback_seconds, 30)
+        self.assertEqual(TransactionRollup.objects.filter(granularity='hour').count(), 3)
+
+        # Only the day of the changed transaction is rebuilt.
+        MpesaTransaction.objects.filter(checkout_request_id="ws_CO_4").update(result_code="1", updated_at=timezone.now())
+        self.assertEqual(rollups.refresh(lag=0)[0], 1)
+        self.assertEqual(rollups.refresh(lag=0)[0], 0)
+
+        response = self.client.get('/core/transactions/rollups/', {"granularity": "day", "start": "2026-09-30", "end": "2026-10-03"})
+        series = response.json()['series']
+        self.assertEqual([point['bucket'] for point in series], ["2026-09-30T00:00:00Z", "2026-10-01T00:00:00Z", "2026-10-02T00:00:00Z"])
+        self.assertEqual(series[0]['transactions'], 0)
+        self.assertEqual((series[1]['revenue'], series[1]['pending'], series[1]['success_rate']), ("150.00", 1, 0.6667))
+        self.assertEqual((series[2]['successful'], series[2]['failed']), (0, 1))
+        self.assertEqual(self.client.get('/core/transactions/rollups/', {"granularity": "week"}).status_code, 400)
+
+
+@override_settings(API_CACHE_TIMEOUT=0)
+class FastSerializerTests(TestCase):
+    """List endpoints must render the same bytes from .values() rows as through the DRF serializers."""
+
+    def setUp(self):
+        creator = Freelancer.objects.create(
+            name="Wanjiru", profession="Designer", years_of_experience="3", availability="Full-time", skills="figma, react", city="Nairobi",
+        )
+        Freelancer.objects.create(name="Otieno", profession="Developer", years_of_experience="5", availability="Part-time", skills="django, react")
+        gig = Gig.objects.create(creator=creator, title="Logo design", description="...", price=Decimal("1500.5"), location="Nairobi")
+        Gig.objects.filter(pk=gig.pk).update(image="gig_images/logo.png", image_variants={
+            "source": "gig_images/logo.png", "webp": {"160": "gig_images/logo.w160.webp"}, "jpeg": {"160": "gig_images/logo.w160.jpeg"},
+        })
+        Gig.objects.create(title="Plumbing", description="ünïcode ✓", price=200, location="Kisumu")
+        ClerkUser.objects.create(clerk_id="user_a", email="a@example.com", first_name="Amina")
+        Testimonial.objects.create(author_name="Client", text="Great work")
+        MpesaTransaction.objects.create(checkout_request_id="ws_CO_1", amount=10, phone_number="254700000001")
+        MpesaTransaction.objects.filter(checkout_request_id="ws_CO_1").update(result_code="0", callback_at=timezone.now())
+        MpesaTransaction.objects.create(checkout_request_id="ws_CO_2")
 
-# Create your tests here.
+    def test_same_json_as_drf(self):
+        urls = [
+            '/core/gigs/', '/core/gigs/?page_size=1', '/core/freelancers/', '/core/freelancers/?skills=react,django',
+            '/core/freelancers/?city=nairobi&page_size=1', '/core/testimonials/', '/core/clerk-users/', '/core/transactions/',
+            '/core/dashboard-data/transactions/?page_size=1', '/core/dashboard-data/gigs/',
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                fast = self.client.get(url)
+                with override_settings(FAST_LIST_SERIALIZERS=False):
+                    drf = self.client.get(url)
+                self.assertEqual(fast.status_code, 200)
+                self.assertEqual(fast.content, drf.content)
+        self.assertIn('"skill_overlap":2', self.client.get('/core/freelancers/?skills=react,django').content.decode())
@@ -13,17 +13,32 @@ urlpatterns = [
     path('transactions-api/', MpesaTransactionListAPIView.as_view(), name='transaction_list_api'),
     # NEW: API endpoint for the frontend to check transaction status
     path('check-status/<str:checkout_request_id>/', MpesaTransactionStatusAPIView.as_view(), name='transaction_status'),
+    # Pushed status (hold the connection instead of polling check-status); best served via backend/asgi.py
+    path('check-status/<str:checkout_request_id>/stream/', payment_status_stream, name='transaction_status_stream'),
+    path('check-status/<str:checkout_request_id>/wait/', payment_status_wait, name='transaction_status_wait'),
+    # Async variants of the payment endpoints, for deployments served by backend/asgi.py
+    path('async/stk-push/', stk_push_async, name='stk_push_request_async'),
+    path('async/callback/', mpesa_callback_async, name='mpesa_callback_async'),
+    path('async/check-status/<str:checkout_request_id>/', transaction_status_async, name='transaction_status_async'),
     path('gigs/', GigListAPIView.as_view(), name='gig_list'),
+    path('gigs/search/', GigSearchAPIView.as_view(), name='gig_search'),
     path('clerk/', clerk_webhook_handler, name='clerk-webhook'),
     path('freelancers/', FreelancerListAPIView.as_view(), name='freelancer_list'),
     path('testimonials/', TestimonialListAPIView.as_view(), name='testimonial_list'),
     path('freelancers1/', FreelancerListCreateAPIView.as_view(), name='freelancer_list_create'),
     path('testimonials1/', TestimonialListCreateAPIView.as_view(), name='testimonial_list_create'),
     path('transactions/', MpesaTransactionListAPIView.as_view(), name='transaction_list'),
+    # Streaming CSV/NDJSON download of transactions for finance (instead of the full JSON list)
+    path('transactions/export/', export_transactions, name='transaction_export'),
+    # Hourly/daily revenue and success-rate series, from the rollup_transactions tables
+    path('transactions/rollups/', TransactionRollupAPIView.as_view(), name='transaction_rollups'),
     path('clerk-users/', ClerkUserListAPIView.as_view(), name='clerk_user_list'),
     # APIView-based endpoints for freelancer dashboard
     path('freelancers-dashboard/', FreelancerDashboardAPIView.as_view(), name='dashboard_freelancer_list_create'),
     # The new API endpoint for the admin dashboard data
     path('dashboard-data/', DashboardDataAPIView.as_view(), name='dashboard_data'),
+    path('dashboard-data/<str:section>/', DashboardSectionAPIView.as_view(), name='dashboard_section'),
+    # Per-route timing percentiles (only when REQUEST_METRICS_ENABLED)
+    path('metrics/', RequestMetricsAPIView.as_view(), name='request_metrics'),
 ]
     
\ No newline at end of file
@@ -1,41 +1,70 @@
 # Create your views here.
+import asyncio
 from datetime import datetime
+from decimal import Decimal
 from rest_framework import viewsets
 from rest_framework.permissions import IsAuthenticated
 from django.conf import settings
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status, permissions, parsers, serializers, viewsets, mixins, authentication
+import httpx
 import requests
 from rest_framework import parsers, serializers
 from requests.auth import HTTPBasicAuth
-from .models import MpesaTransaction, Gig, ClerkUser, Freelancer, Testimonial, Application
+from .models import MpesaTransaction, Gig, ClerkUser, Freelancer, Testimonial, Application, Skill
 from rest_framework.generics import ListAPIView, ListCreateAPIView
 from .serializers import ApplicationSerializer, MpesaTransactionSerializer, GigSerializer, FreelancerSerializer, TestimonialSerializer, ClerkUserSerializer
 import base64
+import hmac
 import json
+import math
 import os
 from rest_framework import generics
 from rest_framework.permissions import IsAuthenticated
+from asgiref.sync import sync_to_async
 from django.views.decorators.csrf import csrf_exempt
-from svix.webhooks import Webhook, WebhookVerificationError
-from django.http import HttpResponse, JsonResponse
+from django.views.decorators.http import require_GET, require_POST
+from svix.webhooks import WebhookVerificationError
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.utils.decorators import method_decorator
+from django.urls import reverse
+from django.db import IntegrityError
 from django.db.models import Sum, Count
 from rest_framework.decorators import api_view, permission_classes, parser_classes
 from rest_framework.parsers import MultiPartParser, FormParser
-from .auth import verify_clerk_token
+from . import callbacks, dashboard, exports, fast_serializers, integrations, metrics, payment_events, rollups, search, skills, webhooks
+from .auth import JWKSKeyStore, VerifiedTokenCache, verify_clerk_token
+from .mpesa import MpesaTokenManager
+from .cache import CachedResponseMixin
+from .conditional import ConditionalGetMixin
+from .pagination import AlwaysKeysetPagination, KeysetListMixin, KeysetPagination
+from .routers import REPLICA_DB_ALIAS, ReplicaReadMixin, is_pinned, routing_enabled
 from rest_framework import exceptions
 from rest_framework.exceptions import AuthenticationFailed
 from jose import jwt
 from jose.exceptions import ExpiredSignatureError, JWTError
 from rest_framework.authentication import BaseAuthentication
+from rest_framework.utils.urls import replace_query_param
 
 CLERK_JWKS_URL = "https://wired-ferret-99.clerk.accounts.dev/.well-known/jwks.json"
 CLERK_ISSUER = "https://wired-ferret-99.clerk.accounts.dev"
 # Get your Clerk Webhook Signing Secret from environment variables
 
+# Shared by every request in this process so the JWKS is only fetched on expiry or key rotation.
+clerk_jwks = JWKSKeyStore(
+    CLERK_JWKS_URL,
+    ttl=settings.CLERK_JWKS_CACHE_TTL,
+    min_refresh_interval=settings.CLERK_JWKS_MIN_REFRESH_INTERVAL,
+)
+# The frontend resends the same session token many times a minute; skip re-verifying it.
+clerk_verified_tokens = VerifiedTokenCache(maxsize=settings.CLERK_TOKEN_CACHE_SIZE)
+
 class ClerkJWTAuthentication(BaseAuthentication):
+    key_store = clerk_jwks
+    token_cache = clerk_verified_tokens
+    issuer = CLERK_ISSUER
+
     def authenticate(self, request):
         auth_header = request.headers.get("Authorization")
 
@@ -43,13 +72,13 @@ class ClerkJWTAuthentication(BaseAuthentication):
             return None
 
         token = auth_header.split(" ")[1]
+        payload = self.token_cache.get(token)
+        if payload is not None:
+            return (payload, None)
+
         try:
-            jwks = requests.get(CLERK_JWKS_URL).json()
             unverified_header = jwt.get_unverified_header(token)
-            key = next(
-                (k for k in jwks["keys"] if k["kid"] == unverified_header["kid"]),
-                None,
-            )
+            key = self.key_store.get_key(unverified_header.get("kid"))
             if not key:
                 raise exceptions.AuthenticationFailed("Invalid Clerk token")
 
@@ -58,48 +87,78 @@ class ClerkJWTAuthentication(BaseAuthentication):
                 key,
                 algorithms=["RS256"],
                 audience=None,
-                issuer=CLERK_ISSUER,
+                issuer=self.issuer,
             )
         except ExpiredSignatureError:
             raise exceptions.AuthenticationFailed("Expired Clerk token")
         except JWTError:
             raise exceptions.AuthenticationFailed("Invalid Clerk token")
 
+        self.token_cache.set(token, payload)
         # Return user info (no DB user required)
         return (payload, None)
     
     
+# Shared through Django's cache so all workers reuse one Daraja token until it nears expiry.
+mpesa_tokens = MpesaTokenManager(
+    settings.MPESA_BASE_URL,
+    settings.CONSUMER_KEY,
+    settings.CONSUMER_SECRET,
+    expiry_margin=settings.MPESA_TOKEN_EXPIRY_MARGIN,
+    refresh_ahead=settings.MPESA_TOKEN_REFRESH_AHEAD,
+)
+
 def get_access_token():
     """
-    Fetches a new M-Pesa API access token using the consumer key and secret.
+    Returns an M-Pesa API access token, reusing the cached one while it is still valid.
     """
     try:
-        consumer_key = settings.CONSUMER_KEY
-        consumer_secret = settings.CONSUMER_SECRET
+        return mpesa_tokens.get_token()
 
-        if not consumer_key or not consumer_secret:
-            raise ValueError("CONSUMER_KEY or CONSUMER_SECRET not found in settings.")
+    except requests.exceptions.RequestException as e:
+        print(f"Failed to get M-Pesa access token: {e}")
+        return None
+    except ValueError as e:
+        print(f"Error getting M-Pesa access token: {e}")
+        return None
 
-        # M-Pesa API endpoint for fetching the access token
-        url = "https://sandbox.safaricom.co.ke/oauth/v1/generate?grant_type=client_credentials"
-        
-        # Use HTTP Basic Authentication to send the consumer key and secret
-        response = requests.get(url, auth=HTTPBasicAuth(consumer_key, consumer_secret))
-        response.raise_for_status()  # Raise an exception for bad status codes (4xx or 5xx)
+def stk_push_payload(phone_number, amount):
+    """
+    Builds the Daraja STK push request body, including the password
+    (base64 of shortcode + passkey + timestamp).
+    """
+    timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
+    password = base64.b64encode(
+        f"{settings.BUSINESS_SHORTCODE}{settings.PASSKEY}{timestamp}".encode('utf-8')
+    ).decode('utf-8')
+    return {
+        "BusinessShortCode": settings.BUSINESS_SHORTCODE,
+        "Password": password,
+        "Timestamp": timestamp,
+        "TransactionType": "CustomerPayBillOnline",
+        "Amount": amount,
+        "PartyA": phone_number,
+        "PartyB": settings.BUSINESS_SHORTCODE,
+        "PhoneNumber": phone_number,
+        "CallBackURL": settings.MPESA_CALLBACK_URL,
+        "AccountReference": "MyCompany",
+        "TransactionDesc": "Payment for an item"
+    }
 
-        access_token = response.json().get('access_token')
-        if not access_token:
-            raise ValueError("Access token not found in API response.")
 
-        return access_token
+async def aget_access_token():
+    """Async get_access_token(), for the async payment views."""
+    try:
+        return await mpesa_tokens.aget_token()
 
-    except requests.exceptions.RequestException as e:
+    except httpx.HTTPError as e:
         print(f"Failed to get M-Pesa access token: {e}")
         return None
     except ValueError as e:
         print(f"Error getting M-Pesa access token: {e}")
         return None
 
+
 class MpesaSTKPushAPIView(APIView):
     def post(self, request, *args, **kwargs):
         # 1. First, get a new access token
@@ -128,31 +187,13 @@ class MpesaSTKPushAPIView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        # 3. Generate the required security credentials
-        timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
-        password = base64.b64encode(
-            f"{settings.BUSINESS_SHORTCODE}{settings.PASSKEY}{timestamp}".encode('utf-8')
-        ).decode('utf-8')
-
-        # 4. Prepare the M-Pesa API payload
-        payload = {
-            "BusinessShortCode": settings.BUSINESS_SHORTCODE,
-            "Password": password,
-            "Timestamp": timestamp,
-            "TransactionType": "CustomerPayBillOnline",
-            "Amount": amount,
-            "PartyA": phone_number,
-            "PartyB": settings.BUSINESS_SHORTCODE,
-            "PhoneNumber": phone_number,
-            "CallBackURL": settings.MPESA_CALLBACK_URL,
-            "AccountReference": "MyCompany",
-            "TransactionDesc": "Payment for an item"
-        }
+        # 3-4. Generate the security credentials and prepare the M-Pesa API payload
+        payload = stk_push_payload(phone_number, amount)
 
         # 5. Make the STK Push API request with the fetched access token
         try:
-            response = requests.post(
-                "https://sandbox.safaricom.co.ke/mpesa/stkpush/v1/processrequest",
+            response = integrations.mpesa.post(
+                f"{settings.MPESA_BASE_URL}/mpesa/stkpush/v1/processrequest",
                 json=payload,
                 headers={"Authorization": f"Bearer {access_token}"}
             )
@@ -171,6 +212,9 @@ class MpesaSTKPushAPIView(APIView):
 
         except requests.exceptions.RequestException as e:
             print(f"M-Pesa STK Push request failed: {e}")
+            if e.response is not None and e.response.status_code == 401:
+                # Daraja revoked the cached token early; fetch a fresh one next time.
+                mpesa_tokens.invalidate()
             return Response(
                 {"error": "Failed to connect to M-Pesa API. Check your network or API keys."},
                 status=status.HTTP_503_SERVICE_UNAVAILABLE
@@ -185,101 +229,89 @@ class MpesaSTKPushAPIView(APIView):
 
 class MpesaCallbackAPIView(APIView):
     def post(self, request, *args, **kwargs):
-        callback_data = request.data.get('Body', {}).get('stkCallback', {})
-        merchant_request_id = callback_data.get('MerchantRequestID')
-        checkout_request_id = callback_data.get('CheckoutRequestID')
-        result_code = callback_data.get('ResultCode')
-        result_desc = callback_data.get('ResultDesc')
-        
-        if result_code == 0:
-            callback_metadata = callback_data.get('CallbackMetadata', {}).get('Item', [])
-            
-            amount = None
-            mpesa_receipt_number = None
-            transaction_date = None
-            phone_number = None
-
-            for item in callback_metadata:
-                if item['Name'] == 'Amount':
-                    amount = item['Value']
-                elif item['Name'] == 'MpesaReceiptNumber':
-                    mpesa_receipt_number = item['Value']
-                elif item['Name'] == 'TransactionDate':
-                    transaction_date = datetime.strptime(str(item['Value']), '%Y%m%d%H%M%S')
-                elif item['Name'] == 'PhoneNumber':
-                    phone_number = item['Value']
-
-            try:
-                transaction = MpesaTransaction.objects.get(
-                    merchant_request_id=merchant_request_id,
-                    checkout_request_id=checkout_request_id
-                )
-                
-                transaction.result_code = result_code
-                transaction.result_desc = result_desc
-                transaction.amount = amount
-                transaction.mpesa_receipt_number = mpesa_receipt_number
-                transaction.transaction_date = transaction_date
-                transaction.phone_number = phone_number
-                transaction.save()
-
-                clerk_id = transaction.clerk_id
-                print("clerk_id in callback:", clerk_id)
-                print("ClerkUser exists:", ClerkUser.objects.filter(clerk_id=clerk_id).exists())
-
-                if clerk_id:
-                    try:
-                        user = ClerkUser.objects.get(clerk_id=clerk_id)
-                        user.role = 'freelancer'  # or user.is_freelancer = True
-                        user.save()
-                        print(user.role)
-                        update_clerk_role_to_freelancer(clerk_id)
-                    except ClerkUser.DoesNotExist:
-                        print("User not found for clerk_id:", clerk_id)
-                
-                print(f"Successfully updated transaction: {mpesa_receipt_number}")
-
-            except MpesaTransaction.DoesNotExist:
-                print("Transaction record not found in database.")
-
-        else:
-            print(f"Transaction failed with ResultCode: {result_code}, Description: {result_desc}")
-            try:
-                transaction = MpesaTransaction.objects.get(
-                    merchant_request_id=merchant_request_id,
-                    checkout_request_id=checkout_request_id
-                )
-                transaction.result_code = result_code
-                transaction.result_desc = result_desc
-                transaction.save()
-            except MpesaTransaction.DoesNotExist:
-                print("Transaction record for failed request not found.")
-
+        # Redeliveries are acknowledged too; callbacks.apply_callback only records the first.
+        callbacks.handle_callback(request.data)
         return Response({"ResultCode": 0, "ResultDesc": "Success"}, status=status.HTTP_200_OK)
 
 
-class MpesaTransactionListAPIView(ListAPIView):
+class MpesaTransactionListAPIView(ReplicaReadMixin, ConditionalGetMixin, ListAPIView):
     """
     API view to list all M-Pesa transactions.
     """
     queryset = MpesaTransaction.objects.all().order_by('-created_at')
     serializer_class = MpesaTransactionSerializer
 
-class MpesaTransactionStatusAPIView(APIView):
+    def validator_queryset(self, request, *args, **kwargs):
+        return MpesaTransaction.objects.all()
+
+    def list(self, request, *args, **kwargs):
+        fast = fast_serializers.for_serializer(self.serializer_class)
+        if fast is None:
+            return super().list(request, *args, **kwargs)
+        rows = list(fast.values(self.filter_queryset(self.get_queryset())))
+        with metrics.span('serialize'):
+            return Response(fast.serialize(rows, request))
+
+
+@require_GET
+def export_transactions(request):
+    """
+    Streams transactions as CSV (default) or NDJSON (?format=ndjson) for
+    finance, filtered by ?start= / ?end= (created_at, end exclusive) and
+    ?result_code= (comma-separated, "pending" for no result yet). A plain
+    Django view, so DRF's own handling of ?format= doesn't get in the way.
+    """
+    export_format = request.GET.get('format', 'csv')
+    if export_format not in exports.FORMATS:
+        return JsonResponse({"error": f"format must be one of {', '.join(exports.FORMATS)}."}, status=400)
+    try:
+        queryset = exports.filtered_transactions(request.GET)
+    except exports.ExportError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    # Rows are read after this view returns, outside ReplicaReadMixin-style routing, so pick the database here.
+    if routing_enabled() and not is_pinned(request):
+        queryset = queryset.using(REPLICA_DB_ALIAS)
+
+    response = StreamingHttpResponse(exports.STREAMS[export_format](queryset), content_type=exports.FORMATS[export_format])
+    bounds = "-".join(request.GET[name][:10] for name in ('start', 'end') if request.GET.get(name))
+    response['Content-Disposition'] = f'attachment; filename="mpesa-transactions{"-" + bounds if bounds else ""}.{export_format}"'
+    response['Cache-Control'] = 'no-store'
+    return response
+
+
+class TransactionRollupAPIView(ReplicaReadMixin, APIView):
+    """
+    Revenue and conversion time series from the precomputed TransactionRollup
+    table, e.g. /core/transactions/rollups/?granularity=day&start=2026-01-01&end=2027-01-01.
+    ``up_to`` is how far rollup_transactions has got.
+    """
+    def get(self, request, *args, **kwargs) -> Response:
+        granularity = request.query_params.get('granularity', 'day')
+        try:
+            start, end = (
+                exports.parse_bound(name, request.query_params[name]) if request.query_params.get(name) else None
+                for name in ('start', 'end')
+            )
+            series = rollups.series(granularity, start, end)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'granularity': granularity, 'up_to': rollups.watermark(), 'series': series}, status=status.HTTP_200_OK)
+
+
+class MpesaTransactionStatusAPIView(ConditionalGetMixin, APIView):
+    def validator_queryset(self, request, checkout_request_id, *args, **kwargs):
+        # Polled every few seconds while a payment is pending; unchanged polls get a 304.
+        return MpesaTransaction.objects.filter(checkout_request_id=checkout_request_id)
+
     def get(self, request, checkout_request_id, *args, **kwargs):
         try:
             # Find the transaction by its CheckoutRequestID
             mpesa_transaction = MpesaTransaction.objects.get(checkout_request_id=checkout_request_id)
             
-            # Return the status based on the ResultCode
-            if mpesa_transaction.result_code == "0":
-                return Response({"status": "success"}, status=status.HTTP_200_OK)
-            elif mpesa_transaction.result_code:
-                # If there is a ResultCode, but it's not "0", it's a failure
-                return Response({"status": "failed"}, status=status.HTTP_200_OK)
-            else:
-                # Still pending if no ResultCode is available
-                return Response({"status": "pending"}, status=status.HTTP_200_OK)
+            # Return the status based on the ResultCode: "0" is success, any other
+            # code is a failure, and no code yet means it is still pending.
+            payment_status = payment_events.transaction_status(mpesa_transaction.result_code)
+            return Response({"status": payment_status}, status=status.HTTP_200_OK)
         
         except MpesaTransaction.DoesNotExist:
             return Response({"status": "pending"}, status=status.HTTP_200_OK)
@@ -289,168 +321,335 @@ class MpesaTransactionStatusAPIView(APIView):
             return Response({"status": "error", "message": "An internal server error occurred."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
-class GigListAPIView(APIView):
+async def current_payment_status(checkout_request_id):
+    result_code = await (
+        MpesaTransaction.objects.filter(checkout_request_id=checkout_request_id)
+        .values_list('result_code', flat=True).afirst()
+    )
+    return payment_events.transaction_status(result_code)
+
+
+def sse_event(payment_status):
+    return f"event: status\ndata: {json.dumps({'status': payment_status})}\n\n"
+
+
+async def payment_status_stream(request, checkout_request_id):
+    """
+    Server-Sent Events stream of a payment's status, replacing repeated polls
+    of /core/check-status/: sends the current status, then each change the
+    moment the callback records it, and closes once the payment succeeds or
+    fails (or after PAYMENT_STATUS_MAX_WAIT seconds).
+    """
+    async def events():
+        # Subscribe before reading the row so a callback landing in between isn't missed.
+        async with payment_events.subscription(checkout_request_id) as queue:
+            payment_status = await current_payment_status(checkout_request_id)
+            yield sse_event(payment_status)
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + settings.PAYMENT_STATUS_MAX_WAIT
+            while payment_status not in payment_events.FINAL_STATUSES:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    update = await asyncio.wait_for(queue.get(), min(remaining, settings.PAYMENT_STATUS_KEEPALIVE))
+                except asyncio.TimeoutError:
+                    # SSE comment line; keeps proxies from closing an idle connection.
+                    yield ": keep-alive\n\n"
+                    continue
+                if update != payment_status:
+                    payment_status = update
+                    yield sse_event(payment_status)
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+async def payment_status_wait(request, checkout_request_id):
+    """
+    Long-poll alternative to the stream for clients without EventSource:
+    answers as soon as the status differs from ?status= (default "pending"),
+    or with the unchanged status after ?timeout= seconds.
+    """
+    known = request.GET.get('status', payment_events.PENDING)
+    try:
+        timeout = float(request.GET.get('timeout', settings.PAYMENT_STATUS_LONG_POLL_WAIT))
+        # float() accepts "nan", which min() would pass through and wait_for() then reject with a 500.
+        if not math.isfinite(timeout):
+            raise ValueError("timeout is not finite")
+        timeout = min(timeout, settings.PAYMENT_STATUS_MAX_WAIT)
+    except ValueError:
+        return JsonResponse({"error": "timeout must be a number."}, status=400)
+
+    async with payment_events.subscription(checkout_request_id) as queue:
+        payment_status = await current_payment_status(checkout_request_id)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while payment_status == known:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                payment_status = await asyncio.wait_for(queue.get(), remaining)
+            except asyncio.TimeoutError:
+                break
+    return JsonResponse({"status": payment_status})
+
+
+# Async (ASGI-native) variants of the payment views. Under backend/asgi.py a
+# worker keeps serving other requests while these wait on Safaricom, instead
+# of a sync worker sitting in I/O wait for the OAuth and STK push round-trips.
+# They are plain Django views (DRF's APIView is sync-only) returning the same
+# payloads as their sync counterparts.
+
+@csrf_exempt
+@require_POST
+async def stk_push_async(request):
+    try:
+        data = json.loads(request.body or b"{}")
+    except ValueError:
+        return JsonResponse({"error": "Request body must be JSON."}, status=400)
+    if not isinstance(data, dict):
+        return JsonResponse({"error": "Request body must be a JSON object."}, status=400)
+
+    access_token = await aget_access_token()
+    if not access_token:
+        return JsonResponse({"error": "Could not get an M-Pesa access token."}, status=503)
+    clerk_id = data.get('clerk_id')
+
+    phone_number = data.get('phone_number')
+    amount = data.get('amount')
+    if not phone_number or not amount:
+        return JsonResponse({"error": "Missing phone_number or amount in request body."}, status=400)
+    try:
+        amount = int(amount)
+    except (ValueError, TypeError):
+        return JsonResponse({"error": "Invalid amount provided."}, status=400)
+
+    try:
+        response = await integrations.mpesa_async.post(
+            f"{settings.MPESA_BASE_URL}/mpesa/stkpush/v1/processrequest",
+            json=stk_push_payload(phone_number, amount),
+            headers={"Authorization": f"Bearer {access_token}"}
+        )
+        response.raise_for_status()
+
+        response_data = response.json()
+        await MpesaTransaction.objects.acreate(
+            merchant_request_id=response_data.get('MerchantRequestID'),
+            checkout_request_id=response_data.get('CheckoutRequestID'),
+            phone_number=phone_number,
+            amount=amount,
+            clerk_id=clerk_id
+        )
+        return JsonResponse(response_data, status=response.status_code)
+
+    except httpx.HTTPError as e:
+        print(f"M-Pesa STK Push request failed: {e}")
+        if isinstance(e, httpx.HTTPStatusError) and e.response.status_code == 401:
+            # Daraja revoked the cached token early; fetch a fresh one next time.
+            await mpesa_tokens.ainvalidate()
+        return JsonResponse(
+            {"error": "Failed to connect to M-Pesa API. Check your network or API keys."}, status=503
+        )
+
+    except (ValueError, IntegrityError) as e:
+        # A non-JSON reply from Daraja, or a CheckoutRequestID we already have.
+        print(f"An unexpected error occurred: {e}")
+        return JsonResponse({"error": "An internal server error occurred."}, status=500)
+
+
+@csrf_exempt
+@require_POST
+async def mpesa_callback_async(request):
+    try:
+        callback_data = json.loads(request.body or b"{}")
+    except ValueError:
+        callback_data = {}
+    await sync_to_async(callbacks.handle_callback)(callback_data)
+    return JsonResponse({"ResultCode": 0, "ResultDesc": "Success"})
+
+
+async def transaction_status_async(request, checkout_request_id):
+    return JsonResponse({"status": await current_payment_status(checkout_request_id)})
+
+
+class GigListAPIView(ReplicaReadMixin, ConditionalGetMixin, CachedResponseMixin, KeysetListMixin, APIView):
+    cache_namespace = 'gigs'
+
+    def validator_queryset(self, request, *args, **kwargs):
+        return Gig.objects.all()
+
     def get(self, request, *args, **kwargs):
         """
-        Retrieves all Gig objects and returns them as a JSON list.
+        Retrieves Gig objects and returns them as a JSON list
+        (one page of them when ?page_size= or ?cursor= is given).
         """
-        gigs = Gig.objects.all()
-        serializer = GigSerializer(gigs, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        gigs = Gig.objects.select_related('creator')
+        return self.list_response(request, gigs, GigSerializer)
+
+
+MAX_SQL_OFFSET = 2 ** 63 - 1
+
+
+class GigSearchAPIView(APIView):
+    """
+    Ranked full-text search over gig title, description and location, e.g.
+    /core/gigs/search/?q=logo+design&location=Nairobi&min_price=500&page=2.
+    """
+    def get(self, request, *args, **kwargs):
+        params = request.query_params
+        try:
+            min_price = Decimal(params['min_price']) if params.get('min_price') else None
+            max_price = Decimal(params['max_price']) if params.get('max_price') else None
+            page = max(1, int(params.get('page', 1)))
+            page_size = min(max(1, int(params.get('page_size', settings.API_PAGE_SIZE))), settings.API_MAX_PAGE_SIZE)
+            # Decimal accepts NaN and Infinity, which the price filter would then reject with a 500.
+            if any(price is not None and not price.is_finite() for price in (min_price, max_price)):
+                raise ValueError("price is not finite")
+            # Past the 64-bit integers SQL accepts for OFFSET, the query raises OverflowError.
+            if (page - 1) * page_size > MAX_SQL_OFFSET:
+                raise ValueError("page is out of range")
+        except (ValueError, ArithmeticError):
+            return Response(
+                {"error": "min_price, max_price, page and page_size must be numbers."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        total, ids = search.get_backend().search(
+            params.get('q', ''),
+            min_price=min_price,
+            max_price=max_price,
+            location=params.get('location'),
+            offset=(page - 1) * page_size,
+            limit=page_size,
+        )
+        gigs = Gig.objects.select_related('creator').in_bulk(ids)
+        with metrics.span('serialize'):
+            results = GigSerializer([gigs[pk] for pk in ids if pk in gigs], many=True).data
+
+        url = request.build_absolute_uri()
+        return Response({
+            'count': total,
+            'next': replace_query_param(url, 'page', page + 1) if page * page_size < total else None,
+            'previous': replace_query_param(url, 'page', page - 1) if page > 1 else None,
+            'results': results,
+        }, status=status.HTTP_200_OK)
+
+class ClerkUserListAPIView(ReplicaReadMixin, ConditionalGetMixin, KeysetListMixin, APIView):
+    keyset_ordering = ('-created_at', '-clerk_id')
+
+    def validator_queryset(self, request, *args, **kwargs):
+        return ClerkUser.objects.all()
 
-class ClerkUserListAPIView(APIView):
     def get(self, request, *args, **kwargs):
         """
-        Retrieves all ClerkUser objects and returns them as a JSON list.
+        Retrieves ClerkUser objects and returns them as a JSON list
+        (one page of them when ?page_size= or ?cursor= is given).
         """
         users = ClerkUser.objects.all()
-        serializer = ClerkUserSerializer(users, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        return self.list_response(request, users, ClerkUserSerializer)
        
 
 
 @csrf_exempt
 def clerk_webhook_handler(request):
-    print("Clerk webhook called")
-    # Get the webhook signing secret from your environment variables
-    # This secret is configured in your Clerk Dashboard
-    webhook_secret = settings.CLERK_WEBHOOK_SECRET
-
-    # Get webhook headers and payload from the request
-    headers = request.headers
-    payload = request.body.decode('utf-8')
-
+    """
+    Verifies a Clerk (Svix) webhook and hands it to core/webhooks.py, which
+    ignores redeliveries and applies user.created/updated/deleted in order.
+    """
     try:
-        # Verify the webhook signature
-        wh = Webhook(webhook_secret)
-        evt = wh.verify(payload, headers)
+        event = webhooks.verify(request.body, request.headers)
     except WebhookVerificationError:
         print("Webhook verification failed.")
         return HttpResponse(status=400)
-    
-    event_type = evt.get("type")
-    
-    # Handle user creation or update robustly with error handling
-    if event_type in ["user.created", "user.updated"]:
-        user_data = evt.get("data", {})
-        clerk_id = user_data.get("id")
-        email = user_data.get("email_addresses", [{}])[0].get("email_address")
-        first_name = user_data.get("first_name")
-        last_name = user_data.get("last_name")
-        public_metadata = user_data.get("public_metadata", {})
-        role = public_metadata.get("role", "user")  # Default to 'default_role'
-
-        try:
-            user, created = ClerkUser.objects.get_or_create(
-                clerk_id=clerk_id,
-                defaults={
-                    "first_name": first_name,
-                    "last_name": last_name,
-                    "email": email,
-                    "role": role,
-                }
-            )
-            if not created:
-                # Update fields if user already exists
-                user.first_name = first_name
-                user.last_name = last_name
-                user.email = email
-                user.role =role
-                user.save()
-                print(f"User updated: {clerk_id}")
-            else:
-                print(f"User created: {clerk_id}")
-        except Exception as e:
-            print("Error in Clerk webhook user creation:", e)
-
-    # Handle user deletion
-    elif event_type == "user.deleted":
-        user_data = evt.get("data", {})
-        clerk_id = user_data.get("id")
-        ClerkUser.objects.filter(clerk_id=clerk_id).delete()
-        print(f"User deleted: {clerk_id}")
 
+    svix_id = webhooks.delivery_header(request.headers, 'id')
+    if not svix_id:
+        return HttpResponse(status=400)
+    webhooks.handle_event(svix_id, event, webhooks.delivery_header(request.headers, 'timestamp'))
     return HttpResponse(status=200)
 
 
-def update_clerk_role_to_freelancer(clerk_id):
-    CLERK_API_KEY = settings.CLERK_SECRET_KEY
-    if not CLERK_API_KEY:
-        print("CLERK_SECRET_KEY not set in environment.")
-        return
-
-    headers = {
-        "Authorization": f"Bearer {CLERK_API_KEY}",
-        "Content-Type": "application/json"
-    }
-    data = {
-        "public_metadata": {
-            "role": "freelancer"
-        }
-    }
-    resp = requests.patch(
-        f"https://api.clerk.com/v1/users/{clerk_id}",
-        headers=headers,
-        json=data
-    )
-    print(f"Clerk API response: {resp.status_code} {resp.text}")
-
-
-
 # Create a list view for Freelancer model
-class FreelancerListAPIView(APIView):
+class FreelancerListAPIView(ReplicaReadMixin, CachedResponseMixin, KeysetListMixin, APIView):
+    """
+    Lists freelancers, optionally filtered and ranked by skill, e.g.
+    /core/freelancers/?skills=django,react&city=Nairobi (any of the skills,
+    most matching first; add &match=all to require every one) or
+    /core/freelancers/?gig=12 (ranked by overlap with the skills the gig mentions).
+    """
+    cache_namespace = 'freelancers'
+    # Freelancer has no created_at; ids are assigned in creation order.
+    keyset_ordering = '-id'
+
     def get(self, request, format=None):
+        params = request.query_params
         freelancers = Freelancer.objects.all()
-        serializer = FreelancerSerializer(freelancers, many=True)
-        return Response(serializer.data)
+        if 'gig' in params:
+            gig = Gig.objects.filter(pk=params['gig']).first() if params['gig'].isdigit() else None
+            if gig is None:
+                return Response({"error": "Gig not found."}, status=status.HTTP_404_NOT_FOUND)
+            wanted = skills.skills_mentioned_in(f"{gig.title} {gig.description}")
+            requested = len(wanted)
+        elif params.get('skills'):
+            names = skills.parse_skills(params['skills'])
+            wanted = list(Skill.objects.filter(name__in=names))
+            requested = len(names)
+        else:
+            wanted = None
+
+        if wanted is not None:
+            self.keyset_ordering = ('-skill_overlap', '-id')
+            freelancers = skills.match_freelancers(
+                wanted, city=params.get('city'), require_all=params.get('match') == 'all', requested=requested
+            )
+        elif params.get('city'):
+            freelancers = skills.filter_city(freelancers, params['city'])
+        return self.list_response(request, freelancers, FreelancerSerializer)
 
 # Create a list view for Testimonial model
-class TestimonialListAPIView(APIView):
+class TestimonialListAPIView(ReplicaReadMixin, CachedResponseMixin, KeysetListMixin, APIView):
+    cache_namespace = 'testimonials'
+
     def get(self, request, format=None):
         testimonials = Testimonial.objects.all()
-        serializer = TestimonialSerializer(testimonials, many=True)
-        return Response(serializer.data)
+        return self.list_response(request, testimonials, TestimonialSerializer)
 
 
 class FreelancerListCreateAPIView(generics.ListCreateAPIView):
     queryset = Freelancer.objects.all()
     serializer_class = FreelancerSerializer
+    pagination_class = KeysetPagination
+    keyset_ordering = '-id'
 
 class TestimonialListCreateAPIView(generics.ListCreateAPIView):
     queryset = Testimonial.objects.all()
     serializer_class = TestimonialSerializer
+    pagination_class = KeysetPagination
 
 
 
-class DashboardDataAPIView(APIView):
+class DashboardDataAPIView(ReplicaReadMixin, APIView):
     """
-    API view to fetch all data required for the admin dashboard in a single call.
+    API view to fetch the admin dashboard summary in a single call.
+
+    Totals come from the precomputed DashboardStat/DailySignupStat tables, so
+    the cost doesn't grow with the data; the raw rows are available page by
+    page from DashboardSectionAPIView.
     """
     def get(self, request, *args, **kwargs) -> Response:
         try:
-            # Fetch all data from the database
-            gigs = Gig.objects.all()
-            freelancers = Freelancer.objects.all()
-            testimonials = Testimonial.objects.all()
-            transactions = MpesaTransaction.objects.all().order_by('-created_at')
-            users = ClerkUser.objects.all()
-            
-            # Serialize the data
-            gigs_data = GigSerializer(gigs, many=True).data
-            freelancers_data = FreelancerSerializer(freelancers, many=True).data
-            testimonials_data = TestimonialSerializer(testimonials, many=True).data
-            transactions_data = MpesaTransactionSerializer(transactions, many=True).data
-            users_data = ClerkUserSerializer(users, many=True).data
-
-            # Combine into a single JSON response
             dashboard_data = {
-                'gigs': gigs_data,
-                'freelancers': freelancers_data,
-                'testimonials': testimonials_data,
-                'transactions': transactions_data,
-                'users': users_data,
+                'summary': dashboard.summary(),
+                'signups_per_day': dashboard.signups_per_day(settings.DASHBOARD_SIGNUP_DAYS),
+                'sections': {
+                    name: reverse('dashboard_section', kwargs={'section': name})
+                    for name in DashboardSectionAPIView.sections
+                },
             }
-
             return Response(dashboard_data, status=status.HTTP_200_OK)
         
         except Exception as e:
@@ -459,6 +658,27 @@ class DashboardDataAPIView(APIView):
                 {"error": "An internal server error occurred while fetching dashboard data."},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
+
+class DashboardSectionAPIView(ReplicaReadMixin, KeysetListMixin, APIView):
+    """
+    Paginated drill-down into the rows behind one dashboard section,
+    e.g. /core/dashboard-data/transactions/?page_size=50.
+    """
+    pagination_class = AlwaysKeysetPagination
+    sections = {
+        'gigs': (lambda: Gig.objects.select_related('creator'), GigSerializer, ('-created_at', '-id')),
+        'freelancers': (lambda: Freelancer.objects.all(), FreelancerSerializer, '-id'),
+        'testimonials': (lambda: Testimonial.objects.all(), TestimonialSerializer, ('-created_at', '-id')),
+        'transactions': (lambda: MpesaTransaction.objects.all(), MpesaTransactionSerializer, ('-created_at', '-id')),
+        'users': (lambda: ClerkUser.objects.all(), ClerkUserSerializer, ('-created_at', '-clerk_id')),
+    }
+
+    def get(self, request, section, *args, **kwargs) -> Response:
+        if section not in self.sections:
+            return Response({"error": f"Unknown dashboard section '{section}'."}, status=status.HTTP_404_NOT_FOUND)
+        queryset, serializer_class, self.keyset_ordering = self.sections[section]
+        return self.list_response(request, queryset(), serializer_class)
+
 class FreelancerDashboardAPIView(APIView):
     """
     API view to fetch all data required for the freelancer dashboard in a single call.
@@ -466,8 +686,8 @@ class FreelancerDashboardAPIView(APIView):
     def get(self, request, *args, **kwargs) -> Response:
         try:
             # Fetch all data from the database
-            gigs = Gig.objects.filter(creator=request.user.freelancer).all()
-            applications = Application.objects.filter(gig__creator=request.user.freelancer).all()
+            gigs = Gig.objects.filter(creator=request.user.freelancer).select_related('creator')
+            applications = Application.objects.filter(gig__creator=request.user.freelancer).select_related('gig')
            
             
             # Serialize the data
@@ -490,8 +710,9 @@ class FreelancerDashboardAPIView(APIView):
             )
 
 class GigListCreateView(generics.ListCreateAPIView):
-    queryset = Gig.objects.all()
+    queryset = Gig.objects.select_related('creator')
     serializer_class = GigSerializer
+    pagination_class = KeysetPagination
     permission_classes = [permissions.IsAuthenticated]  # Or custom for freelancers only
 
     def perform_create(self, serializer):
@@ -511,7 +732,7 @@ class GigApplicationsView(generics.ListAPIView):
 
     def get_queryset(self):
         gig_id = self.kwargs['gig_id']
-        return Application.objects.filter(gig_id=gig_id, gig__freelancer=self.request.user)
+        return Application.objects.filter(gig_id=gig_id, gig__freelancer=self.request.user).select_related('gig')
     
 class UserGigViewSet(viewsets.ModelViewSet):
     """
@@ -524,8 +745,32 @@ class UserGigViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         # 🔑 This is the crucial filtering step:
         # It queries Gigs where the 'poster' ForeignKey matches the logged-in user object.
-        return Gig.objects.filter(poster=self.request.user).order_by('-date_posted')
+        return Gig.objects.filter(poster=self.request.user).select_related('creator').order_by('-date_posted')
 
     def perform_create(self, serializer):
         # Ensures that new gigs are automatically assigned to the creator
-        serializer.save(poster=self.request.user)
\ No newline at end of file
+        serializer.save(poster=self.request.user)
+
+
+class HasMetricsToken(permissions.BasePermission):
+    def has_permission(self, request, view):
+        token = settings.REQUEST_METRICS_TOKEN
+        return bool(token) and hmac.compare_digest(request.headers.get('X-Metrics-Token', ''), token)
+
+
+class RequestMetricsAPIView(APIView):
+    """
+    Aggregated per-route latency percentiles from RequestMetricsMiddleware,
+    plus upstream HTTP and token-cache stats. Only served when
+    REQUEST_METRICS_ENABLED is on, to staff or with REQUEST_METRICS_TOKEN.
+    """
+    permission_classes = [permissions.IsAdminUser | HasMetricsToken]
+
+    def get(self, request, *args, **kwargs):
+        if not settings.REQUEST_METRICS_ENABLED:
+            return Response({"error": "Request metrics are disabled."}, status=status.HTTP_404_NOT_FOUND)
+        return Response({
+            'routes': metrics.registry.snapshot(),
+            'upstreams': integrations.metrics_snapshot(),
+            'clerk_token_cache': clerk_verified_tokens.stats(),
+        }, status=status.HTTP_200_OK)
@@ -0,0 +1,215 @@
+"""
+Clerk webhook ingestion.
+
+``clerk_webhook_handler`` checks each delivery's Svix signature with one
+verifier per secret (built once per process) and stores it as a
+``ClerkWebhookEvent`` keyed by ``svix-id``, so a redelivered or replayed
+message is stored once. With CLERK_WEBHOOK_MODE = "inline" the event is
+applied before responding; with "queued" the handler returns after the
+INSERT and ``process_clerk_webhooks`` applies pending events in batches.
+
+Either way ``apply_events()`` does the work. Per ``clerk_id`` only the
+newest event (by Clerk's timestamp) counts, and only if it isn't older than
+the newest event already applied for that user, so out-of-order deliveries
+can't roll a user back or resurrect a deleted one. Users are written with a
+single ``bulk_create(update_conflicts=True)``, which skips the model
+signals, so the dashboard counters are bumped here.
+"""
+import binascii
+import functools
+import json
+from collections import Counter
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Max
+from django.utils import timezone
+from svix.webhooks import Webhook, WebhookVerificationError
+
+from . import dashboard
+from .models import ClerkUser, ClerkWebhookEvent
+
+USER_EVENTS = ('user.created', 'user.updated')
+DELETE_EVENT = 'user.deleted'
+USER_FIELDS = ['first_name', 'last_name', 'email', 'role', 'updated_at']
+
+
+@functools.lru_cache(maxsize=4)
+def get_verifier(secret):
+    return Webhook(secret)
+
+
+def verify(body, headers):
+    """
+    Checks the Svix signature headers against the raw body and returns the
+    parsed event. Raises WebhookVerificationError.
+    """
+    # svix >= 2 only verifies; it no longer returns the parsed payload.
+    try:
+        get_verifier(settings.CLERK_WEBHOOK_SECRET).verify(body, headers)
+    except binascii.Error:
+        # A signature that isn't valid base64 fails to decode before it is compared.
+        raise WebhookVerificationError("Malformed signature")
+    try:
+        event = json.loads(body)
+    except ValueError:
+        raise WebhookVerificationError("Payload is not JSON")
+    if not isinstance(event, dict):
+        raise WebhookVerificationError("Payload is not a JSON object")
+    return event
+
+
+def delivery_header(headers, name):
+    """A Svix delivery header, e.g. ``id``: Svix sends ``svix-id``, or ``webhook-id`` (Standard Webhooks names)."""
+    return headers.get(f'svix-{name}') or headers.get(f'webhook-{name}')
+
+
+def occurred_at(event, svix_timestamp=None):
+    """Clerk's event timestamp (milliseconds), else the Svix send time (seconds), else now."""
+    try:
+        if event.get('timestamp'):
+            return datetime.fromtimestamp(int(event['timestamp']) / 1000, tz=dt_timezone.utc)
+        if svix_timestamp:
+            return datetime.fromtimestamp(int(svix_timestamp), tz=dt_timezone.utc)
+    except (TypeError, ValueError, OverflowError):
+        pass
+    return timezone.now()
+
+
+def handle_event(svix_id, event, svix_timestamp=None):
+    """Entry point for the webhook view: stores the event, and applies it unless queued."""
+    with transaction.atomic():
+        stored = receive(svix_id, event, svix_timestamp)
+        if stored is not None and settings.CLERK_WEBHOOK_MODE != 'queued':
+            apply_events([stored])
+    return stored
+
+
+def receive(svix_id, event, svix_timestamp=None):
+    """Stores a verified event. Returns the new row, or None if ``svix_id`` was already stored."""
+    data = event.get('data') if isinstance(event.get('data'), dict) else {}
+    try:
+        with transaction.atomic():
+            return ClerkWebhookEvent.objects.create(
+                svix_id=svix_id,
+                event_type=event.get('type') or '',
+                clerk_id=data.get('id'),
+                occurred_at=occurred_at(event, svix_timestamp),
+                payload=event,
+            )
+    except IntegrityError:
+        return None
+
+
+def drain_events(batch_size=None):
+    """
+    Applies up to ``batch_size`` pending events, oldest received first, in
+    one transaction. Returns (events drained, events applied).
+    """
+    batch_size = batch_size or settings.CLERK_WEBHOOK_BATCH_SIZE
+    with transaction.atomic():
+        events = list(
+            ClerkWebhookEvent.objects.select_for_update(skip_locked=True)
+            .filter(status='PENDING').order_by('id')[:batch_size]
+        )
+        if not events:
+            return 0, 0
+        return len(events), apply_events(events)
+
+
+def apply_events(events):
+    """
+    Applies ``ClerkWebhookEvent`` rows and marks each APPLIED, SKIPPED
+    (superseded, stale or not a user event) or FAILED. Call inside a
+    transaction. Returns the number applied.
+    """
+    status, newest = {}, {}
+    for event in events:
+        if event.event_type not in USER_EVENTS + (DELETE_EVENT,) or not event.clerk_id:
+            status[event.pk] = 'SKIPPED'
+            continue
+        current = newest.get(event.clerk_id)
+        if current is not None and event.occurred_at < current.occurred_at:
+            status[event.pk] = 'SKIPPED'
+            continue
+        if current is not None:
+            status[current.pk] = 'SKIPPED'
+        newest[event.clerk_id] = event
+
+    applied_until = dict(
+        ClerkWebhookEvent.objects.filter(clerk_id__in=newest, status='APPLIED')
+        .values('clerk_id').annotate(last=Max('occurred_at')).values_list('clerk_id', 'last')
+    )
+    for clerk_id, event in list(newest.items()):
+        if clerk_id in applied_until and event.occurred_at < applied_until[clerk_id]:
+            status[event.pk] = 'SKIPPED'
+            del newest[clerk_id]
+
+    failed = upsert_users([clerk_user(event.payload['data']) for event in newest.values() if event.event_type in USER_EVENTS])
+    errors = {event.pk: failed[event.clerk_id] for event in newest.values() if event.clerk_id in failed}
+    deleted = [event.clerk_id for event in newest.values() if event.event_type == DELETE_EVENT]
+    if deleted:
+        # Rare enough to go through delete(), whose signals keep the counters right.
+        ClerkUser.objects.filter(clerk_id__in=deleted).delete()
+
+    for event in newest.values():
+        status[event.pk] = 'FAILED' if event.pk in errors else 'APPLIED'
+    now = timezone.now()
+    for value in ('APPLIED', 'SKIPPED'):
+        pks = [pk for pk, event_status in status.items() if event_status == value]
+        if pks:
+            ClerkWebhookEvent.objects.filter(pk__in=pks).update(status=value, processed_at=now)
+    for pk, error in errors.items():
+        ClerkWebhookEvent.objects.filter(pk=pk).update(status='FAILED', error=error, processed_at=now)
+    return sum(1 for event_status in status.values() if event_status == 'APPLIED')
+
+
+def primary_email(data):
+    addresses = data.get('email_addresses') or []
+    primary = next((a for a in addresses if a.get('id') == data.get('primary_email_address_id')), None)
+    return (primary or (addresses[0] if addresses else {})).get('email_address')
+
+
+def clerk_user(data):
+    """An unsaved ClerkUser from a Clerk user object (webhook ``data`` or a Users API item)."""
+    return ClerkUser(
+        clerk_id=data.get('id'),
+        first_name=data.get('first_name'),
+        last_name=data.get('last_name'),
+        email=primary_email(data),
+        role=(data.get('public_metadata') or {}).get('role', 'user'),
+    )
+
+
+def upsert_users(users, update_fields=USER_FIELDS):
+    """
+    Creates or updates ``users`` (unsaved ClerkUsers, one per clerk_id) with
+    one upsert. Returns {clerk_id: error} for the users that couldn't be written.
+    """
+    errors = {}
+    if not users:
+        return errors
+    existing = set(ClerkUser.objects.filter(clerk_id__in=[user.clerk_id for user in users]).values_list('clerk_id', flat=True))
+    upsert = functools.partial(
+        ClerkUser.objects.bulk_create, update_conflicts=True, unique_fields=['clerk_id'], update_fields=update_fields,
+    )
+    try:
+        with transaction.atomic():
+            upsert(users)
+    except IntegrityError:
+        # e.g. a missing email, or one another account still holds: retry one by one so only those users fail.
+        for user in users:
+            try:
+                with transaction.atomic():
+                    upsert([user])
+            except IntegrityError as e:
+                errors[user.clerk_id] = str(e)
+                print(f"Error in Clerk user upsert for {user.clerk_id}: {e}")
+
+    created = [user for user in users if user.clerk_id not in errors and user.clerk_id not in existing]
+    if created:
+        dashboard.bump(users=len(created))
+        for day, count in Counter(timezone.localdate(user.created_at) for user in created).items():
+            dashboard.bump_signups(day, count)
+    return errors